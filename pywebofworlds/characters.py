@@ -1,7 +1,7 @@
-import random as r
-import timelines as t
-import utils as u
+from pywebofworlds import timelines as t
+from pywebofworlds import utils as u
 import numpy as np
+from collections.abc import MutableSequence
 from typing import Union, Iterable, List
 
 
@@ -19,6 +19,10 @@ from typing import Union, Iterable, List
 
 # TODO: Name generator (from list from file)
 
+# Random generator used when none is given.
+default_rng = np.random.default_rng()
+
+
 class DemographicSet:
     """An object containing a set of mutually exclusive demographics, ideally adding to 100%. Each set contains one
     type of demographic.
@@ -35,6 +39,8 @@ class DemographicSet:
         """
         self.demographics = {}
         self.trait = str(trait)
+        # Sampling tables, built by sampler() on first use and discarded by __setitem__.
+        self._sampler = None
         if type(demographics) is dict:
             # Use the dict to set demographic information.
             self.add_demographics(demographics=demographics)
@@ -49,6 +55,7 @@ class DemographicSet:
 
     def __setitem__(self, key: str, value: float):
         self.demographics[key] = value
+        self._sampler = None
 
     def __str__(self):
         string = 'Trait: ' + str(self.trait) + '\n'
@@ -84,6 +91,63 @@ class DemographicSet:
 
         return total
 
+    def sampler(self):
+        """
+        Build (or return the cached) tables for drawing from this DemographicSet with Walker's alias method, which
+        takes constant time per draw and uses the percentages exactly.
+        Constructed using https://en.wikipedia.org/wiki/Alias_method
+        :return: tuple of (list of demographic names, numpy array of normalised probabilities, numpy array of
+            acceptance thresholds, numpy array of alias indices)
+        """
+        if self._sampler is None:
+            names = list(self.demographics.keys())
+            probabilities = np.array([self.demographics[name] for name in names], dtype=float)
+            probabilities /= probabilities.sum()
+
+            n = len(names)
+            scaled = probabilities * n
+            threshold = np.ones(n)
+            alias = np.arange(n)
+            small = [i for i in range(n) if scaled[i] < 1.]
+            large = [i for i in range(n) if scaled[i] >= 1.]
+            while small and large:
+                s, l = small.pop(), large.pop()
+                threshold[s] = scaled[s]
+                alias[s] = l
+                scaled[l] += scaled[s] - 1.
+                if scaled[l] < 1.:
+                    small.append(l)
+                else:
+                    large.append(l)
+            # Anything left over is 1 to within rounding error, and keeps threshold 1.
+            self._sampler = names, probabilities, threshold, alias
+        return self._sampler
+
+    def probabilities(self):
+        """
+        The demographics as a probability distribution.
+        :return: tuple of (list of demographic names, numpy array of their probabilities, normalised to sum to 1)
+        """
+        names, probabilities, _, _ = self.sampler()
+        return names, probabilities
+
+    def sample(self, size: int = None, rng: np.random.Generator = None):
+        """
+        Draw demographics at random, weighted by their percentages, using the alias tables from sampler().
+        :param size: Number to draw; if None, draws one.
+        :param rng: numpy random Generator to use.
+        :return: Name of demographic if size is None; otherwise, numpy array of indices into the names listed by
+            probabilities().
+        """
+        if rng is None:
+            rng = default_rng
+        names, _, threshold, alias = self.sampler()
+        if size is None:
+            i = int(rng.integers(len(names)))
+            return names[i] if rng.random() < threshold[i] else names[alias[i]]
+        i = rng.integers(len(names), size=size)
+        return np.where(rng.random(size) < threshold[i], i, alias[i])
+
     def check_sum(self, tolerance: float = 0.1):
         """
         Checks that the percentages in a list add up to 100 (or close enough)
@@ -203,16 +267,323 @@ class Character:
         elif type(demographic_set) is not DemographicSet:
             raise TypeError('demographics must be dict or DemographicSet.')
 
-        trait = demographic_set.trait
-        demographic_set.check_sum()
+        self[demographic_set.trait] = demographic_set.sample()
+
+
+def random_dobs(num: int, year: int, system: Union[t.DateSystem, str] = 'Gregorian', sigma: float = 34.,
+                rng: np.random.Generator = None):
+    """
+    Generate many dates-of-birth at once, with the same model as Character.det_dob().
+    :param num: Number of dates to generate.
+    :param year: Year of current setting.
+    :param system: Date system.
+    :param sigma: Standard deviation of age distribution; default is 34, for human populations.
+    :param rng: numpy random Generator to use.
+    :return: timelines.DateArray of dates-of-birth.
+    """
+    if rng is None:
+        rng = default_rng
+    system = t.check_available(system)
+    ages = np.abs(rng.normal(scale=sigma, size=num))
+    # Truncate towards zero, as set_year() does with int().
+    years = np.trunc(year - ages).astype(np.int64)
+    days = rng.integers(system.days_in_year(), size=num)
+    return t.DateArray(days=years * system.days_in_year() + days, system=system)
+
+
+class Population:
+    def __init__(self, dobs: t.DateArray = None, traits: dict = None, categories: dict = None, names=None, used=None,
+                 system: Union[t.DateSystem, str] = 'Gregorian'):
+        """
+        A set of characters stored as columns: trait values as integer codes into lists of categories (-1 where a
+        character lacks the trait), dates-of-birth as day numbers, and used as a boolean array. Character objects are
+        only created when accessed, and are kept so that the same object is returned each time; changes made to them
+        are copied back to the columns by sync(), which every column-wide operation calls first.
+        :param dobs: timelines.DateArray of dates-of-birth; if None, the Population starts empty.
+        :param traits: dict of trait name to numpy array of integer codes.
+        :param categories: dict of trait name to list of category names, indexed by the codes.
+        :param names: Sequence of character names; if None, characters are unnamed.
+        :param used: Boolean array; if None, no characters are used.
+        :param system: DateSystem of the dates-of-birth, if dobs is None.
+        """
+        if dobs is None:
+            dobs = t.DateArray(system=system)
+        self.system = dobs.system
+        self._n = n = len(dobs)
+        # Columns, with spare capacity beyond the first _n rows.
+        self._dobs = np.array(dobs.days, dtype=np.int64)
+        self._names = np.array(names, dtype=object) if names is not None else np.full(n, None, dtype=object)
+        self._used = np.array(used, dtype=bool) if used is not None else np.zeros(n, dtype=bool)
+        self.categories = {trait: list(names) for trait, names in (categories or {}).items()}
+        self._traits = {trait: np.array(codes, dtype=np.int32) for trait, codes in (traits or {}).items()}
+        # Character objects created so far, keyed by row.
+        self._characters = {}
+
+    def __len__(self):
+        return self._n
 
-        population = []
-        for name in demographic_set.demographics:
-            # TODO: This will only work to the nearest percent. Find a way around that?
-            for j in range(int(np.round(100 * demographic_set[name]))):
-                population.append(name)
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        i = self._row(item)
+        if i not in self._characters:
+            character = Character(name=self._names[i])
+            character.dob = self.system.date_from_day_number(self._dobs[i])
+            character.used = bool(self._used[i])
+            for trait, codes in self._traits.items():
+                if codes[i] >= 0:
+                    character[trait] = self.categories[trait][codes[i]]
+            self._characters[i] = character
+        return self._characters[i]
+
+    def __setitem__(self, item, character: 'Character'):
+        i = self._row(item)
+        self._write_row(i, character)
+        self._characters[i] = character
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _row(self, item):
+        i = int(item)
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("Population index out of range")
+        return i
+
+    @property
+    def dobs(self):
+        return t.DateArray(days=self._dobs[:self._n], system=self.system)
+
+    @property
+    def names(self):
+        return self._names[:self._n]
+
+    @property
+    def used(self):
+        return self._used[:self._n]
+
+    @property
+    def traits(self):
+        return {trait: codes[:self._n] for trait, codes in self._traits.items()}
+
+    def _reserve(self, n: int):
+        # Grow geometrically, so that repeated appends take amortised constant time.
+        if n <= len(self._dobs):
+            return
+        capacity = max(n, 2 * len(self._dobs), 16)
+
+        def grow(column, fill):
+            new = np.full(capacity, fill, dtype=column.dtype)
+            new[:self._n] = column[:self._n]
+            return new
+
+        self._dobs = grow(self._dobs, 0)
+        self._names = grow(self._names, None)
+        self._used = grow(self._used, False)
+        self._traits = {trait: grow(codes, -1) for trait, codes in self._traits.items()}
+
+    def _add_trait(self, trait: str):
+        """
+        Add a column for a trait, if there isn't one, with no character having it.
+        """
+        if trait not in self._traits:
+            self.categories[trait] = []
+            self._traits[trait] = np.full(len(self._dobs), -1, dtype=np.int32)
+
+    def _code(self, trait: str, value):
+        """
+        The code for a trait value, adding the trait and category if they are new.
+        """
+        self._add_trait(trait)
+        categories = self.categories[trait]
+        if value not in categories:
+            categories.append(value)
+        return categories.index(value)
+
+    def _write_row(self, i: int, character: 'Character'):
+        self._names[i] = character.name
+        self._used[i] = character.used
+        dob = character.dob
+        if dob.system is not self.system:
+            dob = t.DateArray(days=[dob.day_number()], system=dob.system).convert(self.system)[0]
+        self._dobs[i] = dob.day_number()
+        for trait in self._traits:
+            self._traits[trait][i] = -1
+        for trait, value in character.traits.items():
+            code = self._code(trait, value)
+            self._traits[trait][i] = code
+
+    def sync(self):
+        """
+        Copy any changes made to accessed Character objects back to the columns.
+        :return:
+        """
+        for i, character in self._characters.items():
+            self._write_row(i, character)
 
-        self[trait] = r.choice(population)
+    def append(self, character: 'Character'):
+        """
+        Add a Character object.
+        :param character: Character to add.
+        :return:
+        """
+        self._reserve(self._n + 1)
+        self._n += 1
+        self[self._n - 1] = character
+
+    def extend(self, other: 'Population'):
+        """
+        Add the characters of another Population, matching up their trait categories.
+        :param other: Population to add.
+        :return:
+        """
+        other.sync()
+        start, n = self._n, self._n + len(other)
+        self._reserve(n)
+        dobs = other.dobs if other.system is self.system else other.dobs.convert(self.system)
+        self._dobs[start:n] = dobs.days
+        self._names[start:n] = other.names
+        self._used[start:n] = other.used
+        for trait, codes in other.traits.items():
+            # Register the trait even if other has no values for it, so that the column exists to write into.
+            self._add_trait(trait)
+            mapping = np.array([self._code(trait, value) for value in other.categories[trait]] + [-1], dtype=np.int32)
+            self._traits[trait][start:n] = mapping[codes]
+        self._n = n
+        for i, character in other._characters.items():
+            self._characters[start + i] = character
+
+    def take(self, indices):
+        """
+        Select characters by index or boolean mask, keeping any Character objects already created.
+        :param indices: numpy array of row indices, or boolean mask.
+        :return: New Population.
+        """
+        self.sync()
+        indices = np.arange(self._n)[indices]
+        population = Population(dobs=self.dobs[indices], traits={trait: codes[indices] for trait, codes in
+                                                                 self.traits.items()},
+                                categories=self.categories, names=self.names[indices], used=self.used[indices])
+        if self._characters:
+            positions = np.full(self._n, -1)
+            positions[indices] = np.arange(len(indices))
+            for i, character in self._characters.items():
+                if positions[i] >= 0:
+                    population._characters[int(positions[i])] = character
+        return population
+
+    def values(self, trait: str):
+        """
+        :param trait: Name of trait.
+        :return: numpy array of the trait's value for each character; None where a character lacks it.
+        """
+        self.sync()
+        return np.asarray(self.categories[trait] + [None], dtype=object)[self._traits[trait][:self._n]]
+
+    def where(self, traits: dict = None, used: bool = None, born_from=None, born_to=None):
+        """
+        Select characters by their columns.
+        :param traits: dict of trait name to a value, or list of values, to select.
+        :param used: If given, select only characters with this used state.
+        :param born_from: If given, select only characters born on or after this Date (or day number).
+        :param born_to: If given, select only characters born on or before this Date (or day number).
+        :return: Boolean numpy array.
+        """
+        self.sync()
+        mask = np.ones(self._n, dtype=bool)
+        for trait, values in (traits or {}).items():
+            if trait not in self._traits:
+                return np.zeros(self._n, dtype=bool)
+            if isinstance(values, str) or not isinstance(values, Iterable):
+                values = [values]
+            codes = [self.categories[trait].index(value) for value in values if value in self.categories[trait]]
+            mask &= np.isin(self._traits[trait][:self._n], codes)
+        if used is not None:
+            mask &= self.used == used
+        if born_from is not None:
+            mask &= self.dobs >= born_from
+        if born_to is not None:
+            mask &= self.dobs <= born_to
+        return mask
+
+    def counts(self, trait: str, mask=None):
+        """
+        Count the characters with each value of a trait.
+        :param trait: Name of trait.
+        :param mask: Boolean array selecting the characters to count; if None, counts all.
+        :return: dict of trait value to count.
+        """
+        return {key[0]: count for key, count in self.group_counts([trait], mask=mask).items()}
+
+    def group_counts(self, traits: list, mask=None):
+        """
+        Count the characters with each combination of values of several traits.
+        :param traits: List of trait names.
+        :param mask: Boolean array selecting the characters to count; if None, counts all.
+        :return: dict of tuple of trait values (None where a character lacks the trait) to count.
+        """
+        self.sync()
+        columns = [self._traits[trait][:self._n] + 1 for trait in traits]
+        dims = [len(self.categories[trait]) + 1 for trait in traits]
+        if mask is not None:
+            columns = [column[mask] for column in columns]
+        keys, counts = np.unique(np.ravel_multi_index(columns, dims), return_counts=True)
+        names = [[None] + self.categories[trait] for trait in traits]
+        return {tuple(names[j][code] for j, code in enumerate(codes)): int(count) for codes, count in
+                zip(zip(*np.unravel_index(keys, dims)), counts)}
+
+
+class CharacterSequence(MutableSequence):
+    def __init__(self, character_list: 'CharacterList'):
+        """
+        List-like view of the Characters in a CharacterList, as returned by CharacterList.characters. Changes made
+        through it (append, remove, insert, del, sort, etc.) go through to the CharacterList's Population.
+        :param character_list: CharacterList to view.
+        """
+        self.character_list = character_list
+
+    def __len__(self):
+        return len(self.character_list.population)
+
+    def __getitem__(self, item):
+        return self.character_list.population[item]
+
+    def __setitem__(self, item, character: 'Character'):
+        if isinstance(item, slice):
+            raise TypeError('Slice assignment is not supported; assign to CharacterList.characters instead.')
+        self.character_list.population[item] = character
+
+    def __delitem__(self, item):
+        keep = np.ones(len(self), dtype=bool)
+        keep[item] = False
+        self.character_list.population = self.character_list.population.take(keep)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def insert(self, index: int, character: 'Character'):
+        population = self.character_list.population
+        n = len(population)
+        index = min(max(index + n if index < 0 else index, 0), n)
+        population.append(character)
+        if index < n:
+            self.character_list.population = population.take(np.concatenate([np.arange(index), [n],
+                                                                             np.arange(index, n)]))
+
+    def sort(self, key=None, reverse: bool = False):
+        """
+        Sort in place, as with list.sort(); creates every Character, so prefer the CharacterList.sort_* methods.
+        """
+        characters = list(self)
+        order = sorted(range(len(characters)), key=lambda i: characters[i] if key is None else key(characters[i]),
+                       reverse=reverse)
+        self.character_list.population = self.character_list.population.take(np.array(order, dtype=int))
 
 
 class CharacterList:
@@ -223,8 +594,9 @@ class CharacterList:
         if characters is None:
             characters = []
 
+        # Characters are stored as columns; see Population.
+        self.population = Population()
         if type(characters) is str:
-            self.characters = []
             self.read_from_file(path=characters)
         elif type(characters) is list:
             # TODO: Sanitise types in list
@@ -245,20 +617,36 @@ class CharacterList:
             self.system = None
 
     def __getitem__(self, item):
-        return self.characters[item]
+        return self.population[item]
 
     def __setitem__(self, key, value):
-        self.characters[key] = value
+        self.population[key] = value
 
     def __len__(self):
-        return len(self.characters)
+        return len(self.population)
+
+    @property
+    def characters(self):
+        """
+        List-like view of all the Characters; changes made through it go through to the CharacterList. Each Character
+        is created when first accessed, so prefer the column-wide methods for large lists.
+        """
+        return CharacterSequence(self)
+
+    @characters.setter
+    def characters(self, characters: List[Character]):
+        # Copy first, in case characters is a view of this list.
+        characters = list(characters)
+        self.population = Population(system=self.population.system)
+        for character in characters:
+            self.add_character(character=character)
 
     def __str__(self):
         string = f"Date: {self.date}\n"
         string += f"Date System: {self.system}\n"
         string += f"Location: {self.location}\n"
-        for i in range(len(self)):
-            string += str(i) + ' ' + str(self.characters[i])
+        for i, character in enumerate(self.population):
+            string += str(i) + ' ' + str(character)
         return string
 
     def add_demographic_set(self, demographic_set: Union[DemographicSet, dict], trait: str = None):
@@ -284,7 +672,7 @@ class CharacterList:
         :param character: Character to add.
         :return:
         """
-        self.characters.append(character)
+        self.population.append(character)
 
     def generate_character(self, add: bool = True):
         """
@@ -300,6 +688,24 @@ class CharacterList:
             self.add_character(character=character)
         return character
 
+    def generate_characters(self, num: int, rng: np.random.Generator = None):
+        """
+        Generate many Characters at once with random demographics using those in this CharacterList, drawing each
+        trait and the dates-of-birth for all characters in one step.
+        :param num: Number of characters to generate.
+        :param rng: numpy random Generator to use.
+        :return: Population of the new characters.
+        """
+        if rng is None:
+            rng = default_rng
+        traits = {}
+        categories = {}
+        for trait, demographic_set in self.demographics_list.items():
+            categories[trait] = demographic_set.probabilities()[0]
+            traits[trait] = demographic_set.sample(size=num, rng=rng)
+        return Population(dobs=random_dobs(num, year=self.date.year, system=self.system, rng=rng), traits=traits,
+                          categories=categories)
+
     # TODO: Method for propagating and assigning a new trait, from demographic, to existing characters.
 
     def random_character(self):
@@ -307,33 +713,41 @@ class CharacterList:
         Return a random Character from the CharacterList.
         :return: Character object selected at random from the CharacterList.
         """
-        return r.choice(self.characters)
+        return self.population[default_rng.integers(len(self))]
 
     def add_characters(self, num: int):
         """
-        Adds num randomly generated Characters (using self.gen_char()) to the CharacterList.
-        :param population: Number of Characters to add.
+        Adds num randomly generated Characters (using self.generate_characters()) to the CharacterList.
+        :param num: Number of Characters to add.
         """
-        for i in range(num):
-            self.generate_character(add=True)
+        self.population.extend(self.generate_characters(num))
 
-    def populate(self, population: int):
+    def populate(self, population: int, rng: np.random.Generator = None):
         """
         Adds or removes characters to match population.
         Characters with used==True are immune to removal.
-        :param population:
+        :param population: Number of characters to end up with; if there are more used characters than this, only the
+            used characters are kept.
+        :param rng: numpy random Generator used to choose the characters removed.
         :return:
         """
-
+        if rng is None:
+            rng = default_rng
+        excess = len(self) - population
+        if excess < 0:
+            self.add_characters(-excess)
+        elif excess > 0:
+            keep = self.population.where(used=True)
+            unused = np.flatnonzero(~keep)
+            keep[rng.choice(unused, size=max(len(unused) - excess, 0), replace=False)] = True
+            self.population = self.population.take(keep)
 
     def depopulate(self):
         """
         Removes all unused characters (ie with used==False) from the CharacterList
         :return:
         """
-        for character in self.characters:
-            if not character.used:
-                self.characters.remove(character)
+        self.population = self.population.take(self.population.where(used=True))
 
     def repopulate(self, num: int):
         """
@@ -348,7 +762,17 @@ class CharacterList:
         :return:
         """
         if trait in self.demographics_list:
-            self.characters.sort(key=lambda char: char[trait])
+            self.population.sync()
+            if trait not in self.population.categories:
+                return
+            # Rank the category codes by value, so that characters sort alphabetically by trait.
+            categories = self.population.categories[trait]
+            ranks = np.empty(len(categories) + 1, dtype=int)
+            ranks[np.argsort(np.array(categories, dtype=object))] = np.arange(len(categories))
+            # Characters without the trait (code -1) go last.
+            ranks[-1] = len(categories)
+            codes = self.population.traits[trait]
+            self.population = self.population.take(np.argsort(ranks[codes], kind='stable'))
         else:
             raise ValueError('Trait not recognised.')
 
@@ -356,13 +780,44 @@ class CharacterList:
         """
         Sort the CharacterList by name.
         """
-        self.characters.sort(key=lambda char: char.name)
+        self.population.sync()
+        self.population = self.population.take(np.argsort(self.population.names, kind='stable'))
 
     def sort_dob(self):
         """
         Sort the CharacterList by date-of-birth.
         """
-        self.characters.sort(key=lambda char: char.dob.show())
+        self.population.sync()
+        self.population = self.population.take(self.population.dobs.argsort())
+
+    def filter(self, traits: dict = None, used: bool = None, born_from=None, born_to=None):
+        """
+        Select characters by trait, used state and date-of-birth; see Population.where().
+        :return: New CharacterList of the selected characters, sharing this one's Character objects and demographics.
+        """
+        characters = CharacterList(location=self.location, demographics_list=self.demographics_list.values())
+        characters.date = self.date
+        characters.population = self.population.take(self.population.where(traits=traits, used=used,
+                                                                           born_from=born_from, born_to=born_to))
+        return characters
+
+    def counts(self, trait: str, used: bool = None):
+        """
+        Count the characters with each value of a trait.
+        :param trait: Name of trait.
+        :param used: If given, count only characters with this used state.
+        :return: dict of trait value to count.
+        """
+        return self.population.counts(trait, mask=self.population.where(used=used))
+
+    def group_counts(self, traits: list, used: bool = None):
+        """
+        Count the characters with each combination of values of several traits.
+        :param traits: List of trait names.
+        :param used: If given, count only characters with this used state.
+        :return: dict of tuple of trait values to count.
+        """
+        return self.population.group_counts(traits, mask=self.population.where(used=used))
 
     def out_dobs(self, typ: str = None):
         """
@@ -370,16 +825,12 @@ class CharacterList:
         :param typ: format of date to return; currently only supports entire date or just year.
         :return: List
         """
-        lst = list()
+        self.population.sync()
         if typ is None:
-            for char in self.characters:
-                lst.append(char.dob)
-
+            return self.population.dobs.to_dates()
         if typ == 'year':
-            for char in self.characters:
-                lst.append(char.dob.year)
-
-        return lst
+            return self.population.dobs.year.tolist()
+        return []
 
     # TODO: Read/write associated demographic sets along with the character list
 
@@ -391,13 +842,24 @@ class CharacterList:
         """
         rows = []
         names = ['No.:', 'Name:', 'Used:', 'D.O.B.:']
-        for trait in self.demographics_list:
+        self.population.sync()
+        traits = list(self.demographics_list)
+        traits += [trait for trait in self.population.categories if trait not in traits]
+        for trait in traits:
             names.append(trait + ':')
-        for i, char in enumerate(self.characters):
-            row = f'{i},{char.name},{char.used},{char.dob}'
-            for trait in char.traits:
-                row += ',' + char[trait]
-            rows.append(row)
+        # Unnamed characters are written with a blank name.
+        names_column = self.population.names.copy()
+        names_column[names_column == None] = ''
+        columns = [np.arange(len(self)).astype(str), names_column.astype(str), self.population.used.astype(str),
+                   self.population.dobs.show()]
+        for trait in traits:
+            if trait in self.population.categories:
+                values = self.population.values(trait)
+                values[values == None] = ''
+                columns.append(values)
+            else:
+                columns.append(np.full(len(self), ''))
+        rows = [','.join(row) for row in zip(*columns)]
 
         header = 'CharacterList,'
         header += f"Date:,{self.date},"
@@ -419,10 +881,20 @@ class CharacterList:
         self.date = header[2]
         self.system = header[4]
         self.location = header[6]
-        for row in rows:
-            char = Character()
-            char.used = row[2]
-            char.dob = t.Date(string=row[3])
-            for i in range(4, len(row)):
-                char[names[i]] = row[i]
-            self.add_character(character=char)
+        # Build the columns directly rather than a Character per row.
+        traits = {}
+        categories = {}
+        for i in range(4, len(names)):
+            values = np.array([row[i] if i < len(row) else '' for row in rows], dtype=object)
+            categories[names[i]], codes = np.unique(values, return_inverse=True)
+            traits[names[i]] = codes
+            if '' in categories[names[i]]:
+                # Blank entries are characters without the trait.
+                blank = list(categories[names[i]]).index('')
+                traits[names[i]] = np.where(codes == blank, -1, codes - (codes > blank))
+                categories[names[i]] = np.delete(categories[names[i]], blank)
+        self.population.extend(Population(dobs=t.parse_dates([row[3] for row in rows],
+                                                              system=self.population.system),
+                                          traits=traits, categories=categories,
+                                          names=[row[1] if row[1] else None for row in rows],
+                                          used=[row[2] for row in rows]))
@@ -1,3 +1,8 @@
+import os
+import csv
+import json
+from itertools import islice
+
 from matplotlib import pyplot as plt
 
 # TODO: Move over to cartopy
@@ -7,28 +12,22 @@ try:
 
     bmap_available = True
 except ImportError:
-    print("basemap not installed. Map plotting will not be available.")
+    print("basemap not installed. Maps will be plotted with the built-in renderer.")
     bmap_available = False
 import numpy as np
 from typing import Union, List
 from math import *
-import imageio
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import imageio.v2 as imageio
 
 from astropy import units as un
-import astropy.table as tbl
 
-from pywebofworlds.physics import units as u
+from pywebofworlds.physics import units as u, maths as ma
+from pywebofworlds import timelines
 
 
 # TODO: Interact directly with SVG?
-# TODO: Journey class; interact with date system in timelines
-# Insert function (work like list)
-
-def check_basemap():
-    if not bmap_available:
-        print("basemap is not installed; map plotting is unavailable.")
-    return bmap_available
-
 
 def lon_lat_from_x_y(x: float, y: float, scale=100):
     """
@@ -71,11 +70,12 @@ def plot_globe(file: str, centre_lat: float = 0, centre_lon: float = 0, show: bo
     :param show: Set to True to show the plot.
     :param meridians: set to True to plot meridian lines.
     :param parallels: Set to True to plot parallel lines.
-    :return: Basemap object of map.
+    :return: Basemap object of map; or, if Basemap is not installed, the Projection object drawn by plot_projection().
     """
+    if not bmap_available:
+        return plot_projection(image=read_image(file), centre_lat=centre_lat, centre_lon=centre_lon, show=show,
+                               projection='ortho', meridians=meridians, parallels=parallels)
     # Set up basemap object.
-    if not check_basemap():
-        return None
     bmap = Basemap(projection='ortho', lat_0=centre_lat, lon_0=centre_lon, resolution='l', area_thresh=1000.)
     # Draw plot.
     bmap.warpimage(image=file)
@@ -102,10 +102,12 @@ def plot_map(file: str, centre_lat: float = 0, centre_lon: float = 0, show: floa
     :param meridians: set to True to plot meridian lines.
     :param parallels: Set to True to plot parallel lines.
     :param projection: Projection type, as listed at https://matplotlib.org/basemap/users/mapsetup.html
-    :return: Basemap object for this map.
+    :return: Basemap object for this map; or, if Basemap is not installed, the Projection object drawn by
+        plot_projection(), which supports 'ortho', 'cyl', 'merc' and 'moll'.
     """
-    if not check_basemap():
-        return None
+    if not bmap_available:
+        return plot_projection(image=read_image(file), centre_lat=centre_lat, centre_lon=centre_lon, show=show,
+                               projection=projection, meridians=meridians, parallels=parallels)
     # Set up basemap object.
     bmap = Basemap(projection=projection, llcrnrlat=-90, urcrnrlat=90,
                    llcrnrlon=-180, urcrnrlon=180, resolution='c',
@@ -122,61 +124,779 @@ def plot_map(file: str, centre_lat: float = 0, centre_lon: float = 0, show: floa
     return bmap
 
 
+def read_image(file: str):
+    """
+    Reads a map image into a numpy array. Assumes the image is in a cylindrical (equirectangular) projection, with
+    north at the top and longitude -180 at the left edge.
+    :param file: Path to the image file.
+    :return: numpy array of shape (rows, columns, channels).
+    """
+    image = np.asarray(imageio.imread(file))
+    if image.ndim == 2:
+        image = image[:, :, None]
+    return image
+
+
+def wrap_lon(lon):
+    """
+    Wraps longitudes, in radians, to [-pi, pi).
+    :param lon: Longitude, or numpy array of longitudes, in radians.
+    :return: Wrapped longitude(s).
+    """
+    return (lon + pi) % (2 * pi) - pi
+
+
+# Forward and inverse projection kernels, on a sphere of radius 1. All angles are in radians; forward kernels give nan
+# for points not shown in the projection, and inverse kernels give nan for points off the map.
+# Constructed using https://en.wikipedia.org/wiki/Orthographic_map_projection,
+# https://en.wikipedia.org/wiki/Mercator_projection and https://en.wikipedia.org/wiki/Mollweide_projection
+
+def ortho_forward(lon, lat, centre_lon, centre_lat):
+    d_lon = lon - centre_lon
+    # Cosine of the angular distance from the centre of view; negative on the far side of the globe.
+    cos_c = sin(centre_lat) * np.sin(lat) + cos(centre_lat) * np.cos(lat) * np.cos(d_lon)
+    x = np.cos(lat) * np.sin(d_lon)
+    y = cos(centre_lat) * np.sin(lat) - sin(centre_lat) * np.cos(lat) * np.cos(d_lon)
+    return np.where(cos_c >= 0, x, np.nan), np.where(cos_c >= 0, y, np.nan)
+
+
+def ortho_inverse(x, y, centre_lon, centre_lat):
+    rho_sq = x ** 2 + y ** 2
+    on_globe = rho_sq <= 1.
+    cos_c = np.sqrt(np.where(on_globe, 1. - rho_sq, 0.))
+    lat = np.arcsin(np.clip(cos_c * sin(centre_lat) + y * cos(centre_lat), -1., 1.))
+    lon = centre_lon + np.arctan2(x, cos_c * cos(centre_lat) - y * sin(centre_lat))
+    return np.where(on_globe, lon, np.nan), np.where(on_globe, lat, np.nan)
+
+
+def cyl_forward(lon, lat, centre_lon, centre_lat):
+    return wrap_lon(lon - centre_lon), lat * 1.
+
+
+def cyl_inverse(x, y, centre_lon, centre_lat):
+    valid = (np.abs(x) <= pi) & (np.abs(y) <= pi / 2)
+    return np.where(valid, centre_lon + x, np.nan), np.where(valid, y, np.nan)
+
+
+# Latitude limit of the Mercator projection, in radians.
+merc_max_lat = radians(85.)
+merc_max_y = log(tan(pi / 4 + merc_max_lat / 2))
+
+
+def merc_forward(lon, lat, centre_lon, centre_lat):
+    y = np.log(np.tan(pi / 4 + np.clip(lat, -merc_max_lat, merc_max_lat) / 2))
+    return wrap_lon(lon - centre_lon), np.where(np.abs(lat) <= merc_max_lat, y, np.nan)
+
+
+def merc_inverse(x, y, centre_lon, centre_lat):
+    valid = (np.abs(x) <= pi) & (np.abs(y) <= merc_max_y)
+    return np.where(valid, centre_lon + x, np.nan), np.where(valid, np.arctan(np.sinh(y)), np.nan)
+
+
+def moll_forward(lon, lat, centre_lon, centre_lat, iterations: int = 20):
+    # Solve 2 theta + sin(2 theta) = pi sin(lat) for the auxiliary angle theta, by Newton's method on 2 theta.
+    target = pi * np.sin(lat)
+    two_theta = 2 * np.asarray(lat, dtype=float)
+    for _ in range(iterations):
+        denominator = 1. + np.cos(two_theta)
+        step = np.where(denominator > 1e-12, (two_theta + np.sin(two_theta) - target) / np.maximum(denominator, 1e-12),
+                        0.)
+        two_theta = two_theta - step
+    theta = np.where(np.abs(lat) >= pi / 2 - 1e-9, np.sign(lat) * pi / 2, two_theta / 2)
+    d_lon = wrap_lon(lon - centre_lon)
+    return 2 * sqrt(2) / pi * d_lon * np.cos(theta), sqrt(2) * np.sin(theta)
+
+
+def moll_inverse(x, y, centre_lon, centre_lat):
+    theta = np.arcsin(np.clip(y / sqrt(2), -1., 1.))
+    lat = np.arcsin(np.clip((2 * theta + np.sin(2 * theta)) / pi, -1., 1.))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_lon = pi * x / (2 * sqrt(2) * np.cos(theta))
+    valid = (np.abs(y) <= sqrt(2)) & (np.abs(d_lon) <= pi)
+    return np.where(valid, centre_lon + d_lon, np.nan), np.where(valid, lat, np.nan)
+
+
+# Supported projections, by Basemap name: forward kernel, inverse kernel and extent (x_min, x_max, y_min, y_max).
+projections = {
+    'ortho': (ortho_forward, ortho_inverse, (-1., 1., -1., 1.)),
+    'cyl': (cyl_forward, cyl_inverse, (-pi, pi, -pi / 2, pi / 2)),
+    'merc': (merc_forward, merc_inverse, (-pi, pi, -merc_max_y, merc_max_y)),
+    'moll': (moll_forward, moll_inverse, (-2 * sqrt(2), 2 * sqrt(2), -sqrt(2), sqrt(2))),
+}
+
+# Per-pixel longitude and latitude grids for a centre longitude of 0, keyed by (projection, centre_lat, size); least
+# recently used grids are dropped beyond grid_cache_size.
+_grid_cache = OrderedDict()
+grid_cache_size = 32
+# Graticule polylines, keyed by (projection, centre_lon, centre_lat, meridians, parallels, spacing).
+_graticule_cache = {}
+
+
+class Projection:
+    def __init__(self, projection: str = 'ortho', centre_lat: float = 0, centre_lon: float = 0):
+        """
+        A map projection of the globe, implemented with numpy so that maps can be drawn without Basemap. Projected
+        coordinates are on a sphere of radius 1. Mimics the parts of the Basemap interface used in this module: calling
+        the object projects longitudes and latitudes, and plot() accepts latlon=True.
+        :param projection: Projection type: 'ortho', 'cyl', 'merc' or 'moll'.
+        :param centre_lat: Latitude to show at centre, in degrees. Only used by 'ortho'.
+        :param centre_lon: Longitude to show at centre, in degrees.
+        """
+        if projection not in projections:
+            raise ValueError(f"Projection {projection} not supported; use one of {list(projections)}.")
+        self.projection = projection
+        self.centre_lat = centre_lat
+        self.centre_lon = centre_lon
+        self._forward, self._inverse, self.extent = projections[projection]
+        self.ax = None
+
+    def __call__(self, lon, lat):
+        """
+        Projects longitudes and latitudes, in degrees, to map coordinates.
+        :param lon: Longitude, or numpy array of longitudes.
+        :param lat: Latitude, or numpy array of latitudes.
+        :return: tuple of x and y, nan for points not shown.
+        """
+        return self._forward(np.radians(lon), np.radians(lat), radians(self.centre_lon), radians(self.centre_lat))
+
+    def inverse(self, x, y):
+        """
+        Converts map coordinates back to longitudes and latitudes.
+        :param x: x-coordinate, or numpy array of x-coordinates.
+        :param y: y-coordinate, or numpy array of y-coordinates.
+        :return: tuple of longitude and latitude in degrees, wrapped to [-180, 180), nan for points off the map.
+        """
+        lon, lat = self._inverse(np.asarray(x, dtype=float), np.asarray(y, dtype=float), radians(self.centre_lon),
+                                 radians(self.centre_lat))
+        return np.degrees(wrap_lon(lon)), np.degrees(lat)
+
+    def shape(self, size: int):
+        """
+        :param size: Width of the rendered map, in pixels.
+        :return: tuple of height and width of the rendered map, in pixels, keeping the aspect ratio of the projection.
+        """
+        x_min, x_max, y_min, y_max = self.extent
+        return max(1, int(round(size * (y_max - y_min) / (x_max - x_min)))), size
+
+    def lon_lat_grid(self, size: int):
+        """
+        Longitude and latitude at the centre of each pixel of the rendered map. Grids are cached, so that repeated
+        renders of the same view only need an array lookup. Changing the centre longitude only shifts the longitudes,
+        so views that differ only in longitude, such as the frames of a rotating gif, share one cached grid.
+        :param size: Width of the rendered map, in pixels.
+        :return: tuple of numpy arrays, longitude and latitude in degrees, nan off the map. Do not modify in place.
+        """
+        key = (self.projection, self.centre_lat, size)
+        if key in _grid_cache:
+            _grid_cache.move_to_end(key)
+            lon, lat = _grid_cache[key]
+        else:
+            x_min, x_max, y_min, y_max = self.extent
+            height, width = self.shape(size)
+            x = x_min + (np.arange(width) + 0.5) / width * (x_max - x_min)
+            y = y_max - (np.arange(height) + 0.5) / height * (y_max - y_min)
+            lon, lat = Projection(self.projection, centre_lat=self.centre_lat, centre_lon=0.).inverse(
+                *np.meshgrid(x, y))
+
+            _grid_cache[key] = lon, lat
+            while len(_grid_cache) > grid_cache_size:
+                _grid_cache.popitem(last=False)
+        if self.centre_lon % 360.:
+            lon = (lon + self.centre_lon + 180.) % 360. - 180.
+        return lon, lat
+
+    def graticule(self, meridians: bool = True, parallels: bool = True, spacing: float = 30.):
+        """
+        Meridians and parallels as polylines in map coordinates, calculated once per view. Lines are broken with nan
+        where they leave the map or wrap around its edge.
+        :param meridians: set to True to include meridian lines.
+        :param parallels: Set to True to include parallel lines.
+        :param spacing: Spacing of lines, in degrees.
+        :return: list of tuples of numpy arrays (x, y).
+        """
+        key = (self.projection, self.centre_lon, self.centre_lat, meridians, parallels, spacing)
+        if key in _graticule_cache:
+            return _graticule_cache[key]
+
+        lines = []
+        along = np.linspace(-90., 90., 181)
+        if meridians:
+            for lon in np.arange(0., 360., spacing):
+                lines.append(self(np.full_like(along, lon), along))
+        along = np.linspace(-180., 180., 361)
+        if parallels:
+            for lat in np.arange(-90. + spacing, 90., spacing):
+                lines.append(self(along, np.full_like(along, lat)))
+        width = self.extent[1] - self.extent[0]
+        for i, (x, y) in enumerate(lines):
+            # Break lines that jump across the map at its edge.
+            jumps = np.flatnonzero(np.abs(np.diff(x)) > width / 2) + 1
+            lines[i] = np.insert(x, jumps, np.nan), np.insert(y, jumps, np.nan)
+
+        _graticule_cache[key] = lines
+        return lines
+
+    def boundary(self):
+        """
+        :return: tuple of numpy arrays (x, y), the outline of the map.
+        """
+        t = np.linspace(0, 2 * pi, 361)
+        x_min, x_max, y_min, y_max = self.extent
+        if self.projection in ('ortho', 'moll'):
+            return x_max * np.cos(t), y_max * np.sin(t)
+        return np.array([x_min, x_max, x_max, x_min, x_min]), np.array([y_min, y_min, y_max, y_max, y_min])
+
+    def render(self, image: Union[np.ndarray, "MapPyramid"], size: int = 500, meridians: bool = False,
+               parallels: bool = False, background: int = 255):
+        """
+        Resamples a cylindrical map image onto this projection.
+        :param image: Image array, as returned by read_image(); or a MapPyramid, of which only the tiles in view are
+            read, at the coarsest level that matches the resolution of the render.
+        :param size: Width of the rendered map, in pixels.
+        :param meridians: set to True to draw meridian lines into the pixels.
+        :param parallels: Set to True to draw parallel lines into the pixels.
+        :param background: Value of pixels off the map.
+        :return: numpy array of shape (height, width, channels), of the same dtype as image.
+        """
+        lon, lat = self.lon_lat_grid(size)
+        if isinstance(image, MapPyramid):
+            # Pixels per 2 pi radians of longitude at the centre of the view.
+            columns = 2 * pi * size / (self.extent[1] - self.extent[0])
+            frame = image.sample(lon, lat, level=image.level_for(columns), background=background)
+        else:
+            index = image_lookup(lon, lat, image.shape)
+            off_map = index < 0
+            frame = image.reshape(-1, image.shape[2])[np.where(off_map, 0, index)]
+            frame[off_map] = background
+        if meridians or parallels:
+            frame[graticule_mask(lon, lat, meridians=meridians, parallels=parallels)] = 0
+        return frame
+
+    def draw(self, image: Union[np.ndarray, "MapPyramid"], size: int = 1000, meridians: bool = True,
+             parallels: bool = True, ax=None):
+        """
+        Draws the map with matplotlib, with meridians and parallels as lines over the image.
+        :param image: Image array, as returned by read_image(), or MapPyramid.
+        :param size: Width of the rendered image, in pixels.
+        :param meridians: set to True to plot meridian lines.
+        :param parallels: Set to True to plot parallel lines.
+        :param ax: matplotlib Axes on which to draw; defaults to the current Axes.
+        :return: This Projection.
+        """
+        if ax is None:
+            ax = plt.gca()
+        self.ax = ax
+        frame = self.render(image, size=size)
+        ax.imshow(frame[:, :, 0] if frame.shape[2] == 1 else frame, extent=self.extent, origin='upper',
+                  cmap='gray' if frame.shape[2] == 1 else None)
+        for x, y in self.graticule(meridians=meridians, parallels=parallels):
+            ax.plot(x, y, 'k-', linewidth=0.5)
+        ax.plot(*self.boundary(), 'k-', linewidth=1.)
+        ax.set_aspect('equal')
+        ax.axis('off')
+        return self
+
+    def plot(self, lon, lat, *args, latlon: bool = True, **kwargs):
+        """
+        Plots on the map, as with matplotlib's plot().
+        :param lon: Longitude(s), in degrees; or x-coordinates if latlon is False.
+        :param lat: Latitude(s), in degrees; or y-coordinates if latlon is False.
+        :param latlon: Interpret lon and lat as longitude and latitude?
+        :return: List of matplotlib Line2D objects.
+        """
+        if latlon:
+            lon, lat = self(lon, lat)
+        ax = self.ax if self.ax is not None else plt.gca()
+        return ax.plot(lon, lat, *args, **kwargs)
+
+
+def plot_projection(image: Union[np.ndarray, "MapPyramid"], centre_lat: float = 0, centre_lon: float = 0,
+                    show: bool = True, projection: str = 'ortho', meridians: bool = True, parallels: bool = True,
+                    size: int = 1000):
+    """
+    Plots the map to the projection specified, using the built-in numpy renderer rather than Basemap.
+    :param image: Image array, as returned by read_image(), or MapPyramid.
+    :param centre_lat: Latitude to show at centre.
+    :param centre_lon: Longitude to show at centre.
+    :param show: Set to True to show the plot.
+    :param projection: Projection type: 'ortho', 'cyl', 'merc' or 'moll'.
+    :param meridians: set to True to plot meridian lines.
+    :param parallels: Set to True to plot parallel lines.
+    :param size: Width of the rendered image, in pixels.
+    :return: Projection object for this map.
+    """
+    proj = Projection(projection=projection, centre_lat=centre_lat, centre_lon=centre_lon)
+    proj.draw(image, size=size, meridians=meridians, parallels=parallels)
+    if show:
+        plt.show()
+    return proj
+
+
+def image_lookup(lon, lat, shape: tuple):
+    """
+    Finds the pixels of a cylindrical map image lying at the given longitudes and latitudes, as indices into the
+    flattened image. Computing this once for a view means each frame is rendered with a single array lookup.
+    :param lon: numpy array of longitudes, in degrees; nan for points with no image.
+    :param lat: numpy array of latitudes, in degrees; nan for points with no image.
+    :param shape: Shape of the image array.
+    :return: numpy array of flat pixel indices, the same shape as lon, with -1 where lon or lat is nan.
+    """
+    rows, cols = shape[0], shape[1]
+    valid = np.isfinite(lon) & np.isfinite(lat)
+    lon, lat = np.where(valid, lon, 0.), np.where(valid, lat, 0.)
+    row = np.clip(((90. - lat) / 180. * rows).astype(np.int64), 0, rows - 1)
+    col = np.clip((((lon + 180.) % 360.) / 360. * cols).astype(np.int64), 0, cols - 1)
+    return np.where(valid, row * cols + col, -1)
+
+
+def graticule_mask(lon, lat, meridians: bool = True, parallels: bool = True, spacing: float = 30.):
+    """
+    Rasterises meridians and parallels onto a grid of pixels, by marking the pixels where the grid cell changes from
+    one pixel to the next. The edge of the globe is marked as well.
+    :param lon: numpy array of per-pixel longitudes, in degrees; nan off the map.
+    :param lat: numpy array of per-pixel latitudes, in degrees; nan off the map.
+    :param meridians: set to True to mark meridian lines.
+    :param parallels: Set to True to mark parallel lines.
+    :param spacing: Spacing of lines, in degrees.
+    :return: Boolean numpy array, True on the lines.
+    """
+    mask = np.zeros(lon.shape, dtype=bool)
+    cells = []
+    if meridians:
+        cells.append(np.floor(lon / spacing))
+    if parallels:
+        cells.append(np.floor(lat / spacing))
+    for cell in cells:
+        mask[:, 1:] |= cell[:, 1:] != cell[:, :-1]
+        mask[1:, :] |= cell[1:, :] != cell[:-1, :]
+    return mask & np.isfinite(lon)
+
+
+def region_bounds(shape: tuple, lon_min: float, lon_max: float, lat_min: float, lat_max: float):
+    """
+    Finds the rows and columns of a cylindrical map image covering a range of longitude and latitude.
+    :param shape: Shape of the image array.
+    :param lon_min: Western edge, in degrees, from -180.
+    :param lon_max: Eastern edge, in degrees, up to 180.
+    :param lat_min: Southern edge, in degrees.
+    :param lat_max: Northern edge, in degrees.
+    :return: tuple of ints (first row, row after last, first column, column after last).
+    """
+    rows, cols = shape[0], shape[1]
+    row_start = int(np.clip(np.floor((90. - lat_max) / 180. * rows), 0, rows - 1))
+    row_stop = int(np.clip(np.ceil((90. - lat_min) / 180. * rows), row_start + 1, rows))
+    col_start = int(np.clip(np.floor((lon_min + 180.) / 360. * cols), 0, cols - 1))
+    col_stop = int(np.clip(np.ceil((lon_max + 180.) / 360. * cols), col_start + 1, cols))
+    return row_start, row_stop, col_start, col_stop
+
+
+def downsample(image: np.ndarray, block_rows: int = 1024):
+    """
+    Halves the resolution of an image by averaging each 2x2 block of pixels. Works through the image in strips, so that
+    large (or memory-mapped) images are not converted to float all at once.
+    :param image: Image array of shape (rows, columns, channels). An odd last row or column is dropped.
+    :param block_rows: Number of output rows to calculate at a time.
+    :return: numpy array of shape (rows // 2, columns // 2, channels), of the same dtype as image.
+    """
+    rows, cols, channels = image.shape[0] // 2, image.shape[1] // 2, image.shape[2]
+    small = np.empty((rows, cols, channels), dtype=image.dtype)
+    for start in range(0, rows, block_rows):
+        stop = min(start + block_rows, rows)
+        strip = image[2 * start:2 * stop, :2 * cols].reshape(stop - start, 2, cols, 2, channels).mean(axis=(1, 3))
+        if np.issubdtype(image.dtype, np.integer):
+            strip = np.rint(strip)
+        small[start:stop] = strip
+    return small
+
+
+def build_pyramid(image: Union[str, np.ndarray], directory: str, tile_size: int = 512):
+    """
+    Splits a cylindrical map image into a tiled, multi-resolution pyramid on disk. Level 0 is the full image; each
+    further level halves the resolution, until the whole image fits within one tile. Each tile is saved as a .npy file,
+    so that it can be memory-mapped and only the tiles needed for a view are read.
+    :param image: Path to the image file (a .npy file is memory-mapped rather than read in full), or image array.
+    :param directory: Directory in which to save the pyramid.
+    :param tile_size: Width and height of tiles, in pixels.
+    :return: MapPyramid object.
+    """
+    if isinstance(image, str):
+        if image.endswith('.npy'):
+            image = np.load(image, mmap_mode='r')
+        else:
+            image = read_image(image)
+    if image.ndim == 2:
+        image = image[:, :, None]
+
+    shapes = []
+    level = image
+    while True:
+        level_dir = os.path.join(directory, str(len(shapes)))
+        os.makedirs(level_dir, exist_ok=True)
+        for row in range(0, level.shape[0], tile_size):
+            for col in range(0, level.shape[1], tile_size):
+                np.save(os.path.join(level_dir, f"{row // tile_size}_{col // tile_size}.npy"),
+                        np.ascontiguousarray(level[row:row + tile_size, col:col + tile_size]))
+        shapes.append(list(level.shape))
+        if max(level.shape[:2]) <= tile_size or min(level.shape[:2]) < 2:
+            break
+        level = downsample(level)
+
+    with open(os.path.join(directory, "pyramid.json"), "w") as file:
+        json.dump({"tile_size": tile_size, "shapes": shapes, "dtype": str(image.dtype)}, file)
+    return MapPyramid(directory)
+
+
+class MapPyramid:
+    def __init__(self, directory: str):
+        """
+        A tiled, multi-resolution map image, as written by build_pyramid(). Tiles are memory-mapped when first needed,
+        so that lookups and renders only read the tiles and resolution level that they use.
+        :param directory: Directory containing the pyramid.
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "pyramid.json")) as file:
+            meta = json.load(file)
+        self.tile_size = meta["tile_size"]
+        self.shapes = [tuple(shape) for shape in meta["shapes"]]
+        self.dtype = np.dtype(meta["dtype"])
+        self.channels = self.shapes[0][2]
+        # Memory-mapped tiles, keyed by (level, tile row, tile column).
+        self._tiles = {}
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __getstate__(self):
+        # Memory maps are reopened by each process rather than pickled.
+        state = self.__dict__.copy()
+        state["_tiles"] = {}
+        return state
+
+    def tile(self, level: int, row: int, col: int):
+        """
+        :param level: Resolution level; 0 is the full-resolution image.
+        :param row: Row of the tile within the level.
+        :param col: Column of the tile within the level.
+        :return: Memory-mapped numpy array of the tile.
+        """
+        key = (level, row, col)
+        if key not in self._tiles:
+            self._tiles[key] = np.load(os.path.join(self.directory, str(level), f"{row}_{col}.npy"), mmap_mode='r')
+        return self._tiles[key]
+
+    def scale(self, level: int = 0):
+        """
+        :param level: Resolution level.
+        :return: float, pixels per degree at this level, for use with lon_lat_from_x_y() and x_y_from_lon_lat().
+        """
+        return self.shapes[level][1] / 360.
+
+    def level_for(self, columns: float):
+        """
+        Chooses the coarsest level with at least the given horizontal resolution.
+        :param columns: Number of pixels needed to span 360 degrees of longitude.
+        :return: int, resolution level; 0 if no level is fine enough.
+        """
+        for level in range(len(self.shapes) - 1, -1, -1):
+            if self.shapes[level][1] >= columns:
+                return level
+        return 0
+
+    def lon_lat_from_x_y(self, x, y, level: int = 0):
+        """
+        Converts pixel coordinates at a level of the pyramid to longitude and latitude.
+        :param x: x-coordinate, counting pixels eastwards from longitude -180.
+        :param y: y-coordinate, counting pixels northwards from latitude -90.
+        :param level: Resolution level.
+        :return: tuple of longitude and latitude, in degrees.
+        """
+        return lon_lat_from_x_y(x=x, y=y, scale=self.scale(level))
+
+    def x_y_from_lon_lat(self, lon, lat, level: int = 0):
+        """
+        Converts longitude and latitude to pixel coordinates at a level of the pyramid.
+        :param lon: Longitude, in degrees.
+        :param lat: Latitude, in degrees.
+        :param level: Resolution level.
+        :return: tuple of x and y; see lon_lat_from_x_y().
+        """
+        return x_y_from_lon_lat(lat=lat, lon=lon, scale=self.scale(level))
+
+    def sample(self, lon, lat, level: int = 0, background: int = 255):
+        """
+        Looks up the pixels at the given longitudes and latitudes, reading only the tiles that contain them.
+        :param lon: numpy array of longitudes, in degrees; nan for points with no image.
+        :param lat: numpy array of latitudes, in degrees; nan for points with no image.
+        :param level: Resolution level.
+        :param background: Value given to points with no image.
+        :return: numpy array of shape lon.shape + (channels,).
+        """
+        rows, cols = self.shapes[level][:2]
+        index = image_lookup(lon, lat, (rows, cols)).ravel()
+        values = np.full((index.size, self.channels), background, dtype=self.dtype)
+        points = np.flatnonzero(index >= 0)
+        row, col = np.divmod(index[points], cols)
+        tile_row, tile_col = row // self.tile_size, col // self.tile_size
+        tile_id = tile_row * (cols // self.tile_size + 1) + tile_col
+        # Group points by tile, so that each tile is visited once.
+        order = np.argsort(tile_id, kind='stable')
+        starts = np.flatnonzero(np.diff(tile_id[order], prepend=-1))
+        for group in np.split(order, starts[1:]):
+            if group.size == 0:
+                continue
+            t_row, t_col = tile_row[group[0]], tile_col[group[0]]
+            tile = self.tile(level, t_row, t_col)
+            values[points[group]] = tile[row[group] - t_row * self.tile_size, col[group] - t_col * self.tile_size]
+        return values.reshape(np.shape(lon) + (self.channels,))
+
+    def region(self, lon_min: float, lon_max: float, lat_min: float, lat_max: float, level: int = 0):
+        """
+        Assembles the part of the image within a range of longitude and latitude from the tiles that cover it.
+        :param lon_min: Western edge, in degrees, from -180.
+        :param lon_max: Eastern edge, in degrees, up to 180.
+        :param lat_min: Southern edge, in degrees.
+        :param lat_max: Northern edge, in degrees.
+        :param level: Resolution level.
+        :return: numpy array of shape (rows, columns, channels).
+        """
+        row_start, row_stop, col_start, col_stop = region_bounds(self.shapes[level], lon_min, lon_max, lat_min,
+                                                                 lat_max)
+        region = np.empty((row_stop - row_start, col_stop - col_start, self.channels), dtype=self.dtype)
+        ts = self.tile_size
+        for t_row in range(row_start // ts, (row_stop - 1) // ts + 1):
+            for t_col in range(col_start // ts, (col_stop - 1) // ts + 1):
+                tile = self.tile(level, t_row, t_col)
+                r0, r1 = max(row_start, t_row * ts), min(row_stop, (t_row + 1) * ts)
+                c0, c1 = max(col_start, t_col * ts), min(col_stop, (t_col + 1) * ts)
+                region[r0 - row_start:r1 - row_start, c0 - col_start:c1 - col_start] = \
+                    tile[r0 - t_row * ts:r1 - t_row * ts, c0 - t_col * ts:c1 - t_col * ts]
+        return region
+
+
+def render_orthographic(image: Union[np.ndarray, MapPyramid], centre_lat: float = 0, centre_lon: float = 0,
+                        size: int = 500, meridians: bool = True, parallels: bool = True, background: int = 255):
+    """
+    Renders an orthographic view of the globe from a cylindrical map image, without Basemap.
+    :param image: Image array, as returned by read_image(), or MapPyramid.
+    :param centre_lat: Latitude to show at centre.
+    :param centre_lon: Longitude to show at centre.
+    :param size: Width and height of the rendered frame, in pixels.
+    :param meridians: set to True to draw meridian lines.
+    :param parallels: Set to True to draw parallel lines.
+    :param background: Value of pixels off the globe.
+    :return: numpy array of shape (size, size, channels), of the same dtype as image.
+    """
+    return Projection(projection='ortho', centre_lat=centre_lat, centre_lon=centre_lon).render(
+        image, size=size, meridians=meridians, parallels=parallels, background=background)
+
+
+# Map image (or MapPyramid) held by each worker process of Map.plot_gif(); set once per process by _init_frame_worker(),
+# so that the image is not sent again with every frame.
+_frame_image = None
+
+
+def _init_frame_worker(image: Union[np.ndarray, MapPyramid]):
+    global _frame_image
+    _frame_image = image
+
+
+def _render_frame(view: tuple):
+    centre_lat, centre_lon, size, meridians, parallels = view
+    return render_orthographic(_frame_image, centre_lat=centre_lat, centre_lon=centre_lon, size=size,
+                               meridians=meridians, parallels=parallels)
+
+
+def _gif_frame(frame: np.ndarray):
+    # Single-channel frames are written to gifs as greyscale.
+    return frame[:, :, 0] if frame.shape[2] == 1 else frame
+
+
 def great_circle_ang_dist(lon1: float, lat1: float, lon2: float, lat2: float, deg: bool = True):
     """
-    Calculates the great circle angular distance between two points on the map, in degrees. All units are interpreted as
-    degrees unless deg is given as False, in which case all units are interpreted as radians.
+    Calculates the great circle angular distance between two points on the map, in radians. Longitudes and latitudes
+    are interpreted as degrees unless deg is given as False, in which case they are interpreted as radians; the result
+    is in radians either way. Accepts numpy arrays, which are broadcast against each other.
+    Uses the special case of the Vincenty formula for a sphere, which, unlike the spherical law of cosines, stays
+    accurate for nearby and antipodal points.
     Constructed using https://en.wikipedia.org/wiki/Great-circle_distance
     :param lon1: Longitude of first point.
     :param lat1: Latitude of first point.
     :param lon2: Longitude of second point.
     :param lat2: Latitude of second points.
-    :param deg: Interpret units as degrees? If False, interprets as radians.
-    :return: float, great circle angular distance, in radians.
+    :param deg: Interpret longitudes and latitudes as degrees? If False, interprets them as radians.
+    :return: float or numpy array, great circle angular distance, in radians.
     """
 
     # Convert to radians.
     if deg:
-        lon1 = radians(lon1)
-        lon2 = radians(lon2)
-        lat1 = radians(lat1)
-        lat2 = radians(lat2)
+        lon1 = np.radians(lon1)
+        lon2 = np.radians(lon2)
+        lat1 = np.radians(lat1)
+        lat2 = np.radians(lat2)
+
+    return vincenty_kernel(np.sin(lat1), np.cos(lat1), np.sin(lat2), np.cos(lat2), lon2 - lon1)
+
+
+def vincenty_kernel(sin_lat1, cos_lat1, sin_lat2, cos_lat2, delta_lon):
+    """
+    Great circle angular distance by the Vincenty formula, from precomputed sines and cosines of the latitudes, so that
+    they can be reused across many pairs. Accepts numpy arrays, which are broadcast against each other.
+    :return: Angular distance, in radians.
+    """
+    cos_delta = np.cos(delta_lon)
+    y = np.hypot(cos_lat2 * np.sin(delta_lon), cos_lat1 * sin_lat2 - sin_lat1 * cos_lat2 * cos_delta)
+    x = sin_lat1 * sin_lat2 + cos_lat1 * cos_lat2 * cos_delta
+    return np.arctan2(y, x)
+
+
+def great_circle_ang_dist_matrix(lon1, lat1, lon2=None, lat2=None, deg: bool = True, block_size: int = 2 ** 22):
+    """
+    Calculates the great circle angular distances between every pair of points from two sets, in blocks of rows so that
+    memory use stays bounded for large sets.
+    :param lon1: Array of longitudes of the first set of points.
+    :param lat1: Array of latitudes of the first set of points.
+    :param lon2: Array of longitudes of the second set of points; if None, the first set is used.
+    :param lat2: Array of latitudes of the second set of points; if None, the first set is used.
+    :param deg: Interpret units as degrees? If False, interprets as radians.
+    :param block_size: Maximum number of pairs to compute at once.
+    :return: numpy array of shape (len(lon1), len(lon2)), angular distances in radians.
+    """
+    lon1 = np.asarray(lon1, dtype=float).ravel()
+    lat1 = np.asarray(lat1, dtype=float).ravel()
+    if lon2 is None or lat2 is None:
+        lon2, lat2 = lon1, lat1
+    lon2 = np.asarray(lon2, dtype=float).ravel()
+    lat2 = np.asarray(lat2, dtype=float).ravel()
+    if deg:
+        lon1, lat1, lon2, lat2 = np.radians(lon1), np.radians(lat1), np.radians(lon2), np.radians(lat2)
+
+    sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+    sin_lat2, cos_lat2 = np.sin(lat2), np.cos(lat2)
 
-    delta_lon = lon2 - lon1
-    # Perform calculation.
-    return acos(sin(lat1) * sin(lat2) + cos(lat1) * cos(lat2) * cos(delta_lon))
+    matrix = np.empty((len(lon1), len(lon2)))
+    rows = max(1, block_size // max(len(lon2), 1))
+    for start in range(0, len(lon1), rows):
+        block = slice(start, start + rows)
+        matrix[block] = vincenty_kernel(sin_lat1[block, None], cos_lat1[block, None], sin_lat2[None, :],
+                                        cos_lat2[None, :], lon2[None, :] - lon1[block, None])
+    return matrix
 
 
-def great_circle_distance(lon1: float, lat1: float, lon2: float, lat2: float, radius: float = 6371e3, deg: bool = True):
+def great_circle_distance(lon1: float, lat1: float, lon2: float, lat2: float, radius: float = 6371e3, deg: bool = True,
+                          quantity: bool = True):
     """
     Calculates the great circle distance between two points on the map, in metres. All units are interpreted as degrees
-    unless deg is given as False, in which case all units are interpreted as radians.
+    unless deg is given as False, in which case all units are interpreted as radians. Accepts numpy arrays, which are
+    broadcast against each other.
     Constructed using https://en.wikipedia.org/wiki/Great-circle_distance
     :param lon1: Longitude of first point.
     :param lat1: Latitude of first point.
     :param lon2: Longitude of second point.
     :param lat2: Latitude of second points.
     :param deg: Interpret units as degrees? If False, interprets as radians.
-    :param radius: Radius of the planet, in metres.
+    :param radius: Radius of the planet, in metres, or as an astropy Quantity.
+    :param quantity: If True, returns an astropy Quantity; if False, a plain float (or array) in metres.
     :return: float, great circle distance, in metres.
     """
-    if type(radius) is not un.Quantity:
-        radius *= un.m
-    # Calculate great circle angular distance.
-    ang_dist = great_circle_ang_dist(lon1=lon1, lat1=lat1, lon2=lon2, lat2=lat2, deg=deg)
-    # Multiply by radius of planet.
-    return radius * ang_dist
+    # Calculate great circle angular distance, and multiply by radius of planet.
+    distance = to_si(radius, "m", "length") * great_circle_ang_dist(lon1=lon1, lat1=lat1, lon2=lon2, lat2=lat2, deg=deg)
+    if quantity:
+        return distance * un.m
+    return distance
+
+
+def lon_lat_to_vectors(lon, lat, deg: bool = True):
+    """
+    Converts longitudes and latitudes to unit vectors from the centre of the planet, for spatial indexing.
+    :param lon: Longitude, or array of longitudes.
+    :param lat: Latitude, or array of latitudes.
+    :param deg: Interpret units as degrees? If False, interprets as radians.
+    :return: numpy array of shape (n, 3).
+    """
+    lon = np.asarray(lon, dtype=float).ravel()
+    lat = np.asarray(lat, dtype=float).ravel()
+    if deg:
+        lon, lat = np.radians(lon), np.radians(lat)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
 
 
-def travel_to(lon: float, lat: float, direction: float, radius: float = 6371e3):
+# Base units of physics.units, and their astropy equivalents, used by to_si().
+si_units = {"length": ("m", un.m), "velocity": ("m_s", un.m / un.s), "time": ("s", un.s)}
+
+
+def to_si(value, units: str, quantity: str):
+    """
+    Converts a value to a plain float (or numpy array) in SI base units: metres, metres per second or seconds. The
+    travel calculations call this once on their arguments, so that the arithmetic itself is done on plain numbers rather
+    than astropy Quantities.
+    :param value: Number, numpy array or astropy Quantity. A Quantity carries its own units, and units is ignored.
+    :param units: Units of value, if it is not a Quantity, as named in physics.units (eg "km", "km/h", "hr").
+    :param quantity: "length", "velocity" or "time".
+    :return: float or numpy array.
     """
+    base, si = si_units[quantity]
+    if isinstance(value, un.Quantity):
+        return value.to_value(si)
+    return value * u.conversion_factor(units, base, quantity)
 
-    :param lon:
-    :param lat:
-    :param direction: In degrees.
-    :param radius:
-    :return:
+
+def seconds_per_day(time_per_day):
+    """
+    Converts a daily travel time to seconds per day.
+    :param time_per_day: Hours of travel per day, or an astropy Quantity of time (per day), eg 7.5 * un.hour / un.day.
+    :return: float
+    """
+    if isinstance(time_per_day, un.Quantity) and time_per_day.unit.physical_type != "time":
+        return time_per_day.to_value(un.s / un.day)
+    return to_si(time_per_day, "hr", "time")
+
+
+def days_to_travel(distance, speed, time_per_day):
+    """
+    Plain-number core of Location.travel_days(). Accepts numpy arrays, which are broadcast against each other.
+    :param distance: Distance, in metres.
+    :param speed: Speed, in metres per second.
+    :param time_per_day: Time spent travelling each day, in seconds.
+    :return: Number of days of travel.
+    """
+    return distance / speed / time_per_day
+
+
+def travel_to(lon: float, lat: float, direction: float, distance: float, radius: float = 6371e3, units: str = "m",
+              deg: bool = True):
+    """
+    Calculates the destination reached by travelling a given distance along a great circle from a starting point, at a
+    given initial bearing. Accepts numpy arrays, which are broadcast against each other, so that many travellers can be
+    moved at once.
+    Constructed using https://www.movable-type.co.uk/scripts/latlong.html
+    :param lon: Longitude of starting point.
+    :param lat: Latitude of starting point.
+    :param direction: Initial bearing, clockwise from north.
+    :param distance: Distance travelled, in units, or as an astropy Quantity.
+    :param radius: Radius of the planet, in metres, or as an astropy Quantity.
+    :param units: Units of distance, as named in physics.units.
+    :param deg: Interpret lon, lat and direction as degrees, and return degrees? If False, uses radians.
+    :return: tuple of longitude and latitude of destination; floats, or numpy arrays if any argument is an array.
+        Longitudes are wrapped to [-180, 180) degrees (or [-pi, pi) radians).
     """
+    lon, lat, direction = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float), np.asarray(direction, dtype=float)
+    if deg:
+        lon, lat, direction = np.radians(lon), np.radians(lat), np.radians(direction)
+    # Angular distance travelled.
+    delta = np.asarray(to_si(distance, units, "length"), dtype=float) / to_si(radius, "m", "length")
+
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_delta, cos_delta = np.sin(delta), np.cos(delta)
+    sin_lat2 = np.clip(sin_lat * cos_delta + cos_lat * sin_delta * np.cos(direction), -1., 1.)
+    lat2 = np.arcsin(sin_lat2)
+    lon2 = lon + np.arctan2(np.sin(direction) * sin_delta * cos_lat, cos_delta - sin_lat * sin_lat2)
+    lon2 = (lon2 + pi) % (2 * pi) - pi
+
+    if deg:
+        lon2, lat2 = np.degrees(lon2), np.degrees(lat2)
+    if lon2.ndim == 0:
+        return float(lon2), float(lat2)
+    return lon2, lat2
 
 
 location_types = ['city', 'natural']
@@ -198,111 +918,280 @@ class Location:
         self.lon = lon
         self.lat = lat
         self.type = typ
-        self.map = this_map
-        if self.map is not None:
-            self.map.add_location(self)
+        # Set by Map.add_location(), which is skipped if the location is already on the map.
+        self.map = None
+        if this_map is not None:
+            this_map.add_location(self)
 
     def __str__(self):
         return f"{self.name}; {self.type} at longitude = {self.lon}, latitude = {self.lat}"
 
-    def distance_to(self, other):
+    def distance_to(self, other, quantity: bool = True):
         """
         Calculates the great circle distance from this location to another location object, assuming both are on the
         same Map, in metres. All units are interpreted as degrees unless deg is given as False, in which case all units
         are interpreted as radians.
         Constructed using https://en.wikipedia.org/wiki/Great-circle_distance
         :param other: other location object.
+        :param quantity: If True, returns an astropy Quantity; if False, a plain float in metres.
         :return: float, great circle distance, in metres.
         """
         if self.map is not None:
             distance = great_circle_distance(lon1=self.lon, lat1=self.lat, lon2=other.lon, lat2=other.lat,
-                                             radius=self.map.planet_radius)
+                                             radius=self.map.planet_radius, quantity=quantity)
         else:
-            distance = great_circle_distance(lon1=self.lon, lat1=self.lat, lon2=other.lon, lat2=other.lat)
+            distance = great_circle_distance(lon1=self.lon, lat1=self.lat, lon2=other.lon, lat2=other.lat,
+                                             quantity=quantity)
         return distance
 
-    def travel_time(self, other, speed: float = 4., units: str = "m/s"):
+    def travel_time(self, other, speed: float = 4., units: str = "m/s", quantity: bool = True):
         """
-
-        :param other:
-        :param speed:
-        :param units:
-        :return:
+        Calculates the time taken to travel from this location to another at a constant speed.
+        :param other: other location object.
+        :param speed: Travel speed, in units, or as an astropy Quantity.
+        :param units: Units of speed, as named in physics.units.
+        :param quantity: If True, returns an astropy Quantity; if False, a plain float in seconds.
+        :return: Travel time, in seconds.
         """
-        if speed is not un.Quantity:
-            speed = un.Quantity(speed, units)
-        distance = self.distance_to(other)
-        # u.velocity_to_m_s(v=speed, units=units)
-        time = distance / speed
+        time = self.distance_to(other, quantity=False) / to_si(speed, units, "velocity")
+        if quantity:
+            return time * un.s
         return time
 
-    def travel_days(self, other, speed: float = 4., units: str = "km/h", time_per_day: float = 7.5):
+    def travel_days(self, other, speed: float = 4., units: str = "km/h", time_per_day: float = 7.5,
+                    quantity: bool = True):
         """
-
-        :param other:
-        :param speed:
-        :param units:
-        :param time_per_day: In hours.
-        :return:
+        Calculates the number of days taken to travel from this location to another, travelling for part of each day.
+        :param other: other location object.
+        :param speed: Travel speed, in units, or as an astropy Quantity.
+        :param units: Units of speed, as named in physics.units.
+        :param time_per_day: In hours, or as an astropy Quantity.
+        :param quantity: If True, returns an astropy Quantity; if False, a plain float in days.
+        :return: Travel time, in days.
         """
-        if type(speed) is not un.Quantity:
-            speed = speed * un.km / un.hour
-        else:
-            speed = speed.to(un.km / un.hour)  # u.velocity_to_velocity(velocity=speed, frm=units, to='kph')
-        time = self.travel_time(other=other, speed=speed, units=units)
-        if type(time_per_day) is not un.Quantity:
-            time_per_day = time_per_day * un.hour / un.day
-        else:
-            time_per_day = time_per_day.to(un.hour / un.day)  # u.time_to_sec(time=time_per_day, units="hr")
-        days = time / time_per_day
-        return days.to(un.day)
+        days = days_to_travel(distance=self.distance_to(other, quantity=False),
+                              speed=to_si(speed, units, "velocity"),
+                              time_per_day=seconds_per_day(time_per_day))
+        if quantity:
+            return days * un.day
+        return days
 
     def travel_days_dpd(self, other, distance_per_day: float = 30., units: str = "km"):
         """
-
-        :param other:
-        :param distance_per_day:
-        :param units:
-        :return:
+        Calculates the number of days taken to travel from this location to another, covering a fixed distance each day.
+        :param other: other location object.
+        :param distance_per_day: Distance covered each day, in units.
+        :param units: Units of distance_per_day, as named in physics.units.
+        :return: float, travel time in days.
         """
-        distance = self.distance_to(other)
+        distance = self.distance_to(other, quantity=False)
         distance_per_day = u.length_to_metre(length=distance_per_day, units=units)
         days = distance / distance_per_day
         return days
 
+    def travel_to(self, direction: float, distance: float, units: str = "m"):
+        """
+        Calculates where a traveller setting out from this location ends up, following a great circle.
+        :param direction: Initial bearing, in degrees clockwise from north.
+        :param distance: Distance travelled, in units, or as an astropy Quantity.
+        :param units: Units of distance, as named in physics.units.
+        :return: tuple of floats, longitude and latitude of destination, in degrees.
+        """
+        if self.map is not None:
+            return travel_to(lon=self.lon, lat=self.lat, direction=direction, distance=distance,
+                             radius=self.map.planet_radius, units=units)
+        return travel_to(lon=self.lon, lat=self.lat, direction=direction, distance=distance, units=units)
+
+
+class LocationList:
+    def __init__(self, typ: str, this_map: "Map" = None):
+        """
+        The locations of one type on a Map, stored as columns of names, longitudes and latitudes. Behaves as a list of
+        Locations, but each Location object is only created when it is first accessed, so that large gazetteers can be
+        loaded and queried without building an object per row. Positions used by Map queries are read from the columns,
+        so Locations should not be moved once added.
+        :param typ: Location type.
+        :param this_map: The Map object on which these locations belong.
+        """
+        self.type = typ
+        self.map = this_map
+        # Columns, with spare capacity beyond the first _n entries.
+        self._names = np.empty(0, dtype=str)
+        self._lon = np.empty(0)
+        self._lat = np.empty(0)
+        self._n = 0
+        # Location objects created so far, keyed by row.
+        self._objects = {}
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(self._n))]
+        i = int(item)
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("LocationList index out of range")
+        if i not in self._objects:
+            location = Location(name=str(self._names[i]), lon=float(self._lon[i]), lat=float(self._lat[i]),
+                                typ=self.type)
+            location.map = self.map
+            self._objects[i] = location
+        return self._objects[i]
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+    def columns(self):
+        """
+        :return: tuple of numpy arrays of names, longitudes and latitudes.
+        """
+        return self._names[:self._n], self._lon[:self._n], self._lat[:self._n]
+
+    def extend(self, names, lon, lat):
+        """
+        Adds locations from columns, without creating Location objects.
+        :param names: Sequence or array of names.
+        :param lon: Sequence or array of longitudes, in degrees.
+        :param lat: Sequence or array of latitudes, in degrees.
+        """
+        names = np.asarray(names, dtype=str)
+        n = self._n + len(names)
+        if n > len(self._lon) or names.dtype.itemsize > self._names.dtype.itemsize:
+            # Grow geometrically, so that repeated appends take amortised constant time.
+            capacity = max(n, 2 * len(self._lon), 16)
+            new_names = np.empty(capacity, dtype=np.promote_types(self._names.dtype, names.dtype))
+            new_names[:self._n] = self._names[:self._n]
+            new_lon, new_lat = np.empty(capacity), np.empty(capacity)
+            new_lon[:self._n], new_lat[:self._n] = self._lon[:self._n], self._lat[:self._n]
+            self._names, self._lon, self._lat = new_names, new_lon, new_lat
+        self._names[self._n:n] = names
+        self._lon[self._n:n] = lon
+        self._lat[self._n:n] = lat
+        self._n = n
+
+    def append(self, location: Location):
+        """
+        Adds a Location object.
+        :param location: Location object.
+        """
+        self.extend([location.name], np.array([location.lon], dtype=float), np.array([location.lat], dtype=float))
+        self._objects[self._n - 1] = location
+
+
+# Columns of location files, as read by read_locations().
+location_columns = ("name", "type", "longitude", "latitude")
+
+
+def read_locations(path: str, chunk_size: int = 100000):
+    """
+    Streams a location file in chunks of columns, so that large files are never held in memory as rows. Reads csv files
+    with name, type, longitude and latitude columns (in any order, among others), or .npz files written by
+    write_locations().
+    :param path: Path to .csv or .npz file.
+    :param chunk_size: Number of rows per chunk.
+    :return: Generator of tuples of numpy arrays (names, types, longitudes, latitudes).
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            names, types, lon, lat = (data[column] for column in location_columns)
+        for start in range(0, len(names), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            yield names[chunk], types[chunk], lon[chunk], lat[chunk]
+        return
+
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = [column.strip() for column in next(reader)]
+        indices = [header.index(column) for column in location_columns]
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                break
+            columns = list(zip(*[row for row in rows if row]))
+            if not columns:
+                continue
+            yield (np.array(columns[indices[0]], dtype=str), np.array(columns[indices[1]], dtype=str),
+                   np.array(columns[indices[2]], dtype=float), np.array(columns[indices[3]], dtype=float))
+
+
+def write_locations(path: str, names, types, lon, lat):
+    """
+    Writes location columns to a binary .npz file, which read_locations() loads much faster than csv.
+    :param path: Path to .npz file.
+    :param names: Array of names.
+    :param types: Array of location types.
+    :param lon: Array of longitudes, in degrees.
+    :param lat: Array of latitudes, in degrees.
+    """
+    np.savez(path, name=np.asarray(names, dtype=str), type=np.asarray(types, dtype=str),
+             longitude=np.asarray(lon, dtype=float), latitude=np.asarray(lat, dtype=float))
+
 
 marker_colours = ['r', 'g', 'b']
 
 
 class Map:
-    def __init__(self, image: str, locations: str = None, planet_radius: float = 6371e3):
+    def __init__(self, image: str, locations: str = None, planet_radius: float = 6371e3, pyramid: str = None):
         """
 
         :param image: Path to image file of map.
         :param locations: Path to csv file containing spreadsheet of locations.
         :param planet_radius: In metres.
+        :param pyramid: Path to a directory containing a tiled pyramid of the image, as written by build_pyramid(). If
+            given, the built-in renderer reads from the pyramid rather than the image file.
         """
         self.image = image
+        # Image array, read on first use by image_array().
+        self._image_array = None
+        self.pyramid = MapPyramid(pyramid) if pyramid is not None else None
         self.locations_path = locations
         self.planet_radius = planet_radius
-        if locations is not None:
-            self.locations_tbl = tbl.Table.read(locations, format='ascii.csv')
-        else:
-            self.locations_tbl = tbl.Table()
+        # LocationLists, keyed by location type.
         self.locations = {}
+        # Distance matrices computed by distance_matrix(), keyed by location types; cleared by add_location().
+        self._distance_matrices = {}
+        # Spatial indexes built by spatial_index(), keyed by location type; each is discarded when a location of that
+        # type is added.
+        self._spatial_indexes = {}
         self.create_locations()
 
     def add_location(self, location: Location):
         """
         Add a location to this map's internal list of Locations.
-        :param location: Location object.
+        :param location: Location object. Locations already on this map are not added again.
         :return:
         """
+        if location.map is self:
+            return
         # Set location's map pointer to this map.
         location.map = self
         #
         self.create_location_type_list(location.type)
         self.locations[location.type].append(location)
+        self._distance_matrices.clear()
+        self._spatial_indexes.pop(location.type, None)
+
+    def add_location_columns(self, names, types, lon, lat):
+        """
+        Add many locations to this map at once, from columns; Location objects are created only when accessed.
+        :param names: Array of names.
+        :param types: Array of location types.
+        :param lon: Array of longitudes, in degrees.
+        :param lat: Array of latitudes, in degrees.
+        """
+        types = np.asarray(types, dtype=str)
+        names, lon, lat = np.asarray(names, dtype=str), np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        for typ in np.unique(types):
+            typ = str(typ)
+            these = types == typ
+            self.create_location_type_list(typ)
+            self.locations[typ].extend(names[these], lon[these], lat[these])
+            self._spatial_indexes.pop(typ, None)
+        self._distance_matrices.clear()
 
     def create_location_type_list(self, typ):
         """
@@ -311,17 +1200,165 @@ class Map:
         :return:
         """
         if typ not in self.locations:
-            self.locations[typ] = []
+            self.locations[typ] = LocationList(typ, this_map=self)
+
+    def location_types(self, types: Union[list, str] = None):
+        """
+        Utility function; standardises a types argument to a list of location type names.
+        :param types: Location type, list of types, or None for all types on this map.
+        :return: list of type names.
+        """
+        if type(types) is str:
+            return [types]
+        elif types is None:
+            return list(self.locations.keys())
+        return list(types)
+
+    def location_list(self, types: Union[list, str] = None):
+        """
+        Lists this map's Locations of the given types, in the order used by distance_matrix().
+        :param types: Location type, list of types, or None for all types.
+        :return: list of Locations.
+        """
+        locations = []
+        for typ in self.location_types(types):
+            locations += self.locations.get(typ, [])
+        return locations
+
+    def lon_lat(self, types: Union[list, str] = None):
+        """
+        :param types: Location type, list of types, or None for all types.
+        :return: tuple of numpy arrays of the longitudes and latitudes of the locations, in the order of
+            location_list().
+        """
+        columns = [self.locations[typ].columns() for typ in self.location_types(types) if typ in self.locations]
+        if not columns:
+            return np.empty(0), np.empty(0)
+        return np.concatenate([lon for _, lon, _ in columns]), np.concatenate([lat for _, _, lat in columns])
+
+    def distance_matrix(self, types: Union[list, str] = None):
+        """
+        Calculates the great circle distance between every pair of this map's locations of the given types. The result
+        is cached until a location is added to the map.
+        :param types: Location type, list of types, or None for all types.
+        :return: numpy array of distances, in metres, with rows and columns in the order of location_list(types).
+        """
+        key = tuple(self.location_types(types))
+        if key not in self._distance_matrices:
+            lon, lat = self.lon_lat(types)
+            self._distance_matrices[key] = to_si(self.planet_radius, "m", "length") * great_circle_ang_dist_matrix(
+                lon1=lon, lat1=lat)
+        return self._distance_matrices[key]
+
+    def travel_days_matrix(self, types: Union[list, str] = None, speed: float = 4., units: str = "km/h",
+                           time_per_day: float = 7.5):
+        """
+        Calculates the number of days to travel between every pair of this map's locations of the given types, as with
+        Location.travel_days().
+        :param types: Location type, list of types, or None for all types.
+        :param speed: Travel speed, in units, or as an astropy Quantity.
+        :param units: Units of speed, as named in physics.units.
+        :param time_per_day: In hours, or as an astropy Quantity.
+        :return: numpy array of days, with rows and columns in the order of location_list(types).
+        """
+        return days_to_travel(distance=self.distance_matrix(types), speed=to_si(speed, units, "velocity"),
+                              time_per_day=seconds_per_day(time_per_day))
+
+    def spatial_index(self, typ: str):
+        """
+        Builds (or returns the cached) spatial index over this map's locations of one type, as unit vectors.
+        :param typ: Location type.
+        :return: tuple of (maths.PointIndex, LocationList of the indexed Locations in index order)
+        """
+        if typ not in self._spatial_indexes:
+            lon, lat = self.lon_lat(typ)
+            self._spatial_indexes[typ] = ma.PointIndex(lon_lat_to_vectors(lon, lat)), self.locations.get(typ, [])
+        return self._spatial_indexes[typ]
+
+    def nearest(self, lon: float, lat: float, k: int = 1, types: Union[list, str] = None):
+        """
+        Finds the k locations on this map nearest to a point.
+        :param lon: Longitude of the point.
+        :param lat: Latitude of the point.
+        :param k: Number of locations to find.
+        :param types: Location type, list of types, or None for all types.
+        :return: list of (Location, great circle distance in metres) tuples, nearest first.
+        """
+        point = lon_lat_to_vectors(lon, lat)
+        found = []
+        for typ in self.location_types(types):
+            index, locations = self.spatial_index(typ)
+            chords, indices = index.query(point, k=k)
+            found += [(locations[i], c) for c, i in zip(chords[0].tolist(), indices[0].tolist())]
+        found.sort(key=lambda pair: pair[1])
+        return [(loc, self.chord_to_distance(c)) for loc, c in found[:k]]
+
+    def within(self, lon: float, lat: float, radius: float, types: Union[list, str] = None, units: str = "m"):
+        """
+        Finds all locations on this map within a great circle distance of a point.
+        :param lon: Longitude of the point.
+        :param lat: Latitude of the point.
+        :param radius: Search radius, in units, or as an astropy Quantity.
+        :param types: Location type, list of types, or None for all types.
+        :param units: Units of radius, as named in physics.units.
+        :return: list of (Location, great circle distance in metres) tuples, nearest first.
+        """
+        point = lon_lat_to_vectors(lon, lat)
+        angle = min(to_si(radius, units, "length") / to_si(self.planet_radius, "m", "length"), pi)
+        chord = 2 * sin(angle / 2)
+        found = []
+        for typ in self.location_types(types):
+            index, locations = self.spatial_index(typ)
+            indices = index.query_radius(point, chord)[0]
+            if len(indices) > 0:
+                chords = np.linalg.norm(index.points[indices] - point, axis=1)
+                found += [(locations[i], c) for i, c in zip(indices.tolist(), chords.tolist())]
+        found.sort(key=lambda pair: pair[1])
+        return [(loc, self.chord_to_distance(c)) for loc, c in found]
+
+    def chord_to_distance(self, chord: float):
+        """
+        Converts the straight-line distance between two unit vectors, as used by the spatial indexes, to a great circle
+        distance on this map.
+        :param chord: Chord length, on the unit sphere.
+        :return: float, great circle distance, in metres.
+        """
+        return 2 * asin(min(chord / 2, 1.)) * to_si(self.planet_radius, "m", "length")
 
     def create_locations(self):
         """
-        Read locations from csv file into this Map.
+        Read locations from this Map's location file.
+        :return:
+        """
+        if self.locations_path is not None:
+            self.load_locations(self.locations_path)
+
+    def load_locations(self, path: str, chunk_size: int = 100000):
+        """
+        Stream locations from a csv or .npz file into this Map, as with read_locations().
+        :param path: Path to .csv or .npz file.
+        :param chunk_size: Number of rows to read at a time.
         :return:
         """
-        for loc in self.locations_tbl:
-            print(loc)
-            location = Location(name=loc['name'], lon=loc['longitude'], lat=loc['latitude'], typ=loc['type'])
-            self.add_location(location)
+        for names, types, lon, lat in read_locations(path, chunk_size=chunk_size):
+            self.add_location_columns(names=names, types=types, lon=lon, lat=lat)
+
+    def save_locations(self, path: str):
+        """
+        Write this Map's locations to a .npz file, for fast loading with load_locations().
+        :param path: Path to .npz file.
+        :return:
+        """
+        names, types, lon, lat = [], [], [], []
+        for typ in self.location_types():
+            typ_names, typ_lon, typ_lat = self.locations[typ].columns()
+            names.append(typ_names)
+            types.append(np.full(len(typ_names), typ))
+            lon.append(typ_lon)
+            lat.append(typ_lat)
+        write_locations(path, names=np.concatenate(names + [np.empty(0, dtype=str)]),
+                        types=np.concatenate(types + [np.empty(0, dtype=str)]), lon=np.concatenate(lon + [np.empty(0)]),
+                        lat=np.concatenate(lat + [np.empty(0)]))
 
     def plot_map(self, centre_lat: float = 0, centre_lon: float = 0, projection: str = 'ortho', output: str = None,
                  show: bool = False, meridians: bool = True, parallels: bool = True):
@@ -334,9 +1371,12 @@ class Map:
         :param show: Set to True to show the plot.
         :param meridians: set to True to plot meridian lines.
         :param parallels: Set to True to plot parallel lines.
-        :return: Basemap object for this map.
+        :return: Basemap object for this map; or, if Basemap is not installed, a Projection object.
         """
-        if projection == 'ortho':
+        if not bmap_available:
+            bmap = plot_projection(image=self.render_source(), centre_lat=centre_lat, centre_lon=centre_lon, show=False,
+                                   projection=projection, meridians=meridians, parallels=parallels)
+        elif projection == 'ortho':
             bmap = plot_globe(file=self.image, centre_lat=centre_lat, centre_lon=centre_lon, show=False,
                               meridians=meridians, parallels=parallels)
         else:
@@ -348,27 +1388,156 @@ class Map:
             plt.show()
         return bmap
 
+    def image_array(self):
+        """
+        :return: numpy array of the map image, read from file on first use.
+        """
+        if self._image_array is None:
+            self._image_array = read_image(self.image)
+        return self._image_array
+
+    def build_pyramid(self, directory: str, tile_size: int = 512):
+        """
+        Writes a tiled pyramid of the map image, and uses it for rendering from then on.
+        :param directory: Directory in which to save the pyramid.
+        :param tile_size: Width and height of tiles, in pixels.
+        :return: MapPyramid object.
+        """
+        self.pyramid = build_pyramid(image=self.image, directory=directory, tile_size=tile_size)
+        return self.pyramid
+
+    def render_source(self):
+        """
+        :return: The MapPyramid of this map if there is one; otherwise the image array.
+        """
+        if self.pyramid is not None:
+            return self.pyramid
+        return self.image_array()
+
+    def scale(self, level: int = 0):
+        """
+        :param level: Resolution level of the pyramid; ignored if there is no pyramid.
+        :return: float, pixels per degree of the map image, for use with lon_lat_from_x_y() and x_y_from_lon_lat().
+        """
+        if self.pyramid is not None:
+            return self.pyramid.scale(level)
+        return self.image_array().shape[1] / 360.
+
+    def lon_lat_from_x_y(self, x, y, level: int = 0):
+        """
+        Converts pixel coordinates on the map image (or a level of its pyramid) to longitude and latitude.
+        :param x: x-coordinate, counting pixels eastwards from longitude -180.
+        :param y: y-coordinate, counting pixels northwards from latitude -90.
+        :param level: Resolution level of the pyramid; ignored if there is no pyramid.
+        :return: tuple of longitude and latitude, in degrees.
+        """
+        return lon_lat_from_x_y(x=x, y=y, scale=self.scale(level))
+
+    def x_y_from_lon_lat(self, lon, lat, level: int = 0):
+        """
+        Converts longitude and latitude to pixel coordinates on the map image (or a level of its pyramid).
+        :param lon: Longitude, in degrees.
+        :param lat: Latitude, in degrees.
+        :param level: Resolution level of the pyramid; ignored if there is no pyramid.
+        :return: tuple of x and y; see lon_lat_from_x_y().
+        """
+        return x_y_from_lon_lat(lat=lat, lon=lon, scale=self.scale(level))
+
+    def sample(self, lon, lat, level: int = 0, background: int = 255):
+        """
+        Looks up the map pixels at the given longitudes and latitudes. With a pyramid, only the tiles containing the
+        points are read.
+        :param lon: numpy array of longitudes, in degrees; nan for points with no image.
+        :param lat: numpy array of latitudes, in degrees; nan for points with no image.
+        :param level: Resolution level of the pyramid; ignored if there is no pyramid.
+        :param background: Value given to points with no image.
+        :return: numpy array of shape lon.shape + (channels,).
+        """
+        if self.pyramid is not None:
+            return self.pyramid.sample(lon, lat, level=level, background=background)
+        image = self.image_array()
+        index = image_lookup(lon, lat, image.shape)
+        values = image.reshape(-1, image.shape[2])[np.maximum(index, 0)]
+        values[index < 0] = background
+        return values
+
+    def region(self, lon_min: float, lon_max: float, lat_min: float, lat_max: float, level: int = 0):
+        """
+        The part of the map image within a range of longitude and latitude. With a pyramid, only the tiles covering the
+        region are read.
+        :param lon_min: Western edge, in degrees, from -180.
+        :param lon_max: Eastern edge, in degrees, up to 180.
+        :param lat_min: Southern edge, in degrees.
+        :param lat_max: Northern edge, in degrees.
+        :param level: Resolution level of the pyramid; ignored if there is no pyramid.
+        :return: numpy array of shape (rows, columns, channels).
+        """
+        if self.pyramid is not None:
+            return self.pyramid.region(lon_min, lon_max, lat_min, lat_max, level=level)
+        row_start, row_stop, col_start, col_stop = region_bounds(self.image_array().shape, lon_min, lon_max, lat_min,
+                                                                 lat_max)
+        return self.image_array()[row_start:row_stop, col_start:col_stop]
+
     def plot_gif(self, output: str, centre_lat: float = 0, lon_interval: int = 10, meridians: bool = True,
-                 parallels: bool = True):
+                 parallels: bool = True, size: int = 500, processes: int = None, use_basemap: bool = False,
+                 return_frames: bool = False):
         """
-        Plot an animated, rotating gif of the map.
-        :param output: Path to which to save the frames and final gif.
+        Plot an animated, rotating gif of the map, saved to output + 'rotating.gif'. Frames are rendered in parallel,
+        directly from the image array (or pyramid), and written to the gif as they are finished; only a few frames are
+        held in memory at once, and none are saved to file. The frames all share one cached longitude/latitude grid.
+        :param output: Path to which to save the gif.
         :param centre_lat: Latitude to show at centre.
         :param lon_interval: Longitude interval between frames.
         :param meridians: set to True to plot meridian lines.
         :param parallels: Set to True to plot parallel lines.
-        :return: list of image objects.
-        """
-        images = []
-        for lon in range(0, 360, lon_interval):
-            filename = output + str(lon) + '.png'
-            self.plot_map(centre_lat=centre_lat, centre_lon=lon, projection='ortho', output=filename, show=False,
-                          meridians=meridians, parallels=parallels)
-            plt.close()
-            print(filename)
-            images.append(imageio.imread(filename))
-        imageio.mimsave(output + 'rotating.gif', images)
-        return images
+        :param size: Width and height of each frame, in pixels; built-in renderer only.
+        :param processes: Number of worker processes; defaults to the number of processors. Built-in renderer only.
+        :param use_basemap: Set to True to plot frames with Basemap, as plot_map() does, instead of the built-in
+            renderer.
+        :param return_frames: Set to True to also return the frames, which keeps them all in memory.
+        :return: Path of the gif; or, if return_frames is True, a tuple of the path and a list of frames, one numpy
+            array each.
+        """
+        if use_basemap and not bmap_available:
+            raise ImportError("basemap is not installed; set use_basemap to False to use the built-in renderer.")
+        path = output + 'rotating.gif'
+        frames = []
+        with imageio.get_writer(path, mode='I') as writer:
+            for frame in self._gif_frames(centre_lat, lon_interval, meridians, parallels, size, processes,
+                                          use_basemap):
+                writer.append_data(frame)
+                if return_frames:
+                    frames.append(frame)
+        if return_frames:
+            return path, frames
+        return path
+
+    def _gif_frames(self, centre_lat: float, lon_interval: int, meridians: bool, parallels: bool, size: int,
+                    processes: int, use_basemap: bool):
+        # Yields the frames of plot_gif() in order.
+        if use_basemap:
+            for lon in range(0, 360, lon_interval):
+                figure = plt.figure()
+                self.plot_map(centre_lat=centre_lat, centre_lon=lon, projection='ortho', show=False,
+                              meridians=meridians, parallels=parallels)
+                figure.canvas.draw()
+                frame = np.asarray(figure.canvas.buffer_rgba())[:, :, :3].copy()
+                plt.close(figure)
+                yield frame
+            return
+
+        views = [(centre_lat, lon, size, meridians, parallels) for lon in range(0, 360, lon_interval)]
+        # Frames are submitted a few at a time, so that finished frames don't pile up while the gif is written.
+        window = 2 * (processes or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_frame_worker,
+                                 initargs=(self.render_source(),)) as executor:
+            pending = deque()
+            for view in views:
+                pending.append(executor.submit(_render_frame, view))
+                if len(pending) >= window:
+                    yield _gif_frame(pending.popleft().result())
+            while pending:
+                yield _gif_frame(pending.popleft().result())
 
     def plot_locations(self, types: Union[list, str] = None, centre_lat=0, centre_lon=0, projection='ortho',
                        fontsize=10, output: str = None):
@@ -381,50 +1550,202 @@ class Map:
         :param fontsize: Size of font for labels.
         :param output: Path to which to save the plot.
         """
-        if type(types) is str:
-            types = [types]
-        elif types is None:
-            types = self.locations.keys()
+        types = self.location_types(types)
 
         bmap = self.plot_map(centre_lat=centre_lat, centre_lon=centre_lon, projection=projection, output=None)
 
         for i, typ in enumerate(types):
             for loc in self.locations[typ]:
                 bmap.plot(loc.lon, loc.lat, f'{marker_colours[i]}o', latlon=True)
-                plt.text(loc.lon, loc.lat, loc.name, c=marker_colours[i], fontsize=fontsize)
+                x, y = bmap(loc.lon, loc.lat)
+                plt.text(x, y, loc.name, c=marker_colours[i], fontsize=fontsize)
         if output is not None:
             plt.savefig(output)
         plt.show()
 
 
-class JourneyLocation:
-    def __init__(self, location: Location, nxt: "JourneyLocation" = None, previous: "JourneyLocation" = None):
-        self.location = location
-        self.next = None
-        if nxt is not None:
-            self.set_next(nxt)
-        self.previous = None
-        if previous is not None:
-            self.set_previous(previous)
-
-    def set_next(self, nxt: "JourneyLocation"):
-        nxt.previous = self
-        self.next = nxt
+class JourneyLeg:
+    def __init__(self, origin: Location, destination: Location, journey: "Journey"):
+        """
+        One leg of a Journey, between two consecutive stops, with its length and travel time calculated on creation.
+        :param origin: Location at the start of the leg.
+        :param destination: Location at the end of the leg.
+        :param journey: The Journey to which this leg belongs, which sets the planet radius and travel rate.
+        """
+        self.origin = origin
+        self.destination = destination
+        # Great circle angle of the leg, in radians.
+        self.angle = float(great_circle_ang_dist(lon1=origin.lon, lat1=origin.lat, lon2=destination.lon,
+                                                 lat2=destination.lat))
+        # In metres.
+        self.distance = self.angle * journey.planet_radius
+        # In days.
+        self.days = days_to_travel(distance=self.distance, speed=journey.speed, time_per_day=journey.time_per_day)
 
-    def set_previous(self, previous: "JourneyLocation"):
-        previous.next = self
-        self.previous = previous
+    def __str__(self):
+        return f"{self.origin.name} to {self.destination.name}: {self.distance / 1000:.1f} km, {self.days:.1f} days"
 
 
 class Journey:
-    def __init__(self, locations: List[Location]):
+    def __init__(self, locations: List[Location], speed: float = 4., units: str = "km/h", time_per_day: float = 7.5,
+                 start_date: timelines.Date = None, planet_radius: float = None):
+        """
+        A route through a sequence of Locations. The distance and travel time of each leg are calculated once and
+        cached; inserting or appending a stop recalculates only the legs it affects.
+        :param locations: Stops, in order.
+        :param speed: Travel speed, in units, or as an astropy Quantity.
+        :param units: Units of speed, as named in physics.units.
+        :param time_per_day: Hours of travel per day, or an astropy Quantity.
+        :param start_date: Date of departure from the first stop, if the Journey is to be dated.
+        :param planet_radius: In metres. If not given, taken from the Map of the first location, or else Earth's radius.
+        """
         self.locations = []
         self.legs = []
+        self.speed = to_si(speed, units, "velocity")
+        self.time_per_day = seconds_per_day(time_per_day)
+        self.start_date = start_date
+        if planet_radius is None:
+            if locations and locations[0].map is not None:
+                planet_radius = locations[0].map.planet_radius
+            else:
+                planet_radius = 6371e3
+        self.planet_radius = to_si(planet_radius, "m", "length")
+        # Cumulative distance and days at each stop; rebuilt on demand after the route changes.
+        self._cumulative = None
         for location in locations:
             self.append(location)
 
+    def __len__(self):
+        return len(self.locations)
+
+    def __getitem__(self, item):
+        return self.locations[item]
+
+    def __str__(self):
+        string = ''
+        for leg in self.legs:
+            string += str(leg) + '\n'
+        return string + f"Total: {self.total_distance() / 1000:.1f} km, {self.total_days():.1f} days"
+
     def insert(self, index: int, location: Location):
-        self.locations.insert(index=index, object=location)
+        """
+        Insert a stop into the Journey before index, as with list.insert(), recalculating only the legs either side.
+        :param index: Position of the new stop.
+        :param location: Location to insert.
+        """
+        n = len(self.locations)
+        if index < 0:
+            index = max(n + index, 0)
+        index = min(index, n)
+        if index == n:
+            self.append(location)
+            return
+
+        self.locations.insert(index, location)
+        if index == 0:
+            self.legs.insert(0, JourneyLeg(location, self.locations[1], self))
+        else:
+            self.legs[index - 1:index] = [JourneyLeg(self.locations[index - 1], location, self),
+                                          JourneyLeg(location, self.locations[index + 1], self)]
+        self._cumulative = None
 
     def append(self, location: Location):
+        """
+        Add a stop to the end of the Journey, calculating the new leg only.
+        :param location: Location to add.
+        """
+        if self.locations:
+            self.legs.append(JourneyLeg(self.locations[-1], location, self))
         self.locations.append(location)
+        self._cumulative = None
+
+    def cumulative(self):
+        """
+        :return: tuple of numpy arrays, giving for each stop the distance travelled (in metres) and days elapsed since
+        the start of the Journey.
+        """
+        if self._cumulative is None:
+            distances = np.concatenate([[0.], np.cumsum([leg.distance for leg in self.legs])])
+            days = np.concatenate([[0.], np.cumsum([leg.days for leg in self.legs])])
+            self._cumulative = distances, days
+        return self._cumulative
+
+    def cumulative_distances(self):
+        """
+        :return: numpy array of the distance travelled by each stop, in metres.
+        """
+        return self.cumulative()[0]
+
+    def cumulative_days(self):
+        """
+        :return: numpy array of the days elapsed by each stop.
+        """
+        return self.cumulative()[1]
+
+    def total_distance(self):
+        """
+        :return: float, total length of the Journey, in metres.
+        """
+        return float(self.cumulative_distances()[-1]) if self.locations else 0.
+
+    def total_days(self):
+        """
+        :return: float, total travel time of the Journey, in days.
+        """
+        return float(self.cumulative_days()[-1]) if self.locations else 0.
+
+    def positions(self, days):
+        """
+        Calculates where along the Journey the traveller is after the given numbers of days, interpolating along the
+        great circle of each leg. Times before the start or after the end give the first or last stop.
+        :param days: Days since departure; a number or numpy array.
+        :return: tuple of numpy arrays of longitude and latitude, in degrees.
+        """
+        days = np.atleast_1d(np.asarray(days, dtype=float))
+        if len(self.locations) < 2:
+            lon = np.full(days.shape, self.locations[0].lon if self.locations else np.nan)
+            lat = np.full(days.shape, self.locations[0].lat if self.locations else np.nan)
+            return lon, lat
+
+        cumulative = self.cumulative_days()
+        leg = np.clip(np.searchsorted(cumulative, days, side='right') - 1, 0, len(self.legs) - 1)
+        leg_days = np.array([l.days for l in self.legs])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.clip(np.where(leg_days[leg] > 0, (days - cumulative[leg]) / leg_days[leg], 0.), 0., 1.)
+
+        lon, lat = self.lon_lat()
+        start = lon_lat_to_vectors(lon[:-1], lat[:-1])[leg]
+        end = lon_lat_to_vectors(lon[1:], lat[1:])[leg]
+        angle = np.array([l.angle for l in self.legs])[leg]
+        # Spherical linear interpolation between the ends of each leg.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sin_angle = np.sin(angle)
+            a = np.where(sin_angle > 0, np.sin((1 - fraction) * angle) / sin_angle, 1 - fraction)
+            b = np.where(sin_angle > 0, np.sin(fraction * angle) / sin_angle, fraction)
+        point = a[:, None] * start + b[:, None] * end
+        return np.degrees(np.arctan2(point[:, 1], point[:, 0])), np.degrees(
+            np.arctan2(point[:, 2], np.hypot(point[:, 0], point[:, 1])))
+
+    def daily_positions(self):
+        """
+        :return: tuple of numpy arrays of longitude and latitude, in degrees, at the end of each day's travel, starting
+        with day 0 at the first stop and ending at the last stop.
+        """
+        days = np.arange(np.ceil(self.total_days()) + 1)
+        return self.positions(np.minimum(days, self.total_days()))
+
+    def lon_lat(self):
+        """
+        :return: tuple of numpy arrays of the longitudes and latitudes of the stops.
+        """
+        return np.array([loc.lon for loc in self.locations], dtype=float), np.array(
+            [loc.lat for loc in self.locations], dtype=float)
+
+    def arrival_dates(self):
+        """
+        Dates of arrival at each stop, counting whole days from start_date.
+        :return: list of timelines.Date, one for each stop.
+        """
+        if self.start_date is None:
+            raise ValueError('start_date must be set to date the Journey.')
+        return [self.start_date + int(days) for days in np.floor(self.cumulative_days())]
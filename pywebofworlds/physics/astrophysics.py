@@ -12,7 +12,9 @@ be calculated from its mass using star.ms_luminosity().
 import numpy as np
 import numpy.random as r
 import math
-from src.pywebofworlds import physics as u, physics as ma
+import re
+from collections import OrderedDict
+from pywebofworlds.physics import units as u, maths as ma
 import matplotlib.pyplot as plt
 import pandas as pd
 import sys
@@ -28,7 +30,6 @@ import sys
 
 # TODO: random planet/moon generator
 # TODO: radius-mass relation
-# TODO: Nightsky projection
 # TODO: generate solar system
 # TODO: Titius-Bode Law
 
@@ -47,6 +48,18 @@ class StarList:
         self.planet_list = list()
         self.moon_list = list()
 
+        # Lookup structures for find_star() and cross-matching, built on demand. The identifier index is kept up to date
+        # by add_star(); the sky index is discarded whenever a Star is added.
+        self._identifier_index = None
+        self._sky_index = None
+        # Most recently used StarEpochs from at_epoch(), keyed by epoch; discarded whenever a Star is added.
+        self._epochs = OrderedDict()
+        self.epoch_cache_size = 8
+        # Most recently rendered NightSkies from night_skies(), keyed by the observer's row in the epoch, the epoch and
+        # the magnitude limit.
+        self._skies = OrderedDict()
+        self.sky_cache_size = 256
+
     def __getitem__(self, item):
         return self.star_list[item]
 
@@ -78,6 +91,11 @@ class StarList:
         """
         if type(star) is Star:
             self.star_list.append(star)
+            if self._identifier_index is not None:
+                self._index_identifiers(star)
+            self._sky_index = None
+            self._epochs.clear()
+            self._skies.clear()
             for p in star.planets:
                 if p not in self.planet_list:
                     self.add_planet(p)
@@ -281,6 +299,109 @@ class StarList:
         for s in self.star_list:
             self.find_nearest_neighbour(s)
 
+    def at_epoch(self, years: "float" = 0.):
+        """
+        Propagates the positions of all stars linearly along their velocities (vx, vy, vz) to another epoch, in a single
+        vectorised step, and builds a spatial index over them. The most recent epochs requested are cached.
+        :param years: float: Time from the catalogue epoch, in years; negative for the past.
+        :return: StarEpoch: Positions and neighbour index of the stars at that epoch.
+        """
+        years = float(years)
+        if years in self._epochs:
+            self._epochs.move_to_end(years)
+            return self._epochs[years]
+
+        epoch = StarEpoch(self.star_list, years)
+        self._epochs[years] = epoch
+        while len(self._epochs) > self.epoch_cache_size:
+            self._epochs.popitem(last=False)
+        return epoch
+
+    def night_sky(self, observer: "Star", mag_limit: "float" = 6.5, years: "float" = 0.):
+        """
+        The night sky as seen from one star in this list; see night_skies().
+        :param observer: Star: The star from which the sky is seen.
+        :param mag_limit: float: Faintest apparent magnitude to include.
+        :param years: float: Epoch, in years from the catalogue epoch, as in at_epoch().
+        :return: NightSky
+        """
+        return self.night_skies([observer], mag_limit=mag_limit, years=years)[0]
+
+    def night_skies(self, observers: "list", mag_limit: "float" = 6.5, years: "float" = 0.,
+                    block_size: "int" = 2 ** 22):
+        """
+        Renders the night sky as seen from each of a list of stars in this list: every other star is placed in the
+        observer's frame, its apparent magnitude found from its abs_mag and distance, and those brighter than mag_limit
+        kept. Observers are processed in batches, vectorised over all stars, and the results are cached per observer.
+        The cache is cleared when stars are added or merged; call reindex() after moving Stars already in the list.
+        :param observers: list of Stars from which the sky is seen.
+        :param mag_limit: float: Faintest apparent magnitude to include.
+        :param years: float: Epoch, in years from the catalogue epoch, as in at_epoch().
+        :param block_size: int: Maximum number of observer-star pairs held in memory at once.
+        :return: list of NightSky, in the order of observers.
+        """
+        epoch = self.at_epoch(years)
+        abs_mag = np.array([math.nan if is_missing(s.abs_mag) else s.abs_mag for s in epoch.stars], dtype=float)
+
+        keys = [(epoch.row(observer), float(mag_limit), float(years)) for observer in observers]
+        skies = {}
+        pending = []
+        for observer, key in zip(observers, keys):
+            # Rows are only reused by another star if the list was reordered and the epoch rebuilt.
+            if key in self._skies and self._skies[key].observer is observer:
+                self._skies.move_to_end(key)
+                skies[key] = self._skies[key]
+            elif key not in skies:
+                skies[key] = None
+                pending.append(observer)
+
+        rows = max(1, block_size // max(len(epoch), 1))
+        for start in range(0, len(pending), rows):
+            batch = pending[start:start + rows]
+            origins = np.array([epoch.position(observer) for observer in batch])
+            for observer, found in zip(batch, apparent_sky(epoch.positions, abs_mag, origins, mag_limit)):
+                indices, ra, dec, mag, distance = found
+                sky = NightSky(observer, [epoch.stars[i] for i in indices.tolist()], ra, dec, mag, distance,
+                               mag_limit=mag_limit, years=years)
+                key = (epoch.row(observer), float(mag_limit), float(years))
+                skies[key] = sky
+                self._skies[key] = sky
+                while len(self._skies) > self.sky_cache_size:
+                    self._skies.popitem(last=False)
+
+        return [skies[key] for key in keys]
+
+    def recalculate_all(self, mass: "bool" = False):
+        """
+        Equivalent to calling Star.recalculate() on every Star in the list, but with main-sequence luminosity, habitable
+        zone and lifespan computed for all stars in a single vectorised pass. Stars without a mass are given one from a
+        single bulk draw on the present-day mass function.
+        :param mass: bool: If True, every star is given a newly-drawn mass, as with Star.recalculate(mass=True).
+        :return: tuple of numpy arrays, in star_list order: (mass, luminosity, hz_inner, hz_outer, tau_ms)
+        """
+        masses = np.array([np.nan if s.mass is None else s.mass for s in self.star_list], dtype=float)
+
+        if mass:
+            missing = np.ones(masses.shape, dtype=bool)
+        else:
+            missing = np.isnan(masses)
+        if missing.any():
+            masses[missing] = det_masses(int(missing.sum()))
+
+        luminosity = luminosity_from_mass(masses)
+        hz_inner, hz_outer = habzone_from_luminosity(luminosity)
+        tau_ms = lifespan_from_mass(masses)
+
+        for star, m, l, inner, outer, tau in zip(self.star_list, masses.tolist(), luminosity.tolist(),
+                                                  hz_inner.tolist(), hz_outer.tolist(), tau_ms.tolist()):
+            star.mass = m
+            star.luminosity = l
+            star.hz_inner = inner
+            star.hz_outer = outer
+            star.tau_ms = tau
+
+        return masses, luminosity, hz_inner, hz_outer, tau_ms
+
     def plot_stars(self, bl: "bool" = True, suppress: "bool" = False):
         """
         Plots the positions of all stars in a three-dimensional plot, with black marks. Plots visited stars in red.
@@ -370,14 +491,15 @@ class StarList:
 
     def find_star(self, name: "str"):
         """
-        :param name: str: Name of desired Star. Must be spelt exactly correct.
+        :param name: str: Name, alias or catalogue id (eg "HIP 71683", "Gliese 551") of desired Star. Names must be
+        spelt exactly correct; catalogue ids are normalised, so "Gl 551" and "GJ 551" both work.
         :return: Star: If the Star exists in list, returns that; None if it does not.
         """
         if type(name) is str:
 
-            for s in self.star_list:
-                if s.name == name:
-                    return s
+            found = self.identifier_index().get(normalise_identifier(name))
+            if found:
+                return found[0]
 
             return None
 
@@ -1011,6 +1133,8 @@ class StarList:
         cat = cat.as_matrix()
 
         for row in cat:
+            # Planets of the same star share a host, found through the identifier index, so a host already in the list
+            # under an alias or catalogue id is not added twice.
             name = str(row[68])
             star = self.find_star(name)
             if star is None:
@@ -1019,6 +1143,9 @@ class StarList:
                 star.name = str(row[68])
                 star.asc = float(row[69])
                 star.dec = float(row[70])
+                # This catalogue gives right ascension in degrees, rather than hours as in HYG.
+                star.rarad = math.radians(star.asc)
+                star.decrad = math.radians(star.dec)
                 star.mag = float(row[71])
                 star.distance = float(row[76])
                 star.metallicity = float(row[79])
@@ -1027,110 +1154,10 @@ class StarList:
                 star.age = float(row[89]) * 1e9
                 star.temp_eff = float(row[92])
 
-                name_str = str(row[97])
-
-                if "HIP " in name_str:
-                    hip = name_str[name_str.find("HIP") + 4:]
-                    end = hip.find(",")
-                    if end == -1:
-                        end = len(hip)
-                    hip = hip[:end]
-                    star.hip = hip
-                if "GL " in name_str:
-                    gl = name_str[name_str.find("GL") + 3:]
-                    end = gl.find(",")
-                    if end == -1:
-                        end = len(gl)
-                    gl = gl[:end]
-                    star.gl = "Gl " + gl
-                if "Gliese " in name_str:
-                    gl = name_str[name_str.find("Gliese") + 7:]
-                    end = gl.find(",")
-                    if end == -1:
-                        end = len(gl)
-                    gl = gl[:end]
-                    star.gl = "Gl " + gl
-                if "GJ " in name_str:
-                    gj = name_str[name_str.find("GJ") + 3:]
-                    end = gj.find(",")
-                    if end == -1:
-                        end = len(gj)
-                    gj = gj[:end]
-                    star.gl = "GJ " + gj
-                if "HD " in name_str:
-                    hd = name_str[name_str.find("HD") + 3:]
-                    end = hd.find(",")
-                    if end == -1:
-                        end = len(hd)
-                    hd = hd[:end]
-                    star.hd = hd
-                if "HR " in name_str:
-                    hr = name_str[name_str.find("HR") + 3:]
-                    end = hr.find(",")
-                    if end == -1:
-                        end = len(hr)
-                    hr = hr[:end]
-                    star.hr = hr
-                if "WISE " in name_str:
-                    wise = name_str[name_str.find("WISE") + 3:]
-                    end = wise.find(",")
-                    if end == -1:
-                        end = len(wise)
-                    wise = wise[:end]
-                    star.wise = wise
-                if "WISEP " in name_str:
-                    wisep = name_str[name_str.find("WISEP") + 6:]
-                    end = wisep.find(",")
-                    if end == -1:
-                        end = len(wisep)
-                    wisep = wisep[:end]
-                    star.wisep = wisep
-                if "WISEPC " in name_str:
-                    wisepc = name_str[name_str.find("WISEPC") + 7:]
-                    end = wisepc.find(",")
-                    if end == -1:
-                        end = len(wisepc)
-                    wisepc = wisepc[:end]
-                    star.wisepc = wisepc
-                if "2MASS " in name_str:
-                    two_mass = name_str[name_str.find("2MASS") + 6:]
-                    end = two_mass.find(",")
-                    if end == -1:
-                        end = len(two_mass)
-                    two_mass = two_mass[:end]
-                    star.two_mass = two_mass
-                if "SDSS " in name_str:
-                    sdss = name_str[name_str.find("SDSS") + 5:]
-                    end = sdss.find(",")
-                    if end == -1:
-                        end = len(sdss)
-                    sdss = sdss[:end]
-                    star.sdss = sdss
-                if "EPIC " in name_str:
-                    epic = name_str[name_str.find("EPIC") + 5:]
-                    end = epic.find(",")
-                    if end == -1:
-                        end = len(epic)
-                    epic = epic[:end]
-                    star.epic = epic
-                if "SAO " in name_str:
-                    sao = name_str[name_str.find("SAO") + 4:]
-                    end = sao.find(",")
-                    if end == -1:
-                        end = len(sao)
-                    sao = sao[:end]
-                    star.sao = sao
-
-                name_str = str(row[97])
-                if name_str not in ["", None, "nan"]:
-                    end = False
-                    while not end:
-                        last = name_str.find(",")
-                        if last == -1:
-                            last = len(name_str)
-                            end = True
-                        star.names.append(name_str[:last])
-                        name_str = name_str[last + 2:]
+                names, ids = parse_identifiers(str(row[97]))
+                for attribute in ids:
+                    setattr(star, attribute, ids[attribute])
+                star.names += names
 
                 self.add_star(star)
 
@@ -1159,24 +1186,121 @@ class StarList:
             planet.mass_det_type = str(row[64])
             planet.rad_det_type = str(row[65])
 
-            name_str = str(row[66])
-            if name_str not in ["", None, "nan"]:
-                end = False
-                while not end:
-                    last = name_str.find(",")
-                    if last == -1:
-                        last = len(name_str)
-                        end = True
-                    planet.names.append(name_str[:last])
-                    name_str = name_str[last + 2:]
+            planet.names += parse_identifiers(str(row[66]))[0]
 
             star.add_planet(planet)
             print(str(planet.name) + " Imported")
 
-    def merge_lists(self, other: "StarList"):
+    def reindex(self):
+        """
+        Discards the identifier and sky-position indexes used by find_star() and cross_match(), and the StarEpochs and
+        NightSkies cached by at_epoch() and night_skies(), so that they are rebuilt on next use. Call this after
+        changing the names, catalogue ids, positions or velocities of Stars already in the list.
+        """
+        self._identifier_index = None
+        self._sky_index = None
+        self._epochs.clear()
+        self._skies.clear()
+
+    def identifier_index(self):
+        """
+        Builds (or returns the cached) hash index of Stars by identifier: each Star's name, proper name, aliases and
+        catalogue ids, normalised with normalise_identifier().
+        :return: dict: {identifier: [Star, ...]}
+        """
+        if self._identifier_index is None:
+            self._identifier_index = {}
+            for star in self.star_list:
+                self._index_identifiers(star)
+        return self._identifier_index
+
+    def _index_identifiers(self, star: "Star"):
+        for key in star_identifiers(star):
+            stars = self._identifier_index.setdefault(key, [])
+            if star not in stars:
+                stars.append(star)
+
+    def sky_index(self):
+        """
+        Builds (or returns the cached) spatial index over the sky positions of the Stars, as unit vectors. Stars without
+        a position are left out.
+        :return: tuple of (maths.PointIndex, list of the indexed Stars in index order)
+        """
+        if self._sky_index is None:
+            vectors = sky_vectors(self.star_list)
+            has_position = ~np.isnan(vectors).any(axis=1)
+            stars = [star for star, ok in zip(self.star_list, has_position) if ok]
+            self._sky_index = ma.PointIndex(vectors[has_position]), stars
+        return self._sky_index
+
+    def cross_match(self, other: "StarList", tolerance: "float" = 0.05):
+        """
+        Finds the counterpart in this StarList of each Star in other. Stars are matched first by catalogue id (see
+        catalogue_prefixes), and those without a catalogue match are then matched by sky position.
+        :param other: StarList: The stars to be matched against this list.
+        :param tolerance: float: Maximum angular separation, in degrees, for a positional match.
+        :return: CrossMatch: Report of matched, ambiguous and unmatched stars.
+        """
+        result = CrossMatch()
+        index = self.identifier_index()
+        unresolved = []
+
+        for star in other.star_list:
+            # Keyed by id() so that candidates are unique without requiring Star to be hashable by value.
+            candidates = {}
+            for key in star_identifiers(star, names=False):
+                for candidate in index.get(key, ()):
+                    candidates[id(candidate)] = candidate
+            if len(candidates) == 1:
+                result.matched.append((star, list(candidates.values())[0]))
+            elif len(candidates) > 1:
+                result.ambiguous.append((star, list(candidates.values())))
+            else:
+                unresolved.append(star)
+
+        if unresolved:
+            vectors = sky_vectors(unresolved)
+            has_position = ~np.isnan(vectors).any(axis=1)
+            for star in [s for s, ok in zip(unresolved, has_position) if not ok]:
+                result.unmatched.append(star)
+
+            tree, indexed = self.sky_index()
+            # Angular tolerance as a chord length between unit vectors.
+            chord = 2 * math.sin(math.radians(tolerance) / 2)
+            positioned = [s for s, ok in zip(unresolved, has_position) if ok]
+            for star, found in zip(positioned, tree.query_radius(vectors[has_position], chord)):
+                if len(found) == 1:
+                    result.matched.append((star, indexed[found[0]]))
+                elif len(found) > 1:
+                    result.ambiguous.append((star, [indexed[i] for i in found]))
+                else:
+                    result.unmatched.append(star)
+
+        return result
 
-        for star in other:
-            star.match_star(self)
+    def merge_lists(self, other: "StarList", tolerance: "float" = 0.05):
+        """
+        Merges another StarList into this one. Stars matched by cross_match() are merged into their counterparts here,
+        with Star.merge_star(); unmatched stars are added as new Stars. Ambiguous stars are left out, and reported.
+        :param other: StarList: The list to merge in, eg one read with read_eu_exoplanet().
+        :param tolerance: float: Maximum angular separation, in degrees, for a positional match.
+        :return: CrossMatch: Report of matched, ambiguous and unmatched stars.
+        """
+        result = self.cross_match(other, tolerance=tolerance)
+
+        for star, counterpart in result.matched:
+            counterpart.merge_star(star)
+            for p in star.planets:
+                self.add_planet(p)
+
+        for star in result.unmatched:
+            self.add_star(star)
+
+        # Merged stars may have gained names, catalogue ids and positions, which the indexes and caches don't know of.
+        if result.matched:
+            self.reindex()
+
+        return result
 
     def write_systems_xl(self, path: "str" = "SF_Cat_StarSystems"):
         """
@@ -1291,9 +1415,9 @@ class StarList:
             x.append(star.x)
             y.append(star.y)
             z.append(star.z)
-            vx.append(star.x)
-            vy.append(star.y)
-            vz.append(star.z)
+            vx.append(star.vx)
+            vy.append(star.vy)
+            vz.append(star.vz)
             rarad.append(star.rarad)
             decrad.append(star.decrad)
             pmrarad.append(star.pmrarad)
@@ -1566,9 +1690,9 @@ class StarList:
             x.append(star.x)
             y.append(star.y)
             z.append(star.z)
-            vx.append(star.x)
-            vy.append(star.y)
-            vz.append(star.z)
+            vx.append(star.vx)
+            vy.append(star.vy)
+            vz.append(star.vz)
             rarad.append(star.rarad)
             decrad.append(star.decrad)
             pmrarad.append(star.pmrarad)
@@ -2030,13 +2154,38 @@ class Star:
                 p.show_min()
 
     def match_star(self, list: "StarList", tolerance=0.05):
-        for star in list:
-            delta_asc = abs(star.asc - self.asc)
-            if delta_asc < tolerance:
-                delta_dec = abs(star.dec - self.dec)
-                if delta_dec < tolerance:
-                    # TODO: INCOMPLETE
-                    a = 3
+        """
+        Finds this Star's counterpart in a StarList, by catalogue id and then by sky position.
+        :param list: StarList to search.
+        :param tolerance: Maximum angular separation, in degrees, for a positional match.
+        :return: Star: The counterpart, or None if there is no unique match.
+        """
+        single = StarList()
+        single.star_list.append(self)
+        result = list.cross_match(single, tolerance=tolerance)
+        if result.matched:
+            return result.matched[0][1]
+        return None
+
+    def merge_star(self, other: "Star"):
+        """
+        Merges another record of the same star into this one: any attribute that is missing here (None, "" or nan) but
+        set in other is copied over, other's names are added to this star's, and other's planets are moved to this star.
+        :param other: Star: The other record.
+        """
+        for key, value in vars(other).items():
+            if key in unmerged_star_attributes:
+                continue
+            if is_missing(getattr(self, key, None)) and not is_missing(value):
+                setattr(self, key, value)
+
+        for name in [other.name] + other.names:
+            if not is_missing(name) and name != self.name and name not in self.names:
+                self.names.append(name)
+
+        for planet in other.planets:
+            if planet not in self.planets:
+                self.add_planet(planet)
 
 
 class Planet:
@@ -2219,6 +2368,391 @@ class Moon:
             print('            Unnamed Moon')
 
 
+class StarEpoch:
+    """
+    The positions of a list of stars at some epoch, propagated linearly from their velocities, along with a spatial
+    index for distance and neighbour queries at that epoch. Produced by StarList.at_epoch().
+    Attributes:
+        years: time from the catalogue epoch, in years
+        stars: list of Stars, in the same order as positions
+        positions: numpy array of shape (len(stars), 3), the x, y, z coordinates of each star at this epoch, in ly; rows
+            are nan for stars without a position
+    """
+
+    def __init__(self, stars: "list", years: "float" = 0.):
+        self.years = years
+        self.stars = list(stars)
+        self.positions = star_positions(self.stars) + years * star_velocities(self.stars)
+
+        self._rows = {id(star): i for i, star in enumerate(self.stars)}
+        self._indexed = np.flatnonzero(~np.isnan(self.positions).any(axis=1))
+        self.index = ma.PointIndex(self.positions[self._indexed])
+
+    def __len__(self):
+        return len(self.stars)
+
+    def row(self, star: "Star"):
+        """
+        :param star: Star: A star from this epoch's list.
+        :return: int: Index of the star in this epoch's stars and positions.
+        """
+        return self._rows[id(star)]
+
+    def position(self, star: "Star"):
+        """
+        :param star: Star: A star from this epoch's list.
+        :return: numpy array of the x, y, z coordinates of the star at this epoch, in ly.
+        """
+        return self.positions[self.row(star)]
+
+    def distance_between(self, star1: "Star", star2: "Star"):
+        """
+        :return: float: Distance between two stars at this epoch, in ly.
+        """
+        return float(np.linalg.norm(self.position(star1) - self.position(star2)))
+
+    def nearest_neighbours(self, star: "Star", k: "int" = 1):
+        """
+        Finds the k nearest neighbours of a star at this epoch.
+        :param star: Star: A star from this epoch's list.
+        :param k: int: Number of neighbours.
+        :return: list of (Star, distance in ly) tuples, nearest first.
+        """
+        distances, indices = self.index.query(self.position(star), k=k + 1)
+        neighbours = [(self.stars[self._indexed[i]], d) for d, i in zip(distances[0].tolist(), indices[0].tolist())]
+        return [(other, d) for other, d in neighbours if other is not star][:k]
+
+    def within(self, star: "Star", radius: "float"):
+        """
+        Finds all stars within some distance of a star at this epoch.
+        :param star: Star: A star from this epoch's list.
+        :param radius: float: Distance, in ly.
+        :return: list of (Star, distance in ly) tuples, nearest first, not including star itself.
+        """
+        centre = self.position(star)
+        found = self._indexed[self.index.query_radius(centre, radius)[0]]
+        distances = np.linalg.norm(self.positions[found] - centre, axis=1)
+        order = np.argsort(distances)
+        return [(self.stars[i], d) for i, d in zip(found[order].tolist(), distances[order].tolist())
+                if self.stars[i] is not star]
+
+
+class NightSky:
+    """
+    The night sky as seen from a star, as produced by StarList.night_sky(). Coordinates are equatorial, with axes
+    parallel to those seen from Earth (see equ_to_cart()), so that skies from different stars can be compared directly.
+    Attributes:
+        observer: the Star from which the sky is seen
+        stars: list of visible Stars, brightest first
+        ra: numpy array of right ascensions of the visible stars, in radians
+        dec: numpy array of declinations of the visible stars, in radians
+        mag: numpy array of apparent magnitudes of the visible stars, as seen by the observer
+        distance: numpy array of distances from the observer to the visible stars, in ly
+        mag_limit: faintest apparent magnitude included
+        years: epoch of the sky, in years from the catalogue epoch
+    """
+
+    def __init__(self, observer: "Star", stars: "list", ra, dec, mag, distance, mag_limit: "float" = 6.5,
+                 years: "float" = 0.):
+        self.observer = observer
+        self.stars = stars
+        self.ra = ra
+        self.dec = dec
+        self.mag = mag
+        self.distance = distance
+        self.mag_limit = mag_limit
+        self.years = years
+
+    def __len__(self):
+        return len(self.stars)
+
+    def __str__(self):
+        return "Sky from " + str(self.observer.name) + ": " + str(len(self)) + " Stars brighter than " + str(
+            self.mag_limit)
+
+    def stereographic(self, centre_ra: "float" = 0., centre_dec: "float" = math.pi / 2):
+        """
+        Stereographic projection of the visible stars onto a plane, as seen looking up at the sky, so that east is to
+        the left.
+        :param centre_ra: float: Right ascension of the centre of the projection, in radians.
+        :param centre_dec: float: Declination of the centre of the projection, in radians. The default is the north
+        celestial pole.
+        :return: tuple of numpy arrays x, y; stars opposite the centre project to infinity.
+        """
+        delta_ra = self.ra - centre_ra
+        cos_c = math.sin(centre_dec) * np.sin(self.dec) + math.cos(centre_dec) * np.cos(self.dec) * np.cos(delta_ra)
+        with np.errstate(divide='ignore'):
+            k = 2. / (1. + cos_c)
+        x = -k * np.cos(self.dec) * np.sin(delta_ra)
+        y = k * (math.cos(centre_dec) * np.sin(self.dec) - math.sin(centre_dec) * np.cos(self.dec) * np.cos(delta_ra))
+        return x, y
+
+    def plot(self, projection: "str" = "equatorial", centre_ra: "float" = 0., centre_dec: "float" = math.pi / 2,
+             hemisphere: "bool" = True, suppress: "bool" = False):
+        """
+        Plots the visible stars, with brighter stars drawn larger.
+        :param projection: str: "equatorial" for a plot of right ascension against declination, or "stereographic".
+        :param centre_ra: float: For stereographic projection, right ascension of the centre, in radians.
+        :param centre_dec: float: For stereographic projection, declination of the centre, in radians.
+        :param hemisphere: bool: For stereographic projection, if True only the hemisphere around the centre is plotted.
+        :param suppress: bool: If False, shows the figure.
+        :return: matplotlib.pyplot.figure
+        """
+        sizes = 2. * (self.mag_limit - self.mag + 1.) ** 2
+        sky = plt.figure()
+        ax = sky.add_subplot(111, facecolor='black')
+        if projection == "equatorial":
+            ax.scatter(np.degrees(self.ra) / 15., np.degrees(self.dec), s=sizes, c='white')
+            ax.set_xlim(24, 0)
+            ax.set_xlabel("Right Ascension (hours)")
+            ax.set_ylabel("Declination (degrees)")
+        elif projection == "stereographic":
+            x, y = self.stereographic(centre_ra=centre_ra, centre_dec=centre_dec)
+            if hemisphere:
+                visible = x ** 2 + y ** 2 <= 4.
+                x, y, sizes = x[visible], y[visible], sizes[visible]
+            ax.scatter(x, y, s=sizes, c='white')
+            ax.set_aspect('equal')
+        else:
+            raise ValueError("projection must be 'equatorial' or 'stereographic'")
+        ax.set_title(str(self))
+
+        if not suppress:
+            plt.show(sky)
+        return sky
+
+
+class CrossMatch:
+    """
+    The result of cross-matching one StarList against another, as produced by StarList.cross_match().
+    Attributes:
+        matched: list of (Star, Star) tuples, each pairing a star from the other list with its counterpart in this one
+        ambiguous: list of (Star, list) tuples, each pairing a star from the other list with all candidate counterparts
+        unmatched: list of Stars from the other list with no counterpart
+    """
+
+    def __init__(self):
+        self.matched = list()
+        self.ambiguous = list()
+        self.unmatched = list()
+
+    def __str__(self):
+        return str(len(self.matched)) + " Matched, " + str(len(self.ambiguous)) + " Ambiguous, " + str(
+            len(self.unmatched)) + " Unmatched"
+
+
+# Catalogue prefixes as they appear in alias strings, mapped to the Star attribute holding that id and the prefix used
+# for it in identifier keys. Gliese and Gliese-Jahreiss ids share a numbering, so are all keyed as GJ.
+catalogue_prefixes = {"HIP": ("hip", "HIP"), "HD": ("hd", "HD"), "HR": ("hr", "HR"), "GL": ("gl", "GJ"),
+                      "Gl": ("gl", "GJ"), "Gliese": ("gl", "GJ"), "GJ": ("gl", "GJ"), "WISE": ("wise", "WISE"),
+                      "WISEP": ("wisep", "WISEP"), "WISEPC": ("wisepc", "WISEPC"), "2MASS": ("two_mass", "2MASS"),
+                      "SDSS": ("sdss", "SDSS"), "EPIC": ("epic", "EPIC"), "SAO": ("sao", "SAO")}
+
+# Star attributes holding catalogue ids, mapped to the prefix used for them in identifier keys.
+catalogue_ids = {attribute: key_prefix for attribute, key_prefix in catalogue_prefixes.values()}
+
+# Matches one alias in a comma-separated alias string, splitting off the catalogue prefix if it has one. Longer prefixes
+# come first so that, eg, "WISEPC J1234" is not read as a WISE id.
+identifier_pattern = re.compile(
+    r"\s*(?P<name>(?:(?P<prefix>" + "|".join(sorted(catalogue_prefixes, key=len, reverse=True)) +
+    r")\s+(?P<id>[^,]+?))|[^,]+?)\s*(?:,|$)")
+
+# Star attributes that Star.merge_star() should not copy from one record to another.
+unmerged_star_attributes = ('idn', 'name', 'names', 'planets', 'planet_str', 'system', 'system_id', 'system_name',
+                            'local_id', 'wormholes_to', 'nearest_neighbour', 'nearest_neighbour_d', 'visited')
+
+
+def is_missing(value):
+    """
+    :param value: Any attribute value.
+    :return: bool: True if value is None, an empty or 'nan' string, or a float nan.
+    """
+    if value is None:
+        return True
+    if type(value) is str:
+        return value.strip() in ("", "nan", "None")
+    if isinstance(value, float):
+        return math.isnan(value)
+    return False
+
+
+def parse_identifiers(alias_str: "str"):
+    """
+    Splits a comma-separated string of aliases, as found in the exoplanet.eu catalogue, into its names, and picks out
+    those that are catalogue ids.
+    :param alias_str: str: eg "GJ 876, HIP 113020, 2MASS J22531672-1415489"
+    :return: tuple of (list of names, dict of {Star attribute: id}), eg (["GJ 876", "HIP 113020", ...],
+    {"gl": "GJ 876", "hip": "113020", ...})
+    """
+    names = []
+    ids = {}
+    if is_missing(alias_str):
+        return names, ids
+
+    for match in identifier_pattern.finditer(alias_str):
+        names.append(match.group("name"))
+        prefix = match.group("prefix")
+        if prefix is not None:
+            attribute, key_prefix = catalogue_prefixes[prefix]
+            if attribute == "gl":
+                # Gliese ids are stored with their prefix, as in HYG.
+                ids[attribute] = ("GJ " if prefix == "GJ" else "Gl ") + match.group("id")
+            else:
+                ids[attribute] = match.group("id")
+
+    return names, ids
+
+
+def identifier_key(attribute: "str", value):
+    """
+    Brings a catalogue id, as stored on a Star, to the standard form used as a key in StarList.identifier_index(), so
+    that records from different sources can be compared. Numbers read as floats ("1234.0") become integers ("1234"), and
+    Gliese ids lose their own prefix, so that "Gl 551" and "GJ 551" agree.
+    :param attribute: str: Star attribute holding the id, as in catalogue_ids.
+    :param value: The id as stored on the Star.
+    :return: str: The identifier key, eg "HIP 71683", or None if value is missing.
+    """
+    if is_missing(value):
+        return None
+    value = str(value).strip()
+    if attribute == "gl":
+        match = identifier_pattern.match(value)
+        if match.group("prefix") is not None:
+            value = match.group("id")
+    else:
+        try:
+            value = str(int(float(value)))
+        except ValueError:
+            pass
+    return catalogue_ids[attribute] + " " + value.replace(" ", "").upper()
+
+
+def catalogue_id_match(name: "str"):
+    """
+    :param name: str: A single name or alias.
+    :return: re.Match of identifier_pattern if the whole of name is a catalogue id, eg "HD 209458"; otherwise None.
+    """
+    match = identifier_pattern.match(name)
+    if match is not None and match.group("prefix") is not None and match.end() == len(name):
+        return match
+    return None
+
+
+def normalise_identifier(name: "str"):
+    """
+    Normalises a name or alias for lookup in StarList.identifier_index(): catalogue ids are converted with
+    identifier_key(), and other names are returned stripped of surrounding whitespace.
+    :param name: str: eg "Gliese 551", "HIP 71683.0", "Proxima Centauri"
+    :return: str: The identifier key.
+    """
+    name = name.strip()
+    match = catalogue_id_match(name)
+    if match is not None:
+        return identifier_key(catalogue_prefixes[match.group("prefix")][0], match.group("id"))
+    return name
+
+
+def star_identifiers(star: "Star", names: "bool" = True):
+    """
+    Lists the identifier keys of a Star: its catalogue ids, any of its names that are catalogue ids and, if names is
+    True, the rest of its names.
+    :param star: Star
+    :param names: bool: If False, only catalogue ids are listed.
+    :return: list of str
+    """
+    keys = []
+    for attribute in catalogue_ids:
+        key = identifier_key(attribute, getattr(star, attribute))
+        if key is not None and key not in keys:
+            keys.append(key)
+    for name in [star.name, star.proper] + star.names:
+        if is_missing(name):
+            continue
+        name = str(name).strip()
+        if names or catalogue_id_match(name) is not None:
+            key = normalise_identifier(name)
+            if key not in keys:
+                keys.append(key)
+    return keys
+
+
+def apparent_sky(positions, abs_mag, origins, mag_limit: "float" = 6.5):
+    """
+    Vectorised core of StarList.night_skies(): finds the stars visible from each of a set of points, and their
+    equatorial coordinates and apparent magnitudes as seen from there.
+    :param positions: numpy array of shape (n, 3) of star positions, in ly.
+    :param abs_mag: numpy array of the n absolute magnitudes.
+    :param origins: numpy array of shape (m, 3) of observer positions, in ly.
+    :param mag_limit: float: Faintest apparent magnitude to include.
+    :return: list of m tuples of numpy arrays (indices, ra, dec, mag, distance), sorted brightest first; indices are
+    into positions, ra and dec are in radians and distance in ly.
+    """
+    # Work with squared distances, and take square roots only for the stars that turn out to be visible.
+    px, py, pz = positions.T
+    dx = px[None, :] - origins[:, 0:1]
+    dy = py[None, :] - origins[:, 1:2]
+    dz = pz[None, :] - origins[:, 2:3]
+    d2 = dx * dx + dy * dy + dz * dz
+    pc2 = u.length_to_length(1., frm='ly', to='pc') ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mag = abs_mag[None, :] + 2.5 * np.log10(d2 * pc2) - 5.
+        visible = (d2 > 0) & (mag <= mag_limit)
+
+    skies = []
+    for i in range(len(origins)):
+        indices = np.flatnonzero(visible[i])
+        indices = indices[np.argsort(mag[i, indices], kind='stable')]
+        d = np.sqrt(d2[i, indices])
+        ra = np.mod(np.arctan2(dy[i, indices], dx[i, indices]), 2 * math.pi)
+        skies.append((indices, ra, np.arcsin(dz[i, indices] / d), mag[i, indices], d))
+    return skies
+
+
+def star_positions(stars: "list"):
+    """
+    :param stars: list of Stars.
+    :return: numpy array of shape (len(stars), 3) of the x, y, z coordinates of each star, in ly; rows are nan for stars
+    without a position.
+    """
+    positions = np.array([[math.nan if is_missing(c) else c for c in (s.x, s.y, s.z)] for s in stars], dtype=float)
+    return positions.reshape(-1, 3)
+
+
+def star_velocities(stars: "list"):
+    """
+    :param stars: list of Stars.
+    :return: numpy array of shape (len(stars), 3) of the vx, vy, vz velocity components of each star, in ly / year;
+    missing components are taken as zero.
+    """
+    velocities = np.array([[0. if is_missing(c) else c for c in (s.vx, s.vy, s.vz)] for s in stars], dtype=float)
+    return velocities.reshape(-1, 3)
+
+
+def sky_vectors(stars: "list"):
+    """
+    Unit vectors pointing to the sky positions of a list of stars. Positions are taken from rarad and decrad where set,
+    and otherwise from asc (hours) and dec (degrees).
+    :param stars: list of Stars.
+    :return: numpy array of shape (len(stars), 3); rows are nan for stars without a position.
+    """
+    ra = []
+    dec = []
+    for star in stars:
+        if not is_missing(star.rarad) and not is_missing(star.decrad):
+            ra.append(star.rarad)
+            dec.append(star.decrad)
+        elif not is_missing(star.asc) and not is_missing(star.dec):
+            ra.append(math.radians(15. * star.asc))
+            dec.append(math.radians(star.dec))
+        else:
+            ra.append(math.nan)
+            dec.append(math.nan)
+    ra = np.array(ra, dtype=float)
+    dec = np.array(dec, dtype=float)
+
+    return np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1).reshape(-1, 3)
+
+
 def imf(mass):
     """
     Returns the frequency of a given mass under the initial mass function
@@ -2288,6 +2822,51 @@ pdmf_def = dists[1]
 masses_def = np.arange(0.001, 315, step=0.001, dtype=float)
 
 
+def det_masses(num: "int"):
+    """
+    Draws num stellar masses at once from the present-day mass function; the bulk equivalent of Star.det_mass().
+    :param num: int: Number of masses to draw.
+    :return: numpy array of masses, in Solar masses.
+    """
+    return ma.sample_from_distribution(masses_def, pdmf_def, size=num)
+
+
+def luminosity_from_mass(mass):
+    """
+    Array-aware version of the main-sequence mass-luminosity relationship used in Star.ms_luminosity().
+    Mass-luminosity relationship: https://en.wikipedia.org/wiki/Mass%E2%80%93luminosity_relation
+    :param mass: Mass, or numpy array of masses, in Solar masses.
+    :return: Main-sequence luminosity, or numpy array of luminosities, in Solar units.
+    """
+    mass = np.asarray(mass, dtype=float)
+    conditions = [mass < 0.43, mass < 2, mass < 20]
+    s = np.select(conditions, [0.23, 1., 1.5], default=3200.)
+    a = np.select(conditions, [2.3, 4., 3.5], default=1.)
+    return s * mass ** a
+
+
+def habzone_from_luminosity(luminosity):
+    """
+    Array-aware version of the habitable zone calculation used in Star.ms_habzone().
+    Habitable zone: http://www.planetarybiology.com/calculating_habitable_zone.html
+    :param luminosity: Luminosity, or numpy array of luminosities, in Solar units.
+    :return: tuple of inner and outer borders of the habitable zone, in AU.
+    """
+    luminosity = np.asarray(luminosity, dtype=float)
+    return np.sqrt(luminosity / 1.1), np.sqrt(luminosity / 0.53)
+
+
+def lifespan_from_mass(mass):
+    """
+    Array-aware version of the main-sequence lifespan calculation used in Star.ms_lifespan().
+    From: https://en.wikipedia.org/wiki/Main_sequence#Lifetime
+    :param mass: Mass, or numpy array of masses, in Solar masses.
+    :return: Main-sequence lifespan, or numpy array of lifespans, in years.
+    """
+    mass = np.asarray(mass, dtype=float)
+    return (10. ** 10.) * (mass ** (-2.5))
+
+
 def distance_between(x1, y1, z1, x2, y2, z2):
     '''
     :param x1:
@@ -2304,7 +2883,9 @@ def distance_between(x1, y1, z1, x2, y2, z2):
 def equ_to_cart(asc_hrs, asc_mins, asc_sec, dec_deg, dec_mins, dec_sec, distance):
     """
 
-    Convert celestial coordinates of stars in the sky to Cartesian coordinates with Earth/Sun at the origin.
+    Convert celestial coordinates of stars in the sky to Cartesian coordinates with Earth/Sun at the origin. All
+    arguments may be numpy arrays, which are broadcast against each other, so that a whole catalogue can be converted in
+    one call.
 
     This cartesian system uses:
         + x axis: towards dec=0, asc=0 (vernal equinox)
@@ -2314,26 +2895,51 @@ def equ_to_cart(asc_hrs, asc_mins, asc_sec, dec_deg, dec_mins, dec_sec, distance
     :param asc_hrs: The hour component of the right ascension, in hours
     :param asc_mins: The minute component of the right ascension, in minutes
     :param asc_sec: The second component of the right ascension, in seconds
-    :param dec: Declination, in degrees
+    :param dec_deg: The degree component of the declination, in degrees
+    :param dec_mins: The arcminute component of the declination, in arcminutes
+    :param dec_sec: The arcsecond component of the declination, in arcseconds
     :param distance: Distance, in light years (or other units)
-    :return: numpy array of three Cartesian coordinates, x,y,z
+    :return: tuple of three Cartesian coordinates, x,y,z
     """
 
-    # First convert right ascension to degrees
-
-    # For R.A., the entire thing is multiplied by 15
+    # First convert right ascension and declination to radians
     asc = u.angle_ra_to_radians(asc_hrs, asc_mins, asc_sec)
-    # asc = 15. * (float(asc_hrs) + (1. / 60.) * float(asc_mins) + (1. / 3600.) * float(asc_sec))
     dec = u.angle_arc_to_decimal(dec_deg, dec_mins, dec_sec, radians=True)
+    distance = np.asarray(distance, dtype=float)
 
     # Now convert to Cartesian coordinates
-    x = float(distance) * math.cos(dec) * math.cos(asc)
-    y = float(distance) * math.cos(dec) * math.sin(asc)
-    z = float(distance) * math.sin(dec)
+    x = distance * np.cos(dec) * np.cos(asc)
+    y = distance * np.cos(dec) * np.sin(asc)
+    z = distance * np.sin(dec)
 
     return x, y, z
 
 
+def cart_to_equ(x, y, z):
+    """
+    Convert Cartesian coordinates, in the system used by equ_to_cart(), back to celestial coordinates; the inverse of
+    equ_to_cart(). All arguments may be numpy arrays, which are broadcast against each other.
+    :param x: x coordinate, in light years (or other units)
+    :param y: y coordinate
+    :param z: z coordinate
+    :return: tuple of right ascension hours, minutes, seconds; declination degrees, arcminutes, arcseconds; and
+    distance, in the units of x, y, z
+    """
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    z = np.asarray(z, dtype=float)
+
+    distance = np.sqrt(x ** 2 + y ** 2 + z ** 2)
+    asc = np.arctan2(y, x)
+    dec = np.arctan2(z, np.hypot(x, y))
+
+    asc_hrs, asc_mins, asc_sec = u.angle_radians_to_ra(asc)
+    dec_deg, dec_mins, dec_sec = u.angle_decimal_to_arc(dec, radians=True)
+
+    return asc_hrs, asc_mins, asc_sec, dec_deg, dec_mins, dec_sec, distance
+
+
 SolSystem = StarSystem(name='Sol System')
 SolSystem.x = 0.
 SolSystem.y = 0.
@@ -2,6 +2,13 @@ import numpy as np
 import numpy.random as r
 import math
 
+try:
+    from scipy.spatial import cKDTree
+
+    scipy_available = True
+except ImportError:
+    scipy_available = False
+
 
 def find_nearest(array, value):
     """
@@ -82,3 +89,112 @@ def perp_distance(point, line_point1, line_point2):
                    (y0 * z1 - y0 * z2 - y1 * z0 + y1 * z2 + y2 * z0 - y2 * z1)**2)
 
     return A2 / math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2 + (z2 - z1) ** 2)
+
+
+def sample_from_distribution(values, probabilities, size=1):
+    """
+    Produces an array of pseudorandom numbers given a custom probability distribution, by inverse transform sampling of
+    its cumulative distribution. Unlike prob_from_distribution(), which draws one value at a time by rejection, all
+    values are drawn in a single pass.
+
+    :param values: numpy array of values to be chosen from, in ascending order
+    :param probabilities: numpy array of (not necessarily normalised) probabilities corresponding to values
+    :param size: number of values to draw
+    :return: numpy array of values chosen
+    """
+    if probabilities.shape != values.shape:
+        raise ValueError('The two arrays must be the same length')
+
+    cdf = np.cumsum(probabilities, dtype=float)
+    cdf /= cdf[-1]
+
+    return np.interp(r.random(size), cdf, values)
+
+
+class PointIndex:
+    """
+    A spatial index over a fixed set of points in Cartesian space, for nearest-neighbour and within-radius queries.
+    Uses scipy's cKDTree where scipy is installed; otherwise falls back on a blockwise brute-force search in numpy.
+    """
+
+    def __init__(self, points, block_size: int = 2 ** 22):
+        """
+        :param points: array-like of shape (n, dimensions).
+        :param block_size: Maximum number of pairwise distances held in memory at once by the brute-force fallback.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points.reshape(-1, 1) if points.size == 0 else points.reshape(1, -1)
+        self.points = points
+        self.block_size = block_size
+        if scipy_available and len(self.points) > 0:
+            self.tree = cKDTree(self.points)
+        else:
+            self.tree = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def _prepare(self, points):
+        points = np.asarray(points, dtype=float)
+        if points.ndim == 1:
+            points = points.reshape(1, -1)
+        return points
+
+    def _blocks(self, points):
+        """
+        Yields (start, squared distance matrix) for successive blocks of query points, for the brute-force fallback.
+        """
+        rows = max(1, self.block_size // max(len(self.points), 1))
+        sq_norms = np.einsum('ij,ij->i', self.points, self.points)
+        for start in range(0, len(points), rows):
+            chunk = points[start:start + rows]
+            d2 = np.einsum('ij,ij->i', chunk, chunk)[:, None] + sq_norms[None, :] - 2 * chunk @ self.points.T
+            yield start, np.maximum(d2, 0.)
+
+    def query(self, points, k: int = 1):
+        """
+        Finds the k nearest indexed points to each of the query points.
+        :param points: array-like of shape (m, dimensions), or a single point.
+        :param k: Number of neighbours to find.
+        :return: tuple of numpy arrays (distances, indices), each of shape (m, k) and sorted by distance.
+        """
+        points = self._prepare(points)
+        k = min(k, len(self))
+        if k < 1:
+            return np.empty((len(points), 0)), np.empty((len(points), 0), dtype=int)
+
+        if self.tree is not None:
+            distances, indices = self.tree.query(points, k=k)
+            return distances.reshape(len(points), k), indices.reshape(len(points), k)
+
+        distances = np.empty((len(points), k))
+        indices = np.empty((len(points), k), dtype=int)
+        for start, d2 in self._blocks(points):
+            idx = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            d2 = np.take_along_axis(d2, idx, axis=1)
+            order = np.argsort(d2, axis=1)
+            stop = start + len(d2)
+            indices[start:stop] = np.take_along_axis(idx, order, axis=1)
+            distances[start:stop] = np.sqrt(np.take_along_axis(d2, order, axis=1))
+        return distances, indices
+
+    def query_radius(self, points, radius: float):
+        """
+        Finds all indexed points within radius of each of the query points.
+        :param points: array-like of shape (m, dimensions), or a single point.
+        :param radius: Search radius, in the units of the points.
+        :return: list of m numpy arrays of indices.
+        """
+        points = self._prepare(points)
+        if len(self) == 0:
+            return [np.empty(0, dtype=int) for _ in range(len(points))]
+
+        if self.tree is not None:
+            return [np.asarray(found, dtype=int) for found in self.tree.query_ball_point(points, r=radius)]
+
+        found = []
+        for start, d2 in self._blocks(points):
+            for row in d2:
+                found.append(np.flatnonzero(row <= radius ** 2))
+        return found
@@ -1,4 +1,7 @@
 import math
+import operator
+from functools import partial
+import numpy as np
 
 # TODO: Allow entry of raw number into 'units' argument of each function, ie allow custom units as multiples of the
 # base unit
@@ -78,8 +81,7 @@ def acceleration_from_m_s_2(acc: "float", units="g"):
 
 
 def acceleration_to_acceleration(acc: "float", frm: "str", to: "str"):
-    acc = acceleration_to_m_s_2(acc, frm)
-    return acceleration_from_m_s_2(acc, to)
+    return acc * conversion_factor(frm, to, "acceleration")
 
 
 # ANGLE (in radians [rad])
@@ -124,13 +126,14 @@ def angle_from_radians(angle: "float", units: "str" = "degree"):
 
 
 def angle_to_angle(angle: "float", frm: "str", to: "str"):
-    angle = angle_to_radians(angle, frm)
-    return angle_from_radians(angle, to)
+    return angle * conversion_factor(frm, to, "angle")
 
 
 def angle_arc_to_decimal(deg: "float", mins: "float", secs: "float", radians=False):
     """
-    Converts a measurement in degrees, arcminutes, arcseconds to a decimal fraction of degrees.
+    Converts a measurement in degrees, arcminutes, arcseconds to a decimal fraction of degrees. Accepts numpy arrays,
+    which are broadcast against each other. The sign of deg applies to the whole angle, so that (-5, 30, 0) gives -5.5;
+    pass deg as -0. for negative angles smaller than a degree.
     :param deg:
     :param mins:
     :param secs:
@@ -138,23 +141,63 @@ def angle_arc_to_decimal(deg: "float", mins: "float", secs: "float", radians=Fal
     :return:
     """
 
-    angle = float(deg) + (1. / 60.) * float(mins) + (1. / 3600.) * float(secs)
+    deg = np.asarray(deg, dtype=float)
+    sign = np.where(np.signbit(deg), -1., 1.)
+    angle = deg + sign * ((1. / 60.) * np.asarray(mins, dtype=float) + (1. / 3600.) * np.asarray(secs, dtype=float))
     if radians:
-        angle = angle_to_radians(angle, units="degrees")
+        angle = angle * degree
 
     return angle
 
 
+def angle_decimal_to_arc(angle: "float", radians=False):
+    """
+    Converts a decimal angle into degrees, arcminutes and arcseconds; the inverse of angle_arc_to_decimal(). Accepts
+    numpy arrays. The sign is carried by the degrees, which are -0. for negative angles smaller than a degree.
+    :param angle:
+    :param radians: If True, angle is interpreted as radians; otherwise as degrees.
+    :return: tuple of degrees, arcminutes, arcseconds
+    """
+
+    angle = np.asarray(angle, dtype=float)
+    if radians:
+        angle = angle / degree
+    magnitude = np.abs(angle)
+    deg = np.floor(magnitude)
+    mins = np.floor((magnitude - deg) * 60.)
+    secs = (magnitude - deg - mins / 60.) * 3600.
+
+    return np.copysign(deg, angle), mins, secs
+
+
 def angle_ra_to_radians(hrs: "float", mins: "float", secs: "float"):
     """
-    Converts a measurement of right ascension in hours, minutes, seconds to radians
+    Converts a measurement of right ascension in hours, minutes, seconds to radians. Accepts numpy arrays, which are
+    broadcast against each other.
     :param hrs:
     :param mins:
     :param secs:
     :return:
     """
 
-    return angle_to_radians(hrs, "ra_hr") + angle_to_radians(mins, "ra_min") + angle_to_radians(secs, "ra_sec")
+    return (np.asarray(hrs, dtype=float) * ra_hr + np.asarray(mins, dtype=float) * ra_min
+            + np.asarray(secs, dtype=float) * ra_sec)
+
+
+def angle_radians_to_ra(angle: "float"):
+    """
+    Converts an angle in radians to right ascension in hours, minutes, seconds, wrapped into the range 0 to 24 hours;
+    the inverse of angle_ra_to_radians(). Accepts numpy arrays.
+    :param angle:
+    :return: tuple of hours, minutes, seconds
+    """
+
+    hours = np.mod(np.asarray(angle, dtype=float), circle) / ra_hr
+    hrs = np.floor(hours)
+    mins = np.floor((hours - hrs) * 60.)
+    secs = (hours - hrs - mins / 60.) * 3600.
+
+    return hrs, mins, secs
 
 
 # ANGULAR VELOCITY (in radians/second [rad/s])
@@ -242,7 +285,7 @@ nmi = 1.852 * kilo
 # Earth radius
 R_E = 6.371e3
 
-length_units = {'m': 1., 'km': kilo, 'AU': AU, 'ly': ly, 'parsec': pc, 'pc': pc}
+length_units = {'m': 1., 'km': kilo, 'AU': AU, 'ly': ly, 'parsec': pc, 'pc': pc, 'mi': mi, 'nmi': nmi}
 
 
 def length_to_metre(length, units='AU'):
@@ -264,8 +307,7 @@ def length_from_metre(length, units='AU'):
 
 
 def length_to_length(length, frm='pc', to='ly'):
-    length = length_to_metre(length, frm)
-    return length_from_metre(length, to)
+    return length * conversion_factor(frm, to, "length")
 
 
 # AREA (metres^2 [m^2])
@@ -383,8 +425,7 @@ def mass_from_kg(mass, units='M_E'):
 
 
 def mass_to_mass(mass, frm='M_E', to='M_J'):
-    mass = mass_to_kg(mass, frm)
-    return mass_from_kg(mass, to)
+    return mass * conversion_factor(frm, to, "mass")
 
 
 # MASS DENSITY (kilograms / metres^3 [kg/m^3])
@@ -431,7 +472,7 @@ yr_Gregorian = 365.3435 * day
 # year, hence leap years.
 yr_orbital = 1.00001742096 * yr
 
-time_units = {"s": 1., "yr": yr, "hr": hr}
+time_units = {"s": 1., "min": minute, "hr": hr, "h": hr, "day": day, "yr": yr}
 
 
 def time_from_sec(time, units='yr'):
@@ -452,9 +493,8 @@ def time_to_sec(time, units='yr'):
     return time * factor
 
 
-def time_to_time(time, frm: str = 's', to: str = 'kph'):
-    time = time_from_sec(time, frm)
-    return time_to_sec(time, to)
+def time_to_time(time, frm: str = 's', to: str = 'yr'):
+    return time * conversion_factor(frm, to, "time")
 
 
 # VELOCITY (in metres/second [m/s])
@@ -468,7 +508,7 @@ kph = kilo / hr
 # US miles per hour (mph)
 mph = mi / hr
 
-vel_units = {"m_s": 1., "c": c, "kph": kph, "mph": mph}
+vel_units = {"m_s": 1., "m/s": 1., "c": c, "kph": kph, "km/h": kph, "km/s": kilo, "mph": mph}
 
 
 def velocity_from_m_s(v, units='c'):
@@ -490,5 +530,67 @@ def velocity_to_m_s(v, units='c'):
 
 
 def velocity_to_velocity(velocity, frm: str = 'mph', to: str = 'kph'):
-    velocity = velocity_from_m_s(velocity, frm)
-    return velocity_to_m_s(velocity, to)
+    return velocity * conversion_factor(frm, to, "velocity")
+
+
+# CONVERSION REGISTRY
+
+# Each kind of quantity, mapped to its table of units (as multiples of the base SI unit).
+unit_tables = {"acceleration": acceleration_units, "angle": angle_units, "angular velocity": ang_vel_units,
+               "length": length_units, "mass": mass_units, "time": time_units, "velocity": vel_units}
+
+
+def factor_table(units: dict):
+    """
+    Precomputes the conversion factor between every pair of units in a table.
+    :param units: dict of unit names and their values in the base unit, eg length_units.
+    :return: dict of {(from, to): factor}
+    """
+    return {(frm, to): units[frm] / units[to] for frm in units for to in units}
+
+
+# Factor tables for every pair of units of each kind of quantity; kept in step with unit_tables by register_unit().
+conversion_factors = {quantity: factor_table(table) for quantity, table in unit_tables.items()}
+
+
+def register_unit(quantity: str, name: str, value: float):
+    """
+    Adds a custom unit, or redefines an existing one, and updates the conversion factors.
+    :param quantity: Kind of quantity, as a key of unit_tables, eg "length".
+    :param name: Name of the unit.
+    :param value: Value of one of the unit in the base SI unit for that quantity.
+    """
+    if quantity not in unit_tables:
+        raise ValueError('Unrecognised quantity.')
+    unit_tables[quantity][name] = value
+    conversion_factors[quantity] = factor_table(unit_tables[quantity])
+
+
+def conversion_factor(frm: str, to: str, quantity: str = None):
+    """
+    Looks up the factor by which to multiply a value in one unit to convert it to another.
+    :param frm: Unit to convert from.
+    :param to: Unit to convert to.
+    :param quantity: Kind of quantity, as a key of unit_tables. If not given, it is found from the units.
+    :return: float
+    """
+    if quantity is None:
+        for table in conversion_factors.values():
+            if (frm, to) in table:
+                return table[(frm, to)]
+    elif quantity in conversion_factors and (frm, to) in conversion_factors[quantity]:
+        return conversion_factors[quantity][(frm, to)]
+    raise ValueError('Unrecognised unit.')
+
+
+def converter(frm: str, to: str, quantity: str = None):
+    """
+    Builds a function converting values from one unit to another, for use in loops. The units are looked up once,
+    here, rather than on each call. The function accepts numbers or numpy arrays, and converts with a single
+    multiplication. It does not follow later changes made with register_unit().
+    :param frm: Unit to convert from.
+    :param to: Unit to convert to.
+    :param quantity: Kind of quantity, as a key of unit_tables. If not given, it is found from the units.
+    :return: function of one argument.
+    """
+    return partial(operator.mul, conversion_factor(frm, to, quantity))
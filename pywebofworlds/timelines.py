@@ -1,5 +1,6 @@
+import re
 import numpy as np
-import utils as u
+from functools import total_ordering
 from typing import Union
 
 
@@ -31,22 +32,97 @@ class DateSystem:
         self.min_year = min_year
         self.year_suffix = year_suffix
 
+        self.build_tables()
+
+    def build_tables(self):
+        """
+        Precompute lookup tables for converting between day of the year and (month, day). Called on creation; call
+        again if months or month_lengths are changed.
+        month_offsets[i] is the number of days in the year before month i + 1; day_months[n - 1] and day_days[n - 1]
+        are the month and day of the month of the nth day of the year.
+        :return:
+        """
+        if self.month_lengths is None:
+            self.month_offsets = self.day_months = self.day_days = None
+            return
+        lengths = np.asarray(self.month_lengths, dtype=int)
+        self.month_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.day_months = np.repeat(np.arange(1, len(lengths) + 1), lengths)
+        self.day_days = np.arange(self.month_offsets[-1]) - np.repeat(self.month_offsets[:-1], lengths) + 1
+
     def days_in_year(self):
-        return sum(self.month_lengths)
+        return int(self.month_offsets[-1])
+
+    def month_and_day(self, n):
+        """
+        Look up the month and day of the month of the nth day of the year.
+        :param n: Day of the year, counting from 1; int or numpy array.
+        :return: tuple of month and day, as ints or numpy arrays.
+        """
+        if np.ndim(n) == 0:
+            return int(self.day_months[n - 1]), int(self.day_days[n - 1])
+        n = np.asarray(n) - 1
+        return self.day_months[n], self.day_days[n]
+
+    def nth_day(self, month, day):
+        """
+        Look up which numbered day of the year a month and day are.
+        :param month: int or numpy array.
+        :param day: int or numpy array.
+        :return: Day of the year, counting from 1; int or numpy array.
+        """
+        if np.ndim(month) == 0 and np.ndim(day) == 0:
+            return int(self.month_offsets[month - 1]) + day
+        return self.month_offsets[np.asarray(month) - 1] + day
+
+    def equivalent_nth_day(self, n, other: Union['DateSystem', str] = 'Gregorian'):
+        """
+        Gives the day of the year at the same fraction through the year in another system, as with equivalent_date().
+        :param n: Day of the year in this system, counting from 1; int or numpy array.
+        :param other: DateSystem, or name of one in availableSystems.
+        :return: Day of the year in other, counting from 1; int or numpy array.
+        """
+        other = check_available(other)
+        position = np.clip(np.round(other.days_in_year() * np.asarray(n) / self.days_in_year()), 1,
+                           other.days_in_year()).astype(int)
+        if np.ndim(n) == 0:
+            return int(position)
+        return position
+
+    def day_number(self, year: int, month: int, day: int):
+        """
+        Encodes a date in this system as a single integer: the number of days since the first day of year 0. Negative
+        for dates before year 0. A month or day of 0 (ie unset, as in Date(year=2016)) is taken as the first, so that
+        a date with only a year counts as the start of that year.
+        :param year:
+        :param month:
+        :param day:
+        :return: int
+        """
+        return year * self.days_in_year() + self.nth_day(month or 1, day or 1) - 1
+
+    def date_from_day_number(self, n: int):
+        """
+        Decodes a day number, as given by day_number(), to a Date.
+        :param n: Days since the first day of year 0.
+        :return: Date object.
+        """
+        year, n = divmod(int(n), self.days_in_year())
+        date = self.date_of_nth_day(n + 1)
+        date.set_year(year)
+        return date
 
     def date_of_nth_day(self, n):
-        return self.days_of_year()[n - 1]
+        month, day = self.month_and_day(n)
+        return Date(year=None, month=month, day=day, system=self)
 
     def days_of_year(self):
         """
         Generate list of all days in the year.
         :return:
         """
-        days = []
-        for i, month in enumerate(self.months):
-            for j in range(self.month_lengths[i]):
-                days.append(Date(year=None, month=i + 1, day=j + 1, system=self))
-        return days
+        return [Date(year=None, month=int(month), day=int(day), system=self) for month, day in
+                zip(self.day_months, self.day_days)]
 
     def equivalent_date(self, date: Union['Date', str], other: Union['DateSystem', str] = 'Gregorian'):
         """
@@ -65,8 +141,7 @@ class DateSystem:
 
         # Divide the date's position in the year by the number of days in a year, then multiply by the number of days in
         # other system's year to get the equivalent position.
-        position = other.days_in_year() * date.day_of_year() / self.days_in_year()
-        return other.days_of_year()[int(np.round(position))]
+        return other.date_of_nth_day(self.equivalent_nth_day(date.day_of_year(), other))
 
     def rand_date(self):
         """
@@ -81,11 +156,190 @@ class DateSystem:
         return date
 
 
-# TODO: Decimal year to date conversion (nontrivial with negative dates - have to flip)
-# TODO: Named month format
+# Tokens recognised in date format patterns, longest first so that eg 'yyyy' is not read as four 'y's, with the regular
+# expressions used to parse them.
+date_tokens = {'yyyy': r'(?P<year>-?\d{4,})', 'MMMM': None, 'mm': r'(?P<month>\d{2})', 'dd': r'(?P<day>\d{2})',
+               'y': r'(?P<year>-?\d+)', 'm': r'(?P<month>\d{1,2})', 'd': r'(?P<day>\d{1,2})'}
+date_token_pattern = re.compile('|'.join(date_tokens))
+# Named formats, and the patterns they stand for. 'Words' also appends the system's year suffix.
+named_date_formats = {'yyyy-mm-dd': 'yyyy-mm-dd', 'Words': 'MMMM d, y'}
+
+
+class DateFormat:
+    def __init__(self, fmt: str = 'yyyy-mm-dd', system: Union[DateSystem, str] = 'Gregorian'):
+        """
+        A date format, compiled once into a template for formatting and a regular expression for parsing. Patterns are
+        built from the tokens yyyy (year, zero-padded to at least 4 digits), y (year), mm / m (month number, padded or
+        not), dd / d (day, padded or not) and MMMM (month name); everything else is literal text. Years may be negative
+        or longer than 4 digits. Use date_format() to get a cached DateFormat.
+        :param fmt: Pattern, or one of the names in named_date_formats.
+        :param system: DateSystem to use. If a string is passed, attempts to match it to the defaults in
+            availableSystems.
+        """
+        self.system = check_available(system)
+        self.fmt = fmt
+        pattern = named_date_formats.get(fmt, fmt)
+        suffix = self.system.year_suffix if fmt == 'Words' else ''
+
+        # Split the pattern into alternating literals and tokens: literals[i] comes before tokens[i].
+        self.tokens = date_token_pattern.findall(pattern)
+        if not self.tokens:
+            raise ValueError('Date format not recognised')
+        self.literals = date_token_pattern.split(pattern)
+        self.literals[-1] += suffix
+
+        template = ''
+        regex = ''
+        for literal, token in zip(self.literals, self.tokens + ['']):
+            template += literal.replace('{', '{{').replace('}', '}}')
+            regex += re.escape(literal)
+            if token == 'yyyy':
+                template += '{year_sign}{year_abs:04d}'
+            elif token == 'y':
+                template += '{year}'
+            elif token in ('mm', 'dd'):
+                template += '{' + ('month' if token == 'mm' else 'day') + ':02d}'
+            elif token in ('m', 'd'):
+                template += '{' + ('month' if token == 'm' else 'day') + '}'
+            elif token == 'MMMM':
+                template += '{month_name}'
+            if token == 'MMMM':
+                regex += '(?P<month_name>' + '|'.join(re.escape(name) for name in self.system.months) + ')'
+            elif token:
+                regex += date_tokens[token]
+        self.template = template
+        self.regex = re.compile(regex)
+        if self.system.months is not None:
+            self.month_numbers = {name: i + 1 for i, name in enumerate(self.system.months)}
+
+    def format(self, year: int, month: int, day: int):
+        """
+        :return: Date as a string. An unset month (0) has an empty month name, as in Date.month_name.
+        """
+        month_name = self.system.months[month - 1] if month and 'MMMM' in self.tokens else ''
+        return self.template.format(year=year, year_sign='-' if year < 0 else '', year_abs=abs(year), month=month,
+                                    day=day, month_name=month_name)
+
+    def parse(self, string: str):
+        """
+        :param string: Date as a string.
+        :return: tuple of ints (year, month, day).
+        """
+        match = self.regex.fullmatch(string.strip())
+        if match is None:
+            raise ValueError(f"'{string}' does not match date format '{self.fmt}'")
+        fields = match.groupdict()
+        if 'month_name' in fields:
+            month = self.month_numbers[fields['month_name']]
+        else:
+            month = int(fields['month'])
+        return int(fields['year']), month, int(fields['day'])
+
+    def format_array(self, years, months, days):
+        """
+        Format many dates at once.
+        :param years: numpy array of years.
+        :param months: numpy array of months.
+        :param days: numpy array of days.
+        :return: numpy array of strings.
+        """
+        years, months, days = np.asarray(years), np.asarray(months), np.asarray(days)
+        if years.size == 0:
+            return np.full(years.shape, '')
+        strings = np.full(years.shape, self.literals[0])
+        for token, literal in zip(self.tokens, self.literals[1:]):
+            if token == 'yyyy':
+                text = np.char.add(np.where(years < 0, '-', ''), np.char.zfill(np.abs(years).astype(str), 4))
+            elif token == 'y':
+                text = years.astype(str)
+            elif token in ('mm', 'm'):
+                text = np.char.zfill(months.astype(str), 2) if token == 'mm' else months.astype(str)
+            elif token in ('dd', 'd'):
+                text = np.char.zfill(days.astype(str), 2) if token == 'dd' else days.astype(str)
+            else:
+                text = np.array([''] + list(self.system.months))[months]
+            strings = np.char.add(np.char.add(strings, text), literal)
+        return strings
+
+    def parse_array(self, strings):
+        """
+        Parse many dates at once. Where every pair of tokens is separated by literal text, the strings are split with
+        numpy string operations, working from the right so that a leading minus sign stays with the year; otherwise
+        each string is matched with the regular expression.
+        :param strings: Sequence or numpy array of strings.
+        :return: tuple of numpy arrays (years, months, days).
+        """
+        strings = np.char.strip(np.asarray(strings, dtype=str))
+        if strings.size == 0:
+            empty = np.zeros(strings.shape, dtype=np.int64)
+            return empty, empty.copy(), empty.copy()
+        if not all(self.literals[1:-1]):
+            parsed = np.array([self.parse(string) for string in strings.ravel()], dtype=np.int64).reshape(
+                strings.shape + (3,))
+            return parsed[..., 0], parsed[..., 1], parsed[..., 2]
+
+        prefix, suffix = self.literals[0], self.literals[-1]
+        if not (np.char.startswith(strings, prefix) & np.char.endswith(strings, suffix)).all():
+            raise ValueError(f"Not all dates match date format '{self.fmt}'")
+        if prefix:
+            strings = np.char.partition(strings, prefix)[..., 2]
+        if suffix:
+            strings = np.char.rpartition(strings, suffix)[..., 0]
+
+        fields = {}
+        rest = strings
+        for token, separator in zip(self.tokens[:0:-1], self.literals[-2:0:-1]):
+            parts = np.char.rpartition(rest, separator)
+            if not (parts[..., 1] == separator).all():
+                raise ValueError(f"Not all dates match date format '{self.fmt}'")
+            rest = parts[..., 0]
+            fields[token] = parts[..., 2]
+        fields[self.tokens[0]] = rest
+
+        years = months = days = None
+        for token, text in fields.items():
+            if token in ('yyyy', 'y'):
+                years = text.astype(np.int64)
+            elif token in ('mm', 'm'):
+                months = text.astype(np.int64)
+            elif token in ('dd', 'd'):
+                days = text.astype(np.int64)
+            else:
+                names = np.array(self.system.months)
+                order = np.argsort(names)
+                position = np.clip(np.searchsorted(names[order], text), 0, len(names) - 1)
+                if not (names[order][position] == text).all():
+                    raise ValueError(f"Not all dates match date format '{self.fmt}'")
+                months = order[position] + 1
+        return years, months, days
+
+
+# Compiled DateFormats, keyed by (format, DateSystem).
+_date_formats = {}
+
+
+def date_format(fmt: str = 'yyyy-mm-dd', system: Union[DateSystem, str] = 'Gregorian'):
+    """
+    Get the compiled DateFormat for a format and system, compiling it on first use.
+    :param fmt: Pattern, or one of the names in named_date_formats.
+    :param system: DateSystem, or name of one in availableSystems.
+    :return: DateFormat object.
+    """
+    system = check_available(system)
+    key = (fmt, system)
+    if key not in _date_formats:
+        _date_formats[key] = DateFormat(fmt=fmt, system=system)
+    return _date_formats[key]
+
+
+@total_ordering
 class Date:
+    # Dates are held in large numbers by character lists and event logs, so they are kept small: the month name and
+    # month lengths are looked up from the system when needed rather than stored.
+    __slots__ = ('system', 'year', 'month', 'day')
+
     def __init__(self, string: str = None, year: int = None, month: int = None, day: int = None, time=None,
-                 system: Union[DateSystem, str] = 'Gregorian'):
+                 system: Union[DateSystem, str] = 'Gregorian', fmt: str = 'yyyy-mm-dd'):
         """
 
         :param string: Date in string format. Overrides year, month, and day.
@@ -95,21 +349,19 @@ class Date:
         :param time:
         :param system: DateSystem to use. If a string is passed, attempts to match it to the defaults in
             availableSystems.
+        :param fmt: Format of string; see DateFormat.
         """
 
         # If 'system' is a string, attempt to use that to set the date system from the available defaults.
         self.system = check_available(system)
 
-        self.max_days = self.system.month_lengths
-
         if string is not None:
-            self.str_to_date(date=string)
+            self.str_to_date(date=string, fmt=fmt)
         else:
             self.year = int()
             if year is not None:
                 self.set_year(year)
 
-            self.month_name = str()
             self.month = int()
             if month is not None:
                 self.set_month(month)
@@ -121,13 +373,77 @@ class Date:
     def __str__(self):
         return self.show(fmt='yyyy-mm-dd')
 
+    def __eq__(self, other):
+        if not isinstance(other, Date) or other.system is not self.system:
+            return NotImplemented
+        return self.day_number() == other.day_number()
+
+    def __lt__(self, other):
+        if not isinstance(other, Date) or other.system is not self.system:
+            return NotImplemented
+        return self.day_number() < other.day_number()
+
+    def __add__(self, days: int):
+        """
+        date + n gives the Date n days later.
+        """
+        if isinstance(days, Date):
+            return NotImplemented
+        return self.system.date_from_day_number(self.day_number() + int(days))
+
+    def __radd__(self, days: int):
+        return self.__add__(days)
+
+    def __sub__(self, other):
+        """
+        date - n gives the Date n days earlier; date2 - date1 gives the number of days between them.
+        """
+        if isinstance(other, Date):
+            if other.system is not self.system:
+                raise ValueError('Dates must be in the same system to subtract.')
+            return self.day_number() - other.day_number()
+        return self.system.date_from_day_number(self.day_number() - int(other))
+
+    @property
+    def month_name(self):
+        if self.month == int():
+            return str()
+        return self.system.months[self.month - 1]
+
+    @property
+    def max_days(self):
+        return self.system.month_lengths
+
+    def day_number(self):
+        """
+        Encode this date as the number of days since the first day of year 0 in its system, so that dates can be stored
+        and compared as integers.
+        :return: int
+        """
+        return self.system.day_number(year=self.year, month=self.month, day=self.day)
+
+    def decimal_year(self):
+        """
+        Express this date as a decimal year, measured from the start of year 0, so that the start of each day is
+        year + (day of year - 1) / days in year. Negative years count forwards from their start in the same way; eg the
+        last day of year -1 is just below 0.
+        :return: float
+        """
+        return self.day_number() / self.system.days_in_year()
+
     def set_year(self, year):
 
         year = int(year)
 
         self.year = year
 
-    def set_month(self, month):
+    def set_month(self, month, rollover: bool = False):
+        """
+        :param month: Month number.
+        :param rollover: If True, months beyond the end (or before the start) of the year move into the following
+            (or previous) years, and the day is reduced to fit the new month if necessary. If False, the month is
+            clamped to the year.
+        """
 
         month = int(month)
         max_month = int()
@@ -135,21 +451,36 @@ class Date:
         month_list = self.system.months
         max_month = len(month_list)
 
+        if rollover:
+            years, month = divmod(month - 1, max_month)
+            self.year += years
+            month += 1
+            if self.day != int():
+                self.day = min(self.day, self.max_days[month - 1])
+
         if month > max_month:
             month = max_month
         if month < 1:
             month = 1
 
         self.month = month
-        self.month_name = month_list[month - 1]
 
-    def set_day(self, day):
+    def set_day(self, day, rollover: bool = False):
+        """
+        :param day: Day of the month.
+        :param rollover: If True, days beyond the end (or before the start) of the month move into the following (or
+            previous) months and years. If False, the day is clamped to the month.
+        """
 
         if self.month == int():
             raise ValueError('Month must be set first')
 
         day = int(day)
 
+        if rollover:
+            date = self.system.date_from_day_number(self.system.day_number(self.year, self.month, 1) + day - 1)
+            self.year, self.month, day = date.year, date.month, date.day
+
         max_day = self.max_days[self.month - 1]
 
         if day < 1:
@@ -159,22 +490,45 @@ class Date:
 
         self.day = day
 
+    def add_months(self, months: int):
+        """
+        Produce the Date a number of months later, keeping the day of the month where possible and otherwise using the
+        last day of the month.
+        :param months: Number of months to add; negative for earlier dates.
+        :return: New Date.
+        """
+        date = Date(year=self.year, month=self.month, day=self.day, system=self.system)
+        date.set_month(self.month + int(months), rollover=True)
+        return date
+
+    def add_years(self, years: int):
+        """
+        Produce the Date a number of years later.
+        :param years: Number of years to add; negative for earlier dates.
+        :return: New Date.
+        """
+        return Date(year=self.year + int(years), month=self.month, day=self.day, system=self.system)
+
+    def years_since(self, other: 'Date'):
+        """
+        Count the whole years from another date to this one, as for an age.
+        :param other: Earlier Date, in the same system.
+        :return: int; negative if other is later.
+        """
+        years = self.year - other.year
+        if (self.month, self.day) < (other.month, other.day):
+            years -= 1
+        return years
+
     def str_to_date(self, date: str, fmt: str = 'yyyy-mm-dd'):
-        if fmt == 'yyyy-mm-dd':
-            self.year = int(date[0:4])
-            self.month = int(date[5:7])
-            self.day = int(date[8:])
+        self.year, self.month, self.day = date_format(fmt, self.system).parse(date)
 
     def day_of_year(self):
         """
-        Calculate which numbered day of the year this is.
+        Calculate which numbered day of the year this is; an unset month or day counts as the first.
         :return:
         """
-        days = 0
-        for i in range(self.month - 1):
-            days += self.system.month_lengths[i]
-        days += self.day
-        return days
+        return self.system.nth_day(self.month or 1, self.day or 1)
 
     def rand_date(self):
         date = self.system.rand_date()
@@ -183,17 +537,12 @@ class Date:
         self.year = date.year
 
     def show(self, fmt='yyyy-mm-dd'):
-        available_formats = ['yyyy-mm-dd', 'Words']
-
-        if fmt not in available_formats:
-            raise ValueError('Date format not recognised')
-
-        if fmt == 'yyyy-mm-dd':
-            return u.leading_zeroes(self.year, 4) + '-' + u.leading_zeroes(self.month, 2) + '-' + u.leading_zeroes(
-                self.day, 2)
-
-        elif fmt == 'Words':
-            return self.month_name + ' ' + str(self.day) + ', ' + str(self.year) + self.system.year_suffix
+        """
+        Format this date as a string.
+        :param fmt: 'yyyy-mm-dd', 'Words', or another pattern; see DateFormat.
+        :return: str
+        """
+        return date_format(fmt, self.system).format(self.year, self.month, self.day)
 
 
 # Date systems in my universe:
@@ -225,8 +574,564 @@ def check_available(system: Union[str, DateSystem]):
         return system
 
 
-def str_to_date(string: str, fmt: str = 'yyyy-mm-dd'):
-    return Date().str_to_date(string, fmt)
+def date_from_decimal_year(year: float, system: Union[DateSystem, str] = 'Gregorian'):
+    """
+    Convert a decimal year to the Date containing it; the inverse of Date.decimal_year().
+    :param year: Decimal year, measured from the start of year 0.
+    :param system: DateSystem, or name of one in availableSystems.
+    :return: Date object.
+    """
+    system = check_available(system)
+    return system.date_from_day_number(int(np.floor(year * system.days_in_year())))
+
+
+class DateArray:
+    def __init__(self, days=None, system: Union[DateSystem, str] = 'Gregorian', years=None):
+        """
+        Many dates in one DateSystem, stored as a numpy array of day numbers (see DateSystem.day_number()), so that
+        conversion, sorting and searching are done on whole arrays at once.
+        Systems without months (eg Provectus, Rachara, Semartol) have no day numbers, so their dates are stored as
+        decimal years instead; day-based methods raise ValueError for them.
+        :param days: Day numbers; sequence or numpy array of ints.
+        :param system: DateSystem to use. If a string is passed, attempts to match it to the defaults in
+            availableSystems.
+        :param years: Decimal years, as an alternative to days; see Date.decimal_year().
+        """
+        self.system = check_available(system)
+        self.decimal = self.system.month_lengths is None
+        if self.decimal:
+            if days is not None and years is None:
+                raise ValueError('Date system has no months; dates must be given as decimal years.')
+            self.values = np.asarray(years if years is not None else [], dtype=float)
+        else:
+            if years is not None:
+                days = np.floor(np.asarray(years, dtype=float) * self.system.days_in_year())
+            self.values = np.asarray(days if days is not None else [], dtype=np.int64)
+        # Set by sort(), so that range queries can use binary search.
+        self.is_sorted = False
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, item):
+        if np.ndim(item) == 0 and not isinstance(item, slice):
+            return self._item(self.values[item])
+        return self._like(self.values[item])
+
+    def __iter__(self):
+        for value in self.values:
+            yield self._item(value)
+
+    def __str__(self):
+        return str(self.show())
+
+    def _item(self, value):
+        if self.decimal:
+            return float(value)
+        return self.system.date_from_day_number(value)
+
+    def _like(self, values):
+        """
+        A new DateArray in this system holding values in the same form as self.values.
+        """
+        if self.decimal:
+            return DateArray(system=self.system, years=values)
+        return DateArray(days=values, system=self.system)
+
+    @property
+    def days(self):
+        if self.decimal:
+            raise ValueError('Date system has no months; use decimal_years() instead of day numbers.')
+        return self.values
+
+    @days.setter
+    def days(self, days):
+        self.values = np.asarray(days, dtype=float if self.decimal else np.int64)
+
+    def _days_of(self, other):
+        # Converts other to the form of self.values: day numbers, or decimal years for systems without months.
+        if isinstance(other, DateArray):
+            if other.system is not self.system:
+                other = other.convert(self.system)
+            return other.values
+        if isinstance(other, Date):
+            if other.system is not self.system:
+                raise ValueError('Dates must be in the same system to compare.')
+            if self.decimal:
+                return float(other.year)
+            return other.day_number()
+        return other
+
+    def __eq__(self, other):
+        return self.values == self._days_of(other)
+
+    def __ne__(self, other):
+        return self.values != self._days_of(other)
+
+    def __lt__(self, other):
+        return self.values < self._days_of(other)
+
+    def __le__(self, other):
+        return self.values <= self._days_of(other)
+
+    def __gt__(self, other):
+        return self.values > self._days_of(other)
+
+    def __ge__(self, other):
+        return self.values >= self._days_of(other)
+
+    @property
+    def year(self):
+        if self.decimal:
+            return np.floor(self.values).astype(np.int64)
+        return self.values // self.system.days_in_year()
+
+    @property
+    def day_of_year(self):
+        return self.days % self.system.days_in_year() + 1
+
+    @property
+    def month(self):
+        return self.system.month_and_day(self.day_of_year)[0]
+
+    @property
+    def day(self):
+        return self.system.month_and_day(self.day_of_year)[1]
+
+    def __add__(self, days):
+        """
+        dates + n gives the dates n days later; n may be an int or a numpy array that broadcasts against the dates.
+        """
+        if isinstance(days, (Date, DateArray)):
+            return NotImplemented
+        return DateArray(days=self.days + np.asarray(days, dtype=np.int64), system=self.system)
+
+    def __radd__(self, days):
+        return self.__add__(days)
+
+    def __sub__(self, other):
+        """
+        dates - n gives the dates n days earlier; dates - date, or dates - other_dates, gives the numbers of days
+        between them (or of years, for systems without months).
+        """
+        if isinstance(other, (Date, DateArray)):
+            return self.values - self._days_of(other)
+        return DateArray(days=self.days - np.asarray(other, dtype=np.int64), system=self.system)
+
+    def add_months(self, months):
+        """
+        Move all dates a number of months later, as with Date.add_months().
+        :param months: int, or numpy array that broadcasts against the dates.
+        :return: New DateArray.
+        """
+        if self.decimal:
+            raise ValueError('Date system has no months.')
+        system = self.system
+        n_months = len(system.month_lengths)
+        month, day = system.month_and_day(self.day_of_year)
+        year, month = np.divmod(self.year * n_months + month - 1 + np.asarray(months, dtype=np.int64), n_months)
+        day = np.minimum(day, np.asarray(system.month_lengths)[month])
+        return DateArray(days=year * system.days_in_year() + system.month_offsets[month] + day - 1, system=system)
+
+    def add_years(self, years):
+        """
+        Move all dates a number of years later.
+        :param years: int, or numpy array that broadcasts against the dates.
+        :return: New DateArray.
+        """
+        if self.decimal:
+            return self._like(self.values + np.asarray(years, dtype=float))
+        return DateArray(days=self.values + np.asarray(years, dtype=np.int64) * self.system.days_in_year(),
+                         system=self.system)
+
+    def years_since(self, other):
+        """
+        Count the whole years from other to each date, as for ages.
+        :param other: Date, DateArray or day number(s) (decimal years, for systems without months) in the same system.
+        :return: numpy array of ints.
+        """
+        other = np.asarray(self._days_of(other))
+        if self.decimal:
+            return np.floor(self.values - other).astype(np.int64)
+        days_in_year = self.system.days_in_year()
+        return (self.values // days_in_year - other // days_in_year) - (
+                self.values % days_in_year < other % days_in_year)
+
+    def decimal_years(self):
+        """
+        :return: numpy array of decimal years, as with Date.decimal_year().
+        """
+        if self.decimal:
+            return self.values.copy()
+        return self.values / self.system.days_in_year()
+
+    def convert(self, system: Union[DateSystem, str] = 'Pendant'):
+        """
+        Convert all dates to another DateSystem at once, as with convert_date_sys(). Each day is converted at its
+        midpoint, and lands on the day containing it in the new system; decimal years are converted exactly.
+        :param system: DateSystem, or name of one in availableSystems.
+        :return: DateArray in the new system.
+        """
+        system = check_available(system)
+        if self.decimal:
+            years = self.values
+        else:
+            years = (self.values + 0.5) / self.system.days_in_year()
+        return DateArray(system=system, years=convert_date_sys(years, old_sys=self.system, new_sys=system))
+
+    def to_dates(self):
+        """
+        :return: list of Date objects, or of decimal years for systems without months.
+        """
+        return list(self)
+
+    def argsort(self):
+        return np.argsort(self.values, kind='stable')
+
+    def sort(self):
+        """
+        Sort the dates in place, earliest first.
+        :return:
+        """
+        self.values = np.sort(self.values, kind='stable')
+        self.is_sorted = True
+
+    def between(self, start, end):
+        """
+        :param start: Earliest date, as a Date or day number.
+        :param end: Latest date, as a Date or day number.
+        :return: Boolean numpy array, True for dates from start to end inclusive.
+        """
+        return (self.values >= self._days_of(start)) & (self.values <= self._days_of(end))
+
+    def select(self, start, end):
+        """
+        Find the dates from start to end inclusive, by binary search if the array is sorted.
+        :param start: Earliest date, as a Date or day number.
+        :param end: Latest date, as a Date or day number.
+        :return: DateArray.
+        """
+        if self.is_sorted:
+            first = np.searchsorted(self.values, self._days_of(start), side='left')
+            last = np.searchsorted(self.values, self._days_of(end), side='right')
+            selected = self[first:last]
+            selected.is_sorted = True
+            return selected
+        return self[self.between(start, end)]
+
+    def show(self, fmt='yyyy-mm-dd'):
+        """
+        Format all dates as strings, as with Date.show(). Dates in systems without months are shown as decimal years,
+        whatever the format.
+        :param fmt: 'yyyy-mm-dd', 'Words', or another pattern; see DateFormat.
+        :return: numpy array of strings.
+        """
+        if self.decimal:
+            return np.char.add(np.char.mod('%.3f', self.values), self.system.year_suffix)
+        month, day = self.system.month_and_day(self.day_of_year)
+        return date_format(fmt, self.system).format_array(self.year, month, day)
+
+
+def parse_dates(strings, fmt: str = 'yyyy-mm-dd', system: Union[DateSystem, str] = 'Gregorian'):
+    """
+    Parse many date strings at once into a DateArray.
+    :param strings: Sequence or numpy array of strings.
+    :param fmt: Format of the strings; see DateFormat.
+    :param system: DateSystem, or name of one in availableSystems.
+    :return: DateArray.
+    """
+    system = check_available(system)
+    years, months, days = date_format(fmt, system).parse_array(strings)
+    return DateArray(days=years * system.days_in_year() + system.nth_day(months, days) - 1, system=system)
+
+
+def dates_to_array(dates: list, system: Union[DateSystem, str] = None):
+    """
+    Collect Date objects into a DateArray.
+    :param dates: list of Dates, all in the same system.
+    :param system: DateSystem of the dates; taken from the first date if not given.
+    :return: DateArray.
+    """
+    if system is None:
+        system = dates[0].system if dates else 'Gregorian'
+    return DateArray(days=[date.day_number() for date in dates], system=system)
+
+
+class Event:
+    def __init__(self, name: str, start: Date, end: Date, category: str = ''):
+        """
+        A named event spanning a range of dates, as returned by Timeline queries.
+        :param name: Name of event.
+        :param start: Date the event began.
+        :param end: Date the event ended (inclusive).
+        :param category: Kind of event, eg 'war' or 'reign'.
+        """
+        self.name = name
+        self.start = start
+        self.end = end
+        self.category = category
+
+    def __str__(self):
+        return f"{self.name}: {self.start} to {self.end}"
+
+
+class IntervalNode:
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, indices: np.ndarray):
+        """
+        Node of a centred interval tree. Holds the intervals that contain its centre, sorted both by start and by end,
+        with intervals entirely before or after the centre passed to the left and right subtrees.
+        :param starts: Start of every interval in the tree.
+        :param ends: End of every interval in the tree.
+        :param indices: Indices of the intervals to place in this node or below.
+        """
+        node_starts, node_ends = starts[indices], ends[indices]
+        self.centre = np.median(np.concatenate([node_starts, node_ends]))
+        left = node_ends < self.centre
+        right = node_starts > self.centre
+        here = indices[~left & ~right]
+        by_start = np.argsort(starts[here], kind='stable')
+        self.by_start = here[by_start]
+        self.starts = starts[self.by_start]
+        # Sorted by end, latest first, stored negated so that searchsorted can be used.
+        by_end = np.argsort(-ends[here], kind='stable')
+        self.by_end = here[by_end]
+        self.neg_ends = -ends[self.by_end]
+        self.left = IntervalNode(starts, ends, indices[left]) if left.any() else None
+        self.right = IntervalNode(starts, ends, indices[right]) if right.any() else None
+
+    def overlapping(self, low: int, high: int, found: list):
+        """
+        Collect the intervals that overlap [low, high].
+        :param low: Start of query range.
+        :param high: End of query range.
+        :param found: list to which arrays of matching interval indices are appended.
+        """
+        node = self
+        while node is not None:
+            if high < node.centre:
+                # Intervals here all end after high; those that start by high overlap.
+                found.append(node.by_start[:np.searchsorted(node.starts, high, side='right')])
+                node = node.left
+            elif low > node.centre:
+                found.append(node.by_end[:np.searchsorted(node.neg_ends, -low, side='right')])
+                node = node.right
+            else:
+                found.append(node.by_start)
+                if node.left is not None:
+                    node.left.overlapping(low, high, found)
+                node = node.right
+
+
+class Timeline:
+    def __init__(self, system: Union[DateSystem, str] = 'Gregorian', rebuild_threshold: int = 1024):
+        """
+        A store of events, each spanning a range of dates in one DateSystem. Events are held as columns of day numbers
+        (see DateSystem.day_number()), sorted by start, and indexed by an interval tree so that queries for the events
+        happening on a date, or overlapping a range, take logarithmic time. New events go into a pending buffer, which
+        is searched directly and merged into the index once it grows past rebuild_threshold.
+        :param system: DateSystem to use. If a string is passed, attempts to match it to the defaults in
+            availableSystems.
+        :param rebuild_threshold: Number of pending events at which the index is rebuilt.
+        """
+        self.system = check_available(system)
+        self.rebuild_threshold = rebuild_threshold
+        self.names = np.empty(0, dtype=str)
+        self.categories = np.empty(0, dtype=str)
+        self.starts = np.empty(0, dtype=np.int64)
+        self.ends = np.empty(0, dtype=np.int64)
+        self._tree = None
+        # Events added since the index was built.
+        self._pending = {'names': [], 'categories': [], 'starts': [], 'ends': []}
+
+    def __len__(self):
+        return len(self.starts) + len(self._pending['starts'])
+
+    def __getitem__(self, i: int):
+        self.build()
+        return self._event(self.names[i], self.starts[i], self.ends[i], self.categories[i])
+
+    def _event(self, name, start, end, category):
+        return Event(name=str(name), start=self.system.date_from_day_number(start),
+                     end=self.system.date_from_day_number(end), category=str(category))
+
+    def day_numbers(self, dates):
+        """
+        Convert dates to day numbers in this Timeline's system.
+        :param dates: Date, DateArray (in any system), day number, or array of day numbers.
+        :return: int or numpy array of ints.
+        """
+        if isinstance(dates, Date):
+            if dates.system is not self.system:
+                return int(DateArray(days=[dates.day_number()], system=dates.system).convert(self.system).days[0])
+            return dates.day_number()
+        if isinstance(dates, DateArray):
+            if dates.system is not self.system:
+                dates = dates.convert(self.system)
+            return dates.days
+        return dates
+
+    def add_event(self, name: str, start, end=None, category: str = ''):
+        """
+        Add one event.
+        :param name: Name of event.
+        :param start: Date the event began, as a Date or day number.
+        :param end: Date the event ended (inclusive); if None, the event lasts one day.
+        :param category: Kind of event.
+        :return:
+        """
+        start = self.day_numbers(start)
+        end = start if end is None else self.day_numbers(end)
+        if end < start:
+            raise ValueError('Event cannot end before it starts.')
+        self._pending['names'].append(name)
+        self._pending['categories'].append(category)
+        self._pending['starts'].append(start)
+        self._pending['ends'].append(end)
+        if len(self._pending['starts']) >= self.rebuild_threshold:
+            self.build()
+
+    def add_events(self, names, starts, ends=None, categories=None):
+        """
+        Add many events at once, and rebuild the index.
+        :param names: Sequence or array of names.
+        :param starts: DateArray, or array of day numbers.
+        :param ends: DateArray, or array of day numbers; if None, each event lasts one day.
+        :param categories: Sequence or array of categories; if None, all are ''.
+        :return:
+        """
+        starts = np.asarray(self.day_numbers(starts), dtype=np.int64)
+        ends = starts if ends is None else np.asarray(self.day_numbers(ends), dtype=np.int64)
+        if (ends < starts).any():
+            raise ValueError('Events cannot end before they start.')
+        if categories is None:
+            categories = np.full(len(starts), '')
+        self.build()
+        self._merge(np.asarray(names, dtype=str), np.asarray(categories, dtype=str), starts, ends)
+
+    def _merge(self, names, categories, starts, ends):
+        names = np.concatenate([self.names, names])
+        categories = np.concatenate([self.categories, categories])
+        starts = np.concatenate([self.starts, starts])
+        ends = np.concatenate([self.ends, ends])
+        order = np.argsort(starts, kind='stable')
+        self.names, self.categories, self.starts, self.ends = names[order], categories[order], starts[order], ends[
+            order]
+        self._tree = IntervalNode(self.starts, self.ends, np.arange(len(self.starts))) if len(self.starts) else None
+
+    def build(self):
+        """
+        Merge pending events into the sorted columns and rebuild the interval tree.
+        :return:
+        """
+        if self._pending['starts']:
+            pending = self._pending
+            self._pending = {'names': [], 'categories': [], 'starts': [], 'ends': []}
+            self._merge(np.asarray(pending['names'], dtype=str), np.asarray(pending['categories'], dtype=str),
+                        np.asarray(pending['starts'], dtype=np.int64), np.asarray(pending['ends'], dtype=np.int64))
+
+    def _tree_overlapping(self, low: int, high: int):
+        if self._tree is None:
+            return np.empty(0, dtype=int)
+        found = []
+        self._tree.overlapping(low, high, found)
+        return np.sort(np.concatenate(found))
+
+    def overlapping_indices(self, start, end=None):
+        """
+        Find the events overlapping a range of dates. Indices refer to the sorted columns, so pending events are
+        merged first if there are any.
+        :param start: Start of the range, as a Date or day number.
+        :param end: End of the range (inclusive); if None, the range is the single day start.
+        :return: numpy array of event indices, in order of start.
+        """
+        low = self.day_numbers(start)
+        high = low if end is None else self.day_numbers(end)
+        self.build()
+        return self._tree_overlapping(low, high)
+
+    def overlapping(self, start, end=None):
+        """
+        Find the events overlapping a range of dates, including pending events.
+        :param start: Start of the range, as a Date or day number.
+        :param end: End of the range (inclusive); if None, the range is the single day start.
+        :return: list of Events, in order of start.
+        """
+        low = self.day_numbers(start)
+        high = low if end is None else self.day_numbers(end)
+        events = [self._event(self.names[i], self.starts[i], self.ends[i], self.categories[i]) for i in
+                  self._tree_overlapping(low, high)]
+        if self._pending['starts']:
+            pending = self._pending
+            matches = np.flatnonzero((np.asarray(pending['starts']) <= high) & (np.asarray(pending['ends']) >= low))
+            events += [self._event(pending['names'][i], pending['starts'][i], pending['ends'][i],
+                                   pending['categories'][i]) for i in matches]
+            events.sort(key=lambda event: event.start)
+        return events
+
+    def at(self, date):
+        """
+        Find what was happening on a date.
+        :param date: Date (in any system) or day number.
+        :return: list of Events, in order of start.
+        """
+        return self.overlapping(date)
+
+    def starting_between(self, start, end):
+        """
+        Find the events that began within a range of dates, by binary search on the sorted starts.
+        :param start: Start of the range, as a Date or day number.
+        :param end: End of the range (inclusive).
+        :return: list of Events, in order of start.
+        """
+        self.build()
+        first = np.searchsorted(self.starts, self.day_numbers(start), side='left')
+        last = np.searchsorted(self.starts, self.day_numbers(end), side='right')
+        return [self[i] for i in range(first, last)]
+
+    def save(self, path: str):
+        """
+        Save the events to a .npz file, in columns.
+        :param path: Path to .npz file.
+        :return:
+        """
+        self.build()
+        system = [name for name, system in availableSystems.items() if system is self.system]
+        np.savez(path, names=self.names, categories=self.categories, starts=self.starts, ends=self.ends,
+                 system=np.array(system[0] if system else ''))
+
+    def load(self, path: str):
+        """
+        Add the events saved in a .npz file, converting them to this Timeline's system if they were saved from another
+        of the availableSystems.
+        :param path: Path to .npz file.
+        :return:
+        """
+        with np.load(path) as data:
+            starts, ends = data['starts'], data['ends']
+            if str(data['system']) in availableSystems:
+                saved = availableSystems[str(data['system'])]
+                starts = DateArray(days=starts, system=saved)
+                ends = DateArray(days=ends, system=saved)
+            self.add_events(names=data['names'], starts=starts, ends=ends, categories=data['categories'])
+
+
+def load_timeline(path: str, system: Union[DateSystem, str] = None):
+    """
+    Load a Timeline saved with Timeline.save().
+    :param path: Path to .npz file.
+    :param system: DateSystem for the Timeline; if None, the system it was saved in.
+    :return: Timeline object.
+    """
+    if system is None:
+        with np.load(path) as data:
+            system = str(data['system']) or 'Gregorian'
+    timeline = Timeline(system=system)
+    timeline.load(path)
+    return timeline
+
+
+def str_to_date(string: str, fmt: str = 'yyyy-mm-dd', system: Union[DateSystem, str] = 'Gregorian'):
+    return Date(string=string, fmt=fmt, system=system)
 
 
 def find_year(year, arr):
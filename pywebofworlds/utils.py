@@ -1,40 +1,19 @@
 from typing import List, Union
-import math as m
 
 
 # TODO: Standardise handling of CSV files using built in csv reader/writer
 
 def leading_zeroes(n, digits=2):
     """
-    Converts n into a string, with front zero padding to the number of digits specified.
+    Converts n into a string, with front zero padding to the number of digits specified. Negative numbers are padded
+    after the sign, eg leading_zeroes(-3, 4) == '-0003'; numbers with more digits than specified are not truncated.
     :param n: Number to be padded.
     :param digits: Number of digits to pad to.
     :return:
     """
-
-    negative = False
-
-    if n < 10 ** digits:
-        # Get the number of digits in the number.
-        if n == 0:
-            n_digits = 1
-        else:
-            if n < 0:
-                lead = "-"
-                n = -n
-            else:
-                lead = ""
-            n_digits = int(m.log10(n)) + 1
-        # Calculate the number of leading zeroes needed.
-        zeroes = digits - n_digits
-        # Append that number of zeroes
-        for i in range(zeroes):
-            lead = lead + "0"
-
-        return lead + str(n)
-
-    else:
-        return str(n)
+    if n < 0:
+        return "-" + str(-n).zfill(digits)
+    return str(n).zfill(digits)
 
 
 def sanitise_file_ext(path: str, ext: str = '.csv'):
@@ -143,7 +122,7 @@ def split_string(string: str, delimiter: str = ';', remove: str = None):
     for char in string:
         if char == delimiter or char == '\n':
             if remove is not None:
-                string = string.replace(remove, '')
+                string_piece = string_piece.replace(remove, '')
             strings.append(string_piece)
             string_piece = ''
         else:
@@ -0,0 +1,125 @@
+import numpy as np
+
+from pywebofworlds.physics import astrophysics as a
+from pywebofworlds.physics import units as u
+
+
+def test_apparent_sky_matches_distance_modulus():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(-50, 50, (300, 3))
+    abs_mag = rng.uniform(-5, 10, 300)
+    origins = rng.uniform(-10, 10, (4, 3))
+    for origin, (indices, ra, dec, mag, distance) in zip(origins, a.apparent_sky(positions, abs_mag, origins)):
+        d = np.linalg.norm(positions - origin, axis=1)
+        expected = abs_mag + 5. * np.log10(u.length_to_length(d, frm='ly', to='pc')) - 5.
+        assert set(indices) == set(np.flatnonzero(expected <= 6.5))
+        assert np.allclose(mag, expected[indices])
+        assert np.allclose(distance, d[indices])
+        assert (np.diff(mag) >= 0).all()
+
+
+def test_merged_identifiers_are_found():
+    ours = a.StarList()
+    star = a.Star()
+    star.name = 'Alpha'
+    star.hip = 1234
+    ours.add_star(star)
+    # Build the identifier index before merging.
+    assert ours.find_star('HIP 1234') is star
+    other = a.StarList()
+    record = a.Star()
+    record.name = 'Rigil'
+    record.hip = 1234
+    record.hd = 5678
+    other.add_star(record)
+    result = ours.merge_lists(other)
+    assert len(result.matched) == 1
+    assert ours.find_star('HD 5678') is star
+    assert ours.find_star('Rigil') is star
+
+
+def random_star_list(n, seed=0):
+    rng = np.random.default_rng(seed)
+    stars = a.StarList()
+    for i, (position, velocity) in enumerate(zip(rng.uniform(-30, 30, (n, 3)), rng.uniform(-1, 1, (n, 3)))):
+        star = a.Star()
+        star.name = f'Star {i}'
+        star.x, star.y, star.z = position.tolist()
+        star.vx, star.vy, star.vz = velocity.tolist()
+        stars.add_star(star)
+    return stars
+
+
+def test_epoch_neighbours_match_brute_force():
+    stars = random_star_list(60)
+    epoch = stars.at_epoch(years=10.)
+    positions = np.array([[s.x + 10. * s.vx, s.y + 10. * s.vy, s.z + 10. * s.vz] for s in stars.star_list])
+    assert np.allclose(epoch.positions, positions)
+    star = stars[7]
+    distances = np.linalg.norm(positions - positions[7], axis=1)
+    order = [i for i in np.argsort(distances) if i != 7]
+    assert [other for other, d in epoch.nearest_neighbours(star, k=3)] == [stars[i] for i in order[:3]]
+    within = epoch.within(star, radius=15.)
+    assert [other for other, d in within] == [stars[i] for i in order if distances[i] <= 15.]
+    assert stars.at_epoch(years=10.) is epoch
+
+
+def test_recalculate_all_matches_scalar_path():
+    stars = random_star_list(50, seed=2)
+    masses = np.random.default_rng(3).uniform(0.1, 60., 50)
+    for star, mass in zip(stars.star_list, masses.tolist()):
+        star.mass = mass
+    stars.star_list[-1].mass = None
+    result = stars.recalculate_all()
+    assert np.array_equal(result[0][:-1], masses[:-1])
+    assert stars.star_list[-1].mass is not None
+    for star, m, l, inner, outer, tau in zip(stars.star_list, *(r.tolist() for r in result)):
+        scalar = a.Star()
+        scalar.mass = m
+        scalar.recalculate()
+        assert (star.mass, star.luminosity, star.hz_inner, star.hz_outer, star.tau_ms) == (m, l, inner, outer, tau)
+        assert np.allclose([l, inner, outer, tau], [scalar.luminosity, scalar.hz_inner, scalar.hz_outer, scalar.tau_ms])
+    assert all(len(r) == 0 for r in a.StarList().recalculate_all())
+
+
+def test_parse_identifiers_normalises_prefixes():
+    names, ids = a.parse_identifiers('Gliese 876 , HIP 113020, WISEPC J1234, Ross 780,2MASS J22531672-1415489')
+    assert names == ['Gliese 876', 'HIP 113020', 'WISEPC J1234', 'Ross 780', '2MASS J22531672-1415489']
+    assert ids == {'gl': 'Gl 876', 'hip': '113020', 'wisepc': 'J1234', 'two_mass': 'J22531672-1415489'}
+    assert a.parse_identifiers('nan') == ([], {})
+    assert a.parse_identifiers(None) == ([], {})
+    assert a.normalise_identifier('GJ 876') == a.normalise_identifier(' Gl 876') == 'GJ 876'
+    assert a.normalise_identifier('HIP 113020.0') == a.identifier_key('hip', 113020) == 'HIP 113020'
+    assert a.normalise_identifier('Ross 780') == 'Ross 780'
+
+
+def test_night_skies_cache_follows_list():
+    stars = random_star_list(40, seed=4)
+    for i, star in enumerate(stars.star_list):
+        star.abs_mag = -5. + i % 10
+    first, second = stars.night_skies([stars[0], stars[1]], mag_limit=20.)
+    assert first.observer is stars[0] and second.observer is stars[1]
+    assert stars.night_sky(stars[0], mag_limit=20.) is first
+    near = a.Star()
+    near.name = 'Near'
+    near.x, near.y, near.z = stars[0].x + 1., stars[0].y, stars[0].z
+    near.abs_mag = 0.
+    stars.add_star(near)
+    sky = stars.night_sky(stars[0], mag_limit=20.)
+    assert sky is not first
+    assert near in sky.stars
+    stars.star_list.sort(key=lambda star: star.name, reverse=True)
+    stars.reindex()
+    assert stars.night_sky(stars[0], mag_limit=20.).observer is stars[0]
+
+
+def test_hosts_are_found_under_any_identifier():
+    stars = a.StarList()
+    star = a.Star()
+    star.name = 'GJ 581'
+    star.names = ['HIP 74995']
+    stars.add_star(star)
+    assert stars.find_star('Gliese 581') is star
+    assert stars.find_star('Gl 581') is star
+    assert stars.find_star('HIP 74995.0') is star
+    assert stars.find_star('Gliese 582') is None
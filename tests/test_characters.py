@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from pywebofworlds import characters as c
+from pywebofworlds import timelines as t
+
+
+@pytest.fixture
+def character_list():
+    characters = c.CharacterList()
+    characters.population.extend(characters.generate_characters(200, rng=np.random.default_rng(1)))
+    return characters
+
+
+def test_csv_round_trip(character_list, tmp_path):
+    character_list[0].name = 'Anna'
+    character_list[1].used = True
+    odd = c.Character()
+    odd['Wings'] = 'Feathered'
+    character_list.add_character(odd)
+    character_list.write_to_file(str(tmp_path / 'characters'))
+    read = c.CharacterList(str(tmp_path / 'characters'))
+    assert len(read) == len(character_list)
+    for original, copy in zip(character_list, read):
+        assert copy.name == original.name
+        assert copy.used == original.used
+        assert copy.dob == original.dob
+        assert copy.traits == original.traits
+
+
+def test_csv_round_trip_blank_trait_column(tmp_path):
+    characters = c.CharacterList()
+    characters.add_character(c.Character(name='Untraited'))
+    characters.write_to_file(str(tmp_path / 'blank'))
+    read = c.CharacterList(str(tmp_path / 'blank'))
+    assert len(read) == 1
+    assert read[0].name == 'Untraited'
+    assert read[0].traits == {}
+
+
+def test_csv_round_trip_empty(tmp_path):
+    c.CharacterList().write_to_file(str(tmp_path / 'empty'))
+    assert len(c.CharacterList(str(tmp_path / 'empty'))) == 0
+
+
+def test_sorting_matches_scalar_sorts(character_list):
+    expected = sorted(character_list, key=lambda character: character.dob)
+    character_list.sort_dob()
+    assert [character.dob for character in character_list] == [character.dob for character in expected]
+    expected = sorted(character_list, key=lambda character: character['Hand'])
+    character_list.sort_by_trait('Hand')
+    assert list(character_list) == expected
+
+
+def test_counts_and_filter(character_list):
+    counts = character_list.counts('Sex')
+    assert sum(counts.values()) == len(character_list)
+    assert counts == {sex: sum(character['Sex'] == sex for character in character_list) for sex in counts}
+    group_counts = character_list.group_counts(['Sex', 'Hand'])
+    assert sum(group_counts.values()) == len(character_list)
+    start = t.Date(year=1990, month=1, day=1)
+    selected = character_list.filter(traits={'Sex': 'Female'}, born_from=start)
+    assert len(selected) == sum(character['Sex'] == 'Female' and character.dob >= start
+                                for character in character_list)
+
+
+def test_edits_to_characters_reach_columns(character_list):
+    character_list[5]['Sex'] = 'Intersex'
+    character_list[5].used = True
+    assert character_list.population.where(traits={'Sex': 'Intersex'}, used=True)[5]
+
+
+def test_depopulate_and_populate(character_list):
+    used = [character_list[i] for i in (3, 4, 5)]
+    for character in used:
+        character.used = True
+    character_list.depopulate()
+    assert len(character_list) == 3
+    assert all(a is b for a, b in zip(character_list, used))
+    character_list.populate(50)
+    assert len(character_list) == 50
+    character_list.populate(10, rng=np.random.default_rng(2))
+    assert len(character_list) == 10
+    assert all(any(character is kept for kept in character_list) for character in used)
+
+
+def test_characters_view_mutations(character_list):
+    character = c.Character(name='New')
+    character_list.characters.append(character)
+    assert character_list[-1] is character
+    assert len(character_list) == 201
+    character_list.characters.remove(character)
+    assert len(character_list) == 200
+    character_list.characters.insert(0, character)
+    assert character_list[0] is character
+    del character_list.characters[0]
+    assert character_list[0] is not character
+    assert len(character_list) == 200
+
+
+def test_generate_characters():
+    characters = c.CharacterList(year=2016)
+    population = characters.generate_characters(5000, rng=np.random.default_rng(3))
+    assert len(population) == 5000
+    assert set(population.categories) == set(characters.demographics_list)
+    assert (population.dobs.year <= 2016).all()
+    assert population.dobs.year.min() > 2016 - 34 * 6
+    counts = population.counts('Hand')
+    assert abs(counts['Right'] / 5000 - 0.88) < 0.03
+    character = population[0]
+    assert set(character.traits) == set(characters.demographics_list)
+    assert character.dob == population.dobs[0]
+    characters.add_characters(10)
+    assert len(characters) == 10
+
+
+def test_random_dobs_empty():
+    assert len(c.random_dobs(0, year=2016)) == 0
+
+
+@pytest.mark.parametrize('demographics', [{'A': 50, 'B': 30, 'C': 20}, {'Rare': 0.005, 'Common': 99.995},
+                                          {'Only': 100}, {'A': 1, 'B': 1, 'C': 1, 'D': 97}])
+def test_alias_tables_reproduce_probabilities(demographics):
+    demographic_set = c.DemographicSet(trait='Test', demographics=demographics)
+    names, probabilities, threshold, alias = demographic_set.sampler()
+    n = len(names)
+    implied = threshold / n
+    np.add.at(implied, alias, (1. - threshold) / n)
+    assert np.allclose(implied, probabilities, rtol=0, atol=1e-12)
+    assert np.allclose(probabilities, [demographics[name] / sum(demographics.values()) for name in names])
+
+
+def test_sampling_frequencies_and_cache():
+    demographic_set = c.DemographicSet(trait='Test', demographics={'A': 70, 'B': 20, 'C': 10})
+    codes = demographic_set.sample(size=100000, rng=np.random.default_rng(4))
+    assert np.allclose(np.bincount(codes, minlength=3) / 100000, [0.7, 0.2, 0.1], atol=0.01)
+    assert demographic_set.sample(rng=np.random.default_rng(4)) in ('A', 'B', 'C')
+    demographic_set['D'] = 100.
+    names, probabilities = demographic_set.probabilities()
+    assert names == ['A', 'B', 'C', 'D']
+    assert np.isclose(probabilities[3], 0.5)
+
+
+def test_demographic_set_file_round_trip(tmp_path):
+    demographic_set = c.DemographicSet(trait='Hand', demographics={'Right': 88, 'Left': 10, 'Cross': 2})
+    demographic_set.write_to_file(str(tmp_path / 'hands'))
+    read = c.DemographicSet(trait='', demographics=str(tmp_path / 'hands.csv'))
+    assert read.trait == 'Hand'
+    assert read.demographics == demographic_set.demographics
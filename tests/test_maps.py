@@ -0,0 +1,204 @@
+import astropy.units as un
+import numpy as np
+import pytest
+
+imageio = pytest.importorskip('imageio')
+
+from pywebofworlds import maps as m
+from pywebofworlds import timelines as t
+
+
+@pytest.fixture
+def map_pair(tmp_path):
+    image = (np.random.default_rng(0).random((180, 360, 3)) * 255).astype(np.uint8)
+    imageio.v2.imwrite(str(tmp_path / 'map.png'), image)
+    plain = m.Map(str(tmp_path / 'map.png'))
+    tiled = m.Map(str(tmp_path / 'map.png'))
+    tiled.build_pyramid(str(tmp_path / 'pyramid'), tile_size=64)
+    return plain, tiled
+
+
+def test_pyramid_lookups_match_image(map_pair):
+    plain, tiled = map_pair
+    rng = np.random.default_rng(1)
+    lon, lat = rng.uniform(-180, 180, 500), rng.uniform(-90, 90, 500)
+    assert (plain.sample(lon, lat) == tiled.sample(lon, lat)).all()
+    assert (plain.region(-30, 40, -10, 20) == tiled.region(-30, 40, -10, 20)).all()
+    assert plain.x_y_from_lon_lat(10, 20) == tiled.x_y_from_lon_lat(10, 20)
+    assert np.allclose(tiled.lon_lat_from_x_y(*tiled.x_y_from_lon_lat(10, 20, level=1), level=1), (10, 20))
+
+
+def test_pyramid_sample_reads_only_needed_tiles(map_pair):
+    _, tiled = map_pair
+    tiled.sample(np.array([-179.]), np.array([89.]))
+    assert list(tiled.pyramid._tiles) == [(0, 0, 0)]
+
+
+def test_journey_matches_scalar_legs():
+    stops = [m.Location(name=str(i), lon=lon, lat=lat) for i, (lon, lat) in
+             enumerate([(0., 0.), (10., 5.), (-20., 40.), (170., -30.)])]
+    journey = m.Journey(stops[:2] + stops[3:], start_date=t.Date(year=2020, month=12, day=30))
+    journey.insert(2, stops[2])
+    expected = [a.travel_days(b, quantity=False) for a, b in zip(stops[:-1], stops[1:])]
+    assert np.allclose(np.diff(journey.cumulative_days()), expected)
+    assert np.isclose(journey.total_days(), sum(expected))
+    lon, lat = journey.positions([0., journey.cumulative_days()[2], journey.total_days()])
+    assert np.allclose(lon, [0., -20., 170.])
+    assert np.allclose(lat, [0., 40., -30.])
+    arrivals = journey.arrival_dates()
+    assert arrivals[0] == journey.start_date
+    assert [arrival - journey.start_date for arrival in arrivals] == [int(d) for d in journey.cumulative_days()]
+
+
+def test_travel_to_round_trips_distance_and_bearing():
+    rng = np.random.default_rng(3)
+    lon, lat = rng.uniform(-180, 180, 1000), rng.uniform(-80, 80, 1000)
+    distance = rng.uniform(0, 5e6, 1000)
+    lon2, lat2 = m.travel_to(lon, lat, rng.uniform(0, 360, 1000), distance)
+    assert np.allclose(m.great_circle_distance(lon, lat, lon2, lat2, quantity=False), distance, atol=1e-3)
+    start = m.Location(lon=10., lat=20.)
+    assert np.allclose(start.travel_to(0., 1000.), m.travel_to(10., 20., 0., 1000.))
+
+
+def test_plot_gif_frames_match_single_renders(map_pair, tmp_path):
+    plain, _ = map_pair
+    path, frames = plain.plot_gif(str(tmp_path / 'globe_'), centre_lat=20, lon_interval=90, size=64, processes=1,
+                                  return_frames=True)
+    assert path == str(tmp_path / 'globe_rotating.gif')
+    assert len(frames) == 4
+    assert len(imageio.v2.mimread(path)) == 4
+    for lon, frame in zip(range(0, 360, 90), frames):
+        assert (frame == m.render_orthographic(plain.image_array(), centre_lat=20, centre_lon=lon, size=64)).all()
+    assert plain.plot_gif(str(tmp_path / 'again_'), lon_interval=120, size=32, processes=2) == \
+        str(tmp_path / 'again_rotating.gif')
+    assert len(imageio.v2.mimread(str(tmp_path / 'again_rotating.gif'))) == 3
+
+
+def test_angular_distance_matches_law_of_cosines():
+    rng = np.random.default_rng(4)
+    lon1, lat1, lon2, lat2 = rng.uniform(-180, 180, 500), rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500), \
+        rng.uniform(-90, 90, 500)
+    r1, r2 = np.radians(lat1), np.radians(lat2)
+    expected = np.arccos(np.sin(r1) * np.sin(r2) + np.cos(r1) * np.cos(r2) * np.cos(np.radians(lon2 - lon1)))
+    assert np.allclose(m.great_circle_ang_dist(lon1, lat1, lon2, lat2), expected)
+    assert np.allclose(m.great_circle_ang_dist(*np.radians([lon1, lat1, lon2, lat2]), deg=False), expected)
+    # Nearby points, where the law of cosines loses precision.
+    assert np.isclose(m.great_circle_ang_dist(0., 0., 1e-7, 0.), np.radians(1e-7), rtol=1e-9)
+
+
+def test_distance_matrix_matches_pairwise():
+    rng = np.random.default_rng(5)
+    lon, lat = rng.uniform(-180, 180, 30), rng.uniform(-90, 90, 30)
+    matrix = m.great_circle_ang_dist_matrix(lon, lat, block_size=7)
+    assert np.allclose(matrix, m.great_circle_ang_dist(lon[:, None], lat[:, None], lon[None, :], lat[None, :]))
+
+
+@pytest.fixture
+def location_map(tmp_path):
+    rng = np.random.default_rng(6)
+    path = tmp_path / 'locations.csv'
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('name,population,type,longitude,latitude\n')
+        for i in range(250):
+            file.write(f'Place {i},{i * 10},{"city" if i % 3 else "town"},{rng.uniform(-180, 180)},'
+                       f'{rng.uniform(-90, 90)}\n')
+    return m.Map(image=str(tmp_path / 'unused.png'), locations=str(path))
+
+
+def test_location_files_round_trip(location_map, tmp_path):
+    assert len(location_map.locations['city']) + len(location_map.locations['town']) == 250
+    location_map.save_locations(str(tmp_path / 'locations.npz'))
+    copy = m.Map(image=str(tmp_path / 'unused.png'))
+    copy.load_locations(str(tmp_path / 'locations.npz'), chunk_size=16)
+    for typ in ('city', 'town'):
+        for original, loaded in zip(location_map.locations[typ].columns(), copy.locations[typ].columns()):
+            assert (original == loaded).all()
+    location = copy.locations['town'][0]
+    assert location.name == 'Place 0'
+    assert location.map is copy
+    assert copy.locations['town'][0] is location
+    empty = m.Map(image=str(tmp_path / 'unused.png'))
+    empty.save_locations(str(tmp_path / 'empty.npz'))
+    empty.load_locations(str(tmp_path / 'empty.npz'))
+    assert empty.location_list() == []
+
+
+def test_appended_location_joins_columns(location_map):
+    location = m.Location(name='New', lon=1., lat=2., typ='city', this_map=location_map)
+    assert location_map.locations['city'][-1] is location
+    lon, lat = location_map.lon_lat('city')
+    assert (lon[-1], lat[-1]) == (1., 2.)
+
+
+def brute_force(location_map, lon, lat, types):
+    centre = m.Location(name='centre', lon=lon, lat=lat)
+    centre.map = location_map
+    return sorted(((loc, centre.distance_to(loc, quantity=False)) for typ in types
+                   for loc in location_map.locations[typ]), key=lambda pair: pair[1])
+
+
+@pytest.mark.parametrize('lon, lat', [(0., 0.), (179.9, 12.), (-45., 89.9)])
+def test_spatial_queries_match_brute_force(location_map, lon, lat):
+    expected = brute_force(location_map, lon, lat, ['city', 'town'])
+    nearest = location_map.nearest(lon, lat, k=5)
+    assert [loc for loc, _ in nearest] == [loc for loc, _ in expected[:5]]
+    assert np.allclose([d for _, d in nearest], [d for _, d in expected[:5]])
+    radius = expected[20][1]
+    within = location_map.within(lon, lat, radius * 1.000001, types='town')
+    towns = [pair for pair in expected if pair[0].type == 'town' and pair[1] <= radius]
+    assert [loc for loc, _ in within] == [loc for loc, _ in towns]
+    assert location_map.within(lon, lat, 0, types='town') == []
+    assert len(location_map.within(lon, lat, 1e12)) == 250
+
+
+def test_spatial_index_sees_new_locations(location_map):
+    location_map.nearest(10., 10.)
+    location = m.Location(name='New', lon=10., lat=10., typ='city', this_map=location_map)
+    assert location_map.nearest(10., 10.)[0][0] is location
+
+
+def test_plain_travel_paths_match_quantities():
+    start = m.Location(name='start', lon=-10., lat=50.)
+    end = m.Location(name='end', lon=30., lat=-5.)
+    assert end.distance_to(start, quantity=False) == pytest.approx(end.distance_to(start).to_value(un.m))
+    assert start.travel_time(end, quantity=False) == pytest.approx(start.travel_time(end).to_value(un.s))
+    days = start.travel_days(end, quantity=False)
+    assert days == pytest.approx(start.travel_days(end).to_value(un.day))
+    assert days == pytest.approx(start.travel_days(end, speed=4 * un.km / un.hour,
+                                                    time_per_day=7.5 * un.hour / un.day, quantity=False))
+    quarter = m.great_circle_distance(0., 0., 90., 0., quantity=False)
+    assert quarter == pytest.approx(np.pi * 6371e3 / 2)
+    lon = np.array([0., 90., 180.])
+    assert np.allclose(m.great_circle_distance(0., 0., lon, 0., quantity=False), lon / 180 * np.pi * 6371e3)
+    assert m.great_circle_distance(5., 5., 5., 5., quantity=False) == 0.
+
+
+@pytest.mark.parametrize('projection', ['ortho', 'cyl', 'merc', 'moll'])
+def test_projection_round_trip(projection):
+    proj = m.Projection(projection, centre_lat=30. if projection == 'ortho' else 0., centre_lon=100.)
+    rng = np.random.default_rng(7)
+    lon = rng.uniform(-180, 180, 500)
+    lat = rng.uniform(-80, 80, 500)
+    x, y = proj(lon, lat)
+    shown = ~np.isnan(x)
+    assert shown.any()
+    back_lon, back_lat = proj.inverse(x[shown], y[shown])
+    assert np.allclose(back_lat, lat[shown], atol=1e-6)
+    assert np.allclose((back_lon - lon[shown] + 180) % 360 - 180, 0, atol=1e-6)
+    x_min, x_max, y_min, y_max = proj.extent
+    assert (x[shown] >= x_min - 1e-9).all() and (x[shown] <= x_max + 1e-9).all()
+    assert (y[shown] >= y_min - 1e-9).all() and (y[shown] <= y_max + 1e-9).all()
+    off_lon, off_lat = proj.inverse(np.array([x_max * 2]), np.array([y_max * 2]))
+    assert np.isnan(off_lon).all() and np.isnan(off_lat).all()
+
+
+@pytest.mark.parametrize('centre_lon', [0., 50., -170.])
+def test_lon_lat_grid_matches_inverse(centre_lon):
+    proj = m.Projection('ortho', centre_lat=20., centre_lon=centre_lon)
+    lon, lat = proj.lon_lat_grid(64)
+    x = -1 + (np.arange(64) + 0.5) / 64 * 2
+    expected_lon, expected_lat = proj.inverse(*np.meshgrid(x, -x))
+    assert np.array_equal(np.isnan(lat), np.isnan(expected_lat))
+    shown = ~np.isnan(lat)
+    assert np.allclose(lat[shown], expected_lat[shown])
+    assert np.allclose((lon[shown] - expected_lon[shown] + 180) % 360 - 180, 0, atol=1e-9)
@@ -0,0 +1,170 @@
+import numpy as np
+import pytest
+
+from pywebofworlds import timelines as t
+
+
+@pytest.mark.parametrize('system', ['Rachara', 'Semartol', 'Provectus'])
+def test_convert_to_monthless_matches_convert_date_sys(system):
+    dates = t.DateArray(days=np.arange(-1000, 100000, 97))
+    converted = dates.convert(system)
+    expected = t.convert_date_sys((dates.days + 0.5) / t.gregorian.days_in_year(), old_sys='Gregorian', new_sys=system)
+    assert converted.decimal
+    assert np.allclose(converted.decimal_years(), expected)
+    # Back to Gregorian lands on the same day, give or take rounding at the day boundary.
+    assert np.abs(converted.convert('Gregorian').days - dates.days).max() <= 1
+
+
+@pytest.mark.parametrize('system', ['Rachara', 'Semartol', 'Provectus'])
+def test_monthless_dates_as_decimal_years(system):
+    dates = t.DateArray(years=[1.5, 2.5], system=system)
+    assert list(dates.year) == [1, 2]
+    assert dates[0] == 1.5
+    assert list(dates < 2) == [True, False]
+    assert list(dates.show()) == ['1.500', '2.500']
+    assert np.allclose(dates.convert(system).decimal_years(), [1.5, 2.5])
+    with pytest.raises(ValueError):
+        dates.day_of_year
+    with pytest.raises(ValueError):
+        t.DateArray(days=[1, 2], system=system)
+
+
+@pytest.mark.parametrize('fmt', ['yyyy-mm-dd', 'Words', 'd/m/y', 'dd.mm.yyyy'])
+def test_format_array_round_trip(fmt):
+    dates = t.DateArray(days=np.arange(-800000, 800000, 3331))
+    strings = dates.show(fmt)
+    assert list(strings) == [date.show(fmt) for date in dates]
+    assert (t.parse_dates(strings, fmt=fmt) == dates).all()
+
+
+def test_format_and_parse_empty():
+    assert t.DateArray().show().shape == (0,)
+    assert len(t.parse_dates([])) == 0
+
+
+@pytest.mark.parametrize('system', ['Gregorian', 'Pendant'])
+def test_day_number_round_trip(system):
+    system = t.check_available(system)
+    for n in range(-2 * system.days_in_year(), 2 * system.days_in_year(), 7):
+        date = system.date_from_day_number(n)
+        assert date.day_number() == n
+        assert system.date_from_day_number(n + 1) > date
+
+
+def test_unset_month_and_day_mean_start_of_year():
+    assert t.Date(year=2016).day_number() == t.Date(year=2016, month=1, day=1).day_number()
+    assert t.Date(year=2016, month=3).day_of_year() == t.Date(year=2016, month=3, day=1).day_of_year()
+
+
+def test_unset_month_has_no_name():
+    date = t.Date(year=2020)
+    assert date.month_name == ''
+    assert date.show('Words') == ' 0, 2020'
+    words = t.date_format('Words')
+    assert list(words.format_array(np.array([2020, 2021]), np.array([0, 12]), np.array([0, 31]))) == \
+        [' 0, 2020', 'December 31, 2021']
+
+
+def test_dates_are_not_hashable():
+    # Dates are mutable, so they must not be used as dict keys.
+    with pytest.raises(TypeError):
+        hash(t.Date(year=2016))
+
+
+@pytest.fixture
+def dates():
+    rng = np.random.default_rng(0)
+    return t.DateArray(days=rng.integers(-400000, 800000, 300))
+
+
+def test_date_array_arithmetic_matches_scalar(dates):
+    scalar = dates.to_dates()
+    assert [date + 45 for date in scalar] == (dates + 45).to_dates()
+    assert [date - 400 for date in scalar] == (dates - 400).to_dates()
+    assert [date.add_months(14) for date in scalar] == dates.add_months(14).to_dates()
+    assert [date.add_months(-25) for date in scalar] == dates.add_months(-25).to_dates()
+    assert [date.add_years(3) for date in scalar] == dates.add_years(3).to_dates()
+    reference = t.Date(year=2000, month=2, day=29)
+    assert [date.years_since(reference) for date in scalar] == list(dates.years_since(reference))
+    assert [date - reference for date in scalar] == list(dates - reference)
+
+
+def test_month_end_rollover():
+    date = t.Date(year=2019, month=1, day=31)
+    assert str(date.add_months(1)) == '2019-02-28'
+    assert str(date.add_months(-2)) == '2018-11-30'
+    assert str(date + 365) == '2020-01-31'
+    date.set_day(40, rollover=True)
+    assert str(date) == '2019-02-09'
+
+
+def test_date_array_conversion_and_selection(dates):
+    converted = dates.convert('Pendant')
+    assert converted.system is t.pendant
+    expected = [t.convert_date_sys(date.decimal_year() + 0.5 / 365, 'Gregorian', 'Pendant') for date in dates]
+    assert np.allclose(converted.decimal_years(), expected, atol=1 / t.pendant.days_in_year())
+    start, end = t.Date(year=1000, month=1, day=1), t.Date(year=1500, month=6, day=30)
+    selected = dates.select(start, end)
+    dates.sort()
+    assert (np.sort(selected.days) == dates.select(start, end).days).all()
+    assert all(start <= date <= end for date in selected)
+    assert len(t.DateArray().select(start, end)) == 0
+
+
+def brute_force_overlapping(starts, ends, low, high):
+    return set(np.flatnonzero((starts <= high) & (ends >= low)))
+
+
+@pytest.mark.parametrize('rebuild_threshold', [1, 50, 100000])
+def test_timeline_queries_match_brute_force(rebuild_threshold):
+    rng = np.random.default_rng(1)
+    starts = rng.integers(0, 100000, 500)
+    ends = starts + rng.integers(0, 5000, 500)
+    timeline = t.Timeline(rebuild_threshold=rebuild_threshold)
+    timeline.add_events([f'Event {i}' for i in range(300)], starts[:300], ends[:300])
+    for i in range(300, 500):
+        timeline.add_event(f'Event {i}', int(starts[i]), int(ends[i]))
+    assert len(timeline) == 500
+    for low, high in rng.integers(0, 105000, (50, 2)):
+        low, high = min(low, high), max(low, high)
+        found = {int(event.name.split()[1]) for event in timeline.overlapping(int(low), int(high))}
+        assert found == brute_force_overlapping(starts, ends, low, high)
+    assert {int(e.name.split()[1]) for e in timeline.at(int(starts[0]))} == \
+        brute_force_overlapping(starts, ends, starts[0], starts[0])
+
+
+def test_timeline_empty_and_round_trip(tmp_path):
+    timeline = t.Timeline()
+    assert timeline.overlapping(0, 10) == []
+    start = t.Date(year=1914, month=7, day=28)
+    end = t.Date(year=1918, month=11, day=11)
+    timeline.add_event('War', start, end, category='war')
+    timeline.add_event('Armistice', end)
+    timeline.save(str(tmp_path / 'timeline.npz'))
+    loaded = t.load_timeline(str(tmp_path / 'timeline.npz'))
+    assert [event.name for event in loaded.at(end)] == ['War', 'Armistice']
+    assert [event.name for event in loaded.starting_between(start + 1, end)] == ['Armistice']
+    war = loaded.overlapping(start)[0]
+    assert (war.start, war.end, war.category) == (start, end, 'war')
+
+
+@pytest.mark.parametrize('system', ['Gregorian', 'Pendant'])
+def test_day_tables_match_month_lengths(system):
+    system = t.check_available(system)
+    n = 1
+    for month, length in enumerate(system.month_lengths, start=1):
+        for day in range(1, length + 1):
+            assert system.month_and_day(n) == (month, day)
+            assert system.nth_day(month, day) == n
+            n += 1
+    days = np.arange(1, system.days_in_year() + 1)
+    months, month_days = system.month_and_day(days)
+    assert (system.nth_day(months, month_days) == days).all()
+
+
+def test_equivalent_date_keeps_fraction_of_year():
+    first = t.gregorian.equivalent_date('2020-01-01', 'Pendant')
+    assert (first.month, first.day) == (1, 1)
+    last = t.gregorian.equivalent_date(t.Date(year=2020, month=12, day=31), 'Pendant')
+    assert (last.month, last.day) == (8, 30)
+    assert t.gregorian.equivalent_nth_day(np.array([1, 365]), 'Pendant').tolist() == [1, 240]
@@ -0,0 +1,27 @@
+import math
+
+import numpy as np
+
+from pywebofworlds.physics import astrophysics as a
+from pywebofworlds.physics import units as u
+
+
+def test_ra_round_trip_arrays_match_scalars():
+    angles = np.linspace(0., 2 * math.pi, 50, endpoint=False)
+    hrs, mins, secs = u.angle_radians_to_ra(angles)
+    assert np.allclose(u.angle_ra_to_radians(hrs, mins, secs), angles)
+    for i in (0, 17, 49):
+        assert np.allclose(u.angle_radians_to_ra(float(angles[i])), (hrs[i], mins[i], secs[i]))
+
+
+def test_equ_cart_round_trip():
+    rng = np.random.default_rng(0)
+    x, y, z = rng.uniform(-100, 100, (3, 200))
+    assert np.allclose(a.equ_to_cart(*a.cart_to_equ(x, y, z)), (x, y, z))
+
+
+def test_converter_matches_length_to_length():
+    lengths = np.array([0., 1., 3.26, 1e6])
+    to_pc = u.converter('ly', 'pc')
+    assert np.allclose(to_pc(lengths), u.length_to_length(lengths, frm='ly', to='pc'))
+    assert np.isclose(to_pc(1.), u.length_to_length(1., frm='ly', to='pc'))